@@ -1,16 +1,40 @@
-import base64
 import http.cookiejar
 import json
-from typing import Any
+import os
+import time
+import uuid
+from typing import Any, Callable
 
 import requests
 import requests.cookies
-from PyQt6.QtCore import QAbstractTableModel, Qt, QVariant
-from PyQt6.QtWidgets import QApplication, QFileDialog, QMessageBox, QListWidgetItem
+import urllib3.exceptions
+from PyQt6.QtCore import QAbstractTableModel, Qt, QVariant, QTimer
+from PyQt6.QtWidgets import QApplication, QFileDialog, QMessageBox, QListWidgetItem, QProgressDialog, QInputDialog
 
+import src.download as download
+import src.har as har
+import src.images as images
+import src.limits as limits
+import src.network as network
+import src.retry as retry
+import src.scripting as scripting
+import src.search as search
 import src.shared_constrains as shared_constraints
+import src.streaming as streaming
+import src.templating as templating
+import src.transport as transport
 import src.utils as utils
-#import src.secrets_backend as secrets
+from src.background import BackgroundTask, TaskCancelled
+from src.body_buffer import BodyBuffer, CHUNK_SIZE, decodeBodyJSON, jsonDefault
+from src.collection_tree import CollectionTreeModel, Folder
+from src.dataset_runner import DatasetReader, DatasetRunner
+from src.journal import CollectionJournal, AUTOSAVE_INTERVAL
+from src.profiling import profiler
+import src.secrets_backend as secrets
+
+
+# Files are read in chunks of this size to report progress
+READ_CHUNK_SIZE = 1024 * 1024
 
 
 def noneIfStrNull(s: str) -> str | None:
@@ -26,6 +50,7 @@ class CookieStore(QAbstractTableModel):
         # list[self.store key]
         self.sorting: list[str] = []
         self.headers = ["Name", "Value", "Is Secure", "Version", "Domain", "Path", "Port", "Comment", "Expires", "Discard"]
+        self.owner = None # AppRequest that is notified about edits
 
         if store is not None:
             self.sorting.extend(store.keys())
@@ -39,7 +64,7 @@ class CookieStore(QAbstractTableModel):
         for name in self.store:
             cookie = self.store[name]
             if not cookie[1]:
-                newStore[name] = cookie
+                newStore[name] = list(cookie)
         return newStore
 
     def toJar(self):
@@ -104,6 +129,8 @@ class CookieStore(QAbstractTableModel):
             else:
                 self.store[self.sorting[index.row()]][index.column() - 1] = value
             self.dataChanged.emit(index, index, [role])
+            if self.owner is not None:
+                self.owner.markChanged()
             return True
         return False
 
@@ -127,6 +154,7 @@ class HeaderStore(QAbstractTableModel):
         self.sorting = []
         self.dict: dict[str, str] = {}
         self.changeListener = lambda x: None
+        self.owner = None # AppRequest that is notified about edits
         if includeDefaults:
             self.dict["User-Agent"] = "denisjava's webrequests / 0.0.0"
 
@@ -185,6 +213,8 @@ class HeaderStore(QAbstractTableModel):
                 self.dict[self.sorting[index.row()]] = value
             self.dataChanged.emit(index, index, [role])
             self.changeListener(self)
+            if self.owner is not None:
+                self.owner.markChanged()
             return True
         return False
 
@@ -203,7 +233,8 @@ class HeaderStore(QAbstractTableModel):
                 Qt.ItemFlag.ItemIsEditable)
 
 class AppRequest:
-    def __init__(self, model, name: str):
+    def __init__(self, model, name: str, requestId: str | None = None):
+        self.id = uuid.uuid4().hex if requestId is None else requestId
         self.name = name
         self.method = "GET"
         self.url = "http://localhost/"
@@ -214,95 +245,398 @@ class AppRequest:
         self.requestHeaders = HeaderStore(True)
         self.responseHeaders = HeaderStore(False)
         self.statusCode = "XXX"
+        self.preScript = "" # python code that runs before sending, see src.scripting
+        self.postScript = "" # python code that checks the response, see src.scripting
+        self.testResults: list = [] # [name, passed, message] produced by postScript
+        self.retryPolicy = retry.RetryPolicy()
+        self.limits = limits.RequestLimits() # Unset limits are taken from AppDataModel#limits
+        self.redirects: list = [] # [status code, url] of every redirect followed by the last response
+        self.protocol = transport.HTTP1
+        self.folder: str | None = None # Id of the folder this AppRequest is in, None for top level requests
+        self.position: float | None = None # Order among siblings, see collection_tree.Folder#sortChildren
+        # negotiated protocol, start time (unix seconds) and phases (ms) of the last response, see src.transport
+        self.timings: dict = {}
+        # Response snapshots compared by the Diff tab, see AppRequest#responseSnapshot.
+        # Previous response is kept only in memory, pinned baseline is saved with the request
+        self.previousResponse: dict | None = None
+        self.baseline: dict | None = None
+        self.cookies.owner = self
+        self.requestHeaders.owner = self
 
     @staticmethod
     def fromJSON(data: dict, model):
-        req = AppRequest(model, data["n"])
+        req = AppRequest(model, data["n"], data.get("id"))
         req.method = data.get("m", "GET")
+        req.protocol = data.get("p", transport.HTTP1)
+        req.folder = data.get("f")
+        req.position = data.get("o")
         req.url = data.get("url", "http://localhost/")
         req.cookies = CookieStore.fromJSON(data.get("c", {}), model)
+        req.cookies.owner = req
         req.statusCode = data.get("s", "XXX")
-        req.requestBody.value = data.get("rqb", {"t": 0, "d": ""})
-        req.responseBody.value = data.get("rsb", {"t": 0, "d": ""})
+        req.requestBody.value = decodeBodyJSON(data.get("rqb", {"t": 0, "d": ""}))
+        req.responseBody.value = decodeBodyJSON(data.get("rsb", {"t": 0, "d": ""}))
         req.requestHeaders.loadFrom(data.get("rqh", {}))
         req.responseHeaders.loadFrom(data.get("rsh", {}))
+        req.preScript = data.get("prs", "")
+        req.postScript = data.get("pos", "")
+        req.testResults = data.get("tr", [])
+        req.retryPolicy = retry.RetryPolicy.fromJSON(data.get("rp"))
+        req.limits = limits.RequestLimits.fromJSON(data.get("lm"))
+        req.redirects = data.get("rd", [])
+        req.timings = data.get("tm", {})
+        req.baseline = data.get("bl")
+        if req.baseline is not None:
+            req.baseline["b"] = decodeBodyJSON(req.baseline["b"])
         return req
 
     def toJSON(self) -> dict:
+        """
+        Binary bodies are returned as BodyBuffers, use body_buffer.jsonDefault when serializing.
+        """
         return {
+            "id": self.id,
             "n": self.name,
-            "p": "HTTP(S)", # "p" key is reserved for future use to specify protocol of this AppRequest
+            "p": self.protocol,
+            "f": self.folder,
+            "o": self.position,
             "m": self.method,
             "url": self.url,
             "s": self.statusCode,
             "c": self.cookies.toJSON(),
-            "rqb": self.requestBody.value,
-            "rsb": self.responseBody.value,
-            "rqh": self.requestHeaders.dict,
-            "rsh": self.responseHeaders.dict,
+            "rqb": dict(self.requestBody.value),
+            "rsb": dict(self.responseBody.value),
+            "rqh": dict(self.requestHeaders.dict),
+            "rsh": dict(self.responseHeaders.dict),
+            "prs": self.preScript,
+            "pos": self.postScript,
+            "tr": list(self.testResults),
+            "rp": self.retryPolicy.toJSON(),
+            "lm": self.limits.toJSON(),
+            "rd": list(self.redirects),
+            "tm": dict(self.timings),
+            "bl": self.baseline,
         }
 
+    def moveToThread(self, thread):
+        """
+        Moves Qt models of this AppRequest to another thread. Used when AppRequest is created by a BackgroundTask.
+        """
+        for store in (self.cookies, self.requestHeaders, self.responseHeaders):
+            store.moveToThread(thread)
+
+    def markChanged(self):
+        """
+        Marks this AppRequest as changed, so it will be written by the next autosave.
+        """
+        self.model.markChanged(self)
+
+    def responseSnapshot(self) -> dict | None:
+        """
+        :return: Status, headers and body of the last response or None if this AppRequest was not sent yet
+        """
+        if self.statusCode == "XXX":
+            return None
+        return {"s": self.statusCode, "h": dict(self.responseHeaders.dict), "b": dict(self.responseBody.value),
+                "at": self.timings.get("started")}
+
+    def pinBaseline(self):
+        """
+        Makes the last response a baseline that following responses are compared with.
+        """
+        self.baseline = self.responseSnapshot()
+        self.markChanged()
+
+    def clearBaseline(self):
+        self.baseline = None
+        self.markChanged()
+
     def setContentTypeHeader(self, dataType: int, jsonHolder: utils.Holder):
         # ignored dataTypes 0 (no data) and 3 (read only bytes) because they can not be sent.
+        oldContentType = self.requestHeaders.dict.get("Content-Type")
         if dataType == 1:
             self.requestHeaders["Content-Type"] = "text/plain; encoding=utf-8"
         elif dataType == 2:
-            self.requestHeaders["Content-Type"] = "image/" + jsonHolder.value["f"].lower()
+            self.requestHeaders["Content-Type"] = images.mimeType(jsonHolder.value["f"])
         else:
             del self.requestHeaders["Content-Type"]
+        if oldContentType != self.requestHeaders.dict.get("Content-Type"):
+            self.markChanged()
+
+    def buildRequest(self) -> dict:
+        """
+        :return: method, url, headers and body that will be sent. Body is text for text bodies, BodyBuffer for
+        images and None if request has no body.
+        """
+        body = None
+        if self.method != "GET":
+            requestJson = self.requestBody.value
+            dataType = requestJson["t"]
+            # ignored dataTypes 0 (no data) and 3 (read only bytes) because they can not be sent.
+            if dataType == 1:
+                body = str(requestJson["d"])
+            elif dataType == 2:
+                body = BodyBuffer.coerce(requestJson["d"])
+        return {"method": self.method, "url": self.url, "headers": dict(self.requestHeaders.dict), "body": body}
+
+    def runPreRequestScript(self, request: dict, variables: dict) -> dict:
+        """
+        Runs pre-request script on result of AppRequest#buildRequest. Binary bodies are not passed to the script.
+        """
+        if self.preScript.strip() == "":
+            return request
+        binaryBody = request["body"] if isinstance(request["body"], BodyBuffer) else None
+        if binaryBody is not None:
+            request["body"] = None
+        request, newVariables = scripting.engine.runPreRequest(self.preScript, request, variables)
+        variables.update(newVariables)
+        if request.get("body") is None:
+            request["body"] = binaryBody
+        return request
+
+    def effectiveLimits(self) -> limits.RequestLimits:
+        """
+        :return: Limits of this AppRequest with unset ones taken from the collection and built-in defaults
+        """
+        return self.limits.merged(self.model.limits).merged(limits.DEFAULT_LIMITS)
+
+    def send(self, request: dict, session: requests.Session | None = None,
+             deadline: float | None = None) -> tuple[requests.Response, BodyBuffer]:
+        """
+        Sends request built by AppRequest#buildRequest. Response body is streamed into BodyBuffer.
+        Does not change this AppRequest, so it can be called from other threads.
+        Negotiated protocol and timings are stored in `timings` attribute of the response.
+        Request is aborted with an exception when it breaks AppRequest#effectiveLimits.
+        :param session: Session to send HTTP(S) request with. If None, session of the calling thread is used (see network.threadSession).
+        HTTP/2 requests always use the shared transport.Http2Transport.
+        :param deadline: time.perf_counter() of the deadline shared with previous attempts (see limits.RequestLimits#deadlineAt).
+        If None, the deadline of the limits starts now.
+        """
+        data = request["body"]
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        elif isinstance(data, BodyBuffer):
+            data = data.open()
+        requestLimits = self.effectiveLimits()
+        settings = self.model.network
+        start = time.perf_counter()
+        deadline = requestLimits.deadlineAt(start) if deadline is None else deadline
+        network.dns.configure(settings)
+        network.stats.requestSent(request["url"])
+        with profiler.span("network.request", "network"), requestLimits.timeoutsOf(deadline):
+            if self.protocol == transport.HTTP2:
+                resp = transport.transport.request(request["method"], request["url"], request["headers"], data,
+                                                   self.cookies.toJar(), lambda: requestLimits.timeout(deadline),
+                                                   requestLimits.maxRedirects, settings)
+                try:
+                    requestLimits.checkLength(resp.headers)
+                    # Connection is shared with other requests and can not be aborted by a watchdog,
+                    # so with a deadline the body is read frame by frame to check the time often
+                    chunks = resp.iter_content(None if deadline is not None else CHUNK_SIZE)
+                    body = BodyBuffer.fromChunks(requestLimits.limitChunks(chunks, deadline))
+                finally:
+                    resp.response.close()
+            else:
+                started = time.time()
+                ownSession = session is None
+                # Requests sent one after another from the same thread reuse connections
+                session = network.threadSession() if ownSession else session
+                try:
+                    resp = self.sendHttp1(session, request, data, requestLimits, deadline)
+                    received = time.perf_counter()
+                    try:
+                        requestLimits.checkLength(resp.headers)
+                        # Body is streamed into BodyBuffer, big bodies never get fully loaded into memory
+                        with requestLimits.watchdog(deadline, lambda: limits.abortResponse(resp)):
+                            body = BodyBuffer.fromChunks(requestLimits.limitChunks(resp.iter_content(CHUNK_SIZE),
+                                                                                   deadline))
+                    except requests.exceptions.ConnectionError as e:
+                        # requests reports read timeouts of a streamed body as connection errors
+                        if e.args and isinstance(e.args[0], urllib3.exceptions.ReadTimeoutError):
+                            raise requests.exceptions.ReadTimeout(e) from e
+                        raise
+                    finally:
+                        resp.close()
+                finally:
+                    if ownSession:
+                        session.cookies.clear() # Cookies belong to AppRequests, the shared session must not keep them
+                resp.timings = {
+                    "protocol": "HTTP/1.0" if resp.raw.version == 10 else "HTTP/1.1",
+                    "started": started,
+                    "wait": round((received - start) * 1000, 3),
+                    "receive": round((time.perf_counter() - received) * 1000, 3),
+                }
+        return resp, body
+
+    def sendHttp1(self, session: requests.Session, request: dict, data, requestLimits: limits.RequestLimits,
+                  deadline: float | None) -> requests.Response:
+        """
+        Sends request and follows redirects one by one, so every hop gets only the time left until the deadline.
+        :return: Streamed response with followed redirects in `history`
+        """
+        settings = self.model.network
+        resp: requests.Response = session.request(
+            method=request["method"], url=request["url"], cookies=self.cookies.toJar(), data=data,
+            headers=request["headers"], stream=True, timeout=requestLimits.timeout(deadline),
+            allow_redirects=False, proxies=settings.proxies(request["url"]))
+        history = []
+        # Without following redirects requests prepares the next request of a redirect as Response#next
+        while resp.next is not None and requestLimits.maxRedirects > 0:
+            resp.close()
+            if len(history) >= requestLimits.maxRedirects:
+                raise requests.exceptions.TooManyRedirects(f"Exceeded {requestLimits.maxRedirects} redirects.")
+            history.append(resp)
+            resp = session.send(resp.next, stream=True, timeout=requestLimits.timeout(deadline),
+                                allow_redirects=False, proxies=settings.proxies(resp.next.url))
+        resp.history = history
+        return resp
+
+    def sendWithRetries(self, request: dict, session: requests.Session | None = None,
+                        sleep: Callable[[float], None] = time.sleep) -> tuple[requests.Response, BodyBuffer, int]:
+        """
+        Sends request with AppRequest#send according to the retry policy of this AppRequest.
+        :param sleep: Used to wait for backoff and rate limits, see retry.cancellableSleep
+        :return: Response, its body and number of attempts
+        """
+        # Deadline covers all attempts together with waiting between them
+        deadline = self.effectiveLimits().deadlineAt(time.perf_counter())
+        return retry.sendWithRetries(lambda: self.send(request, session, deadline), request["url"], self.retryPolicy,
+                                     sleep, deadline)
+
+    def applyResponse(self, resp: requests.Response, body: BodyBuffer):
+        """
+        Stores response's cookies, headers, status code and body in this AppRequest.
+        Replaced response becomes AppRequest#previousResponse.
+        """
+        self.previousResponse = self.responseSnapshot()
+        self.cookies.clear()
+        for cookie in resp.cookies:
+            self.cookies.addCookie(cookie.name, cookie.value, cookie.secure, cookie.version,
+                                   cookie.domain, cookie.path, cookie.port,
+                                   cookie.comment, cookie.expires)
+        self.responseHeaders.loadFrom(resp.headers)
+        self.statusCode = str(resp.status_code)
+        self.timings = dict(resp.timings)
+        self.redirects = [[previous.status_code, str(previous.url)] for previous in resp.history]
+        try:
+            # Servers often send images as application/octet-stream or with parameters, so bytes decide
+            imageFormat = images.sniffImageFormat(body.view())
+            if imageFormat is not None:
+                self.responseBody.value = {"t": 2, "d": body, "f": imageFormat}
+            else:
+                try:
+                    self.responseBody.value["t"] = 1
+                    self.responseBody.value["d"] = str(body.view(), encoding="utf-8", errors="strict")
+                except UnicodeDecodeError as e:
+                    self.responseBody.value["t"] = 3
+                    self.responseBody.value["d"] = body
+                    print(e)
+        except Exception as e:
+            self.responseBody.value["t"] = 1
+            self.responseBody.value["d"] = "*Failed to decode response body*"
+            print(e)
+
+    def runPostResponseScript(self, resp: requests.Response, variables: dict, bodyText: str | None) -> list:
+        """
+        Runs post-response script on a response.
+        :param bodyText: Response body if it is text, otherwise None
+        :return: Test results as a list of [name, passed, message]
+        """
+        if self.postScript.strip() == "":
+            return []
+        response = {
+            "status": resp.status_code,
+            "headers": dict(resp.headers),
+            "body": bodyText,
+            "elapsed": resp.elapsed.total_seconds(),
+        }
+        try:
+            results, newVariables = scripting.engine.runPostResponse(self.postScript, response, variables)
+            variables.update(newVariables)
+        except scripting.ScriptError as e:
+            results = [("error", False, str(e))]
+        return [list(result) for result in results]
 
     def execute(self):
         """
         Sends this AppRequest using requests library.
+        If retry policy of this AppRequest can wait, request is sent in background with a cancellable progress dialog.
         Data update will be emitted!
         """
         window = self.model.back.window
         window.statusBar().showMessage("Отправка запроса...")
-        # noinspection PyBroadException
         try:
-            data = None
-            if self.method != "GET":
-                requestJson = self.requestBody.value
-                dataType = requestJson["t"]
-                # ignored dataTypes 0 (no data) and 3 (read only bytes) because they can not be sent.
-                if dataType == 1:
-                    data = str(requestJson["d"]).encode("utf-8")
-                elif dataType == 2:
-                    data = base64.decodebytes(str(requestJson["d"]).encode("ascii"))
-            resp: requests.Response = requests.request(method=self.method, url=self.url, cookies=self.cookies.toJar(),
-                                                       data=data, headers=self.requestHeaders.dict)
-            window.statusBar().showMessage(f"Ответ на запрос получен за {round(resp.elapsed.total_seconds(), 3)} секунд")
-            self.cookies.clear()
-            for cookie in resp.cookies:
-                self.cookies.addCookie(cookie.name, cookie.value, cookie.secure, cookie.version,
-                                       cookie.domain, cookie.path, cookie.port,
-                                       cookie.comment, cookie.expires)
-            self.responseHeaders.loadFrom(resp.headers)
-            self.statusCode = str(resp.status_code)
-            body: bytes = resp.content
-            contentType = resp.headers.get("content-type", "text/plain")
-            try:
-                if contentType in ("image/jpeg", "image/png", "image/jpg", "image/webp"):
-                    self.responseBody.value["t"] = 2
-                    self.responseBody.value["d"] = base64.encodebytes(body).decode(encoding="ascii")
-                else:
-                    try:
-                        self.responseBody.value["t"] = 1
-                        self.responseBody.value["d"] = body.decode(encoding="utf-8", errors="strict")
-                    except UnicodeDecodeError as e:
-                        self.responseBody.value["t"] = 3
-                        self.responseBody.value["d"] = base64.encodebytes(body).decode(encoding="ascii", errors="strict")
-                        print(e)
-            except Exception as e:
-                self.responseBody.value["t"] = 1
-                self.responseBody.value["d"] = "*Failed to decode response body*"
-                print(e)
-            self.model.back.emitDataUpdate()
-        except requests.exceptions.ConnectionError:
-            window.statusBar().showMessage("Запрос не успешен! Не удалось установить соединение с сервером.")
+            variables = self.model.getVariables()
+            request = self.runPreRequestScript(self.buildRequest(), variables)
+            request = templating.renderRequest(request, variables, secrets.storage.lookup)
+        except scripting.ScriptError as e:
+            window.statusBar().showMessage(f"Ошибка в скрипте перед запросом: {e}")
+            return
+        except secrets.SecretsError as e:
+            window.statusBar().showMessage(f"Запрос не отправлен: {e}")
+            return
+        if self.retryPolicy.canWait():
+            def sendInBackground(progress):
+                return self.sendWithRetries(request, sleep=retry.cancellableSleep(lambda: progress(0)))
+            self.model.back.runTask("Отправка запроса...", sendInBackground,
+                                    lambda result: self.finishExecute(result, variables), self.handleExecuteError)
+            return
+        try:
+            result = self.sendWithRetries(request)
         except Exception as e:
+            if not self.handleExecuteError(e):
+                raise e
+            return
+        self.finishExecute(result, variables)
+
+    def finishExecute(self, result: tuple[requests.Response, BodyBuffer, int], variables: dict):
+        """
+        Applies result of AppRequest#sendWithRetries and runs post-response script.
+        """
+        window = self.model.back.window
+        resp, body, attempts = result
+        message = (f"Ответ на запрос получен за {round(resp.elapsed.total_seconds(), 3)} секунд "
+                   f"по {resp.timings['protocol']}")
+        if attempts > 1:
+            message += f" (попыток: {attempts})"
+        if resp.history:
+            message += f", перенаправлений: {len(resp.history)}"
+        window.statusBar().showMessage(message)
+        self.applyResponse(resp, body)
+        self.testResults = self.runPostResponseScript(
+            resp, variables, self.responseBody.value["d"] if self.responseBody.value["t"] == 1 else None)
+        failed = sum(1 for result in self.testResults if not result[1])
+        if failed > 0:
+            window.statusBar().showMessage(f"Ответ получен, но {failed} из {len(self.testResults)} проверок не пройдено")
+        self.markChanged()
+        self.model.back.emitDataUpdate()
+
+    def handleExecuteError(self, e: BaseException) -> bool:
+        """
+        Shows error of sending this AppRequest in the status bar.
+        :return: False if error is unknown
+        """
+        window = self.model.back.window
+        if isinstance(e, TaskCancelled):
+            window.statusBar().showMessage("Отправка запроса отменена")
+        elif isinstance(e, limits.ResponseTooLarge):
+            window.statusBar().showMessage(f"Запрос прерван! Ответ больше {self.effectiveLimits().maxSize} байт.")
+        elif isinstance(e, limits.DeadlineExceeded):
+            window.statusBar().showMessage(f"Запрос прерван! Ответ не получен за {self.effectiveLimits().deadline} секунд.")
+        elif isinstance(e, requests.exceptions.Timeout):
+            window.statusBar().showMessage("Запрос не успешен! Превышено время ожидания ответа сервера.")
+        elif isinstance(e, requests.exceptions.TooManyRedirects):
+            window.statusBar().showMessage(f"Запрос не успешен! Больше {self.effectiveLimits().maxRedirects} перенаправлений.")
+        elif isinstance(e, requests.exceptions.ProxyError) or \
+                (isinstance(e, requests.exceptions.InvalidSchema) and self.model.network.proxy != ""):
+            window.statusBar().showMessage(f"Запрос не успешен! Ошибка прокси {self.model.network.proxy}: {e}")
+        elif isinstance(e, requests.exceptions.ConnectionError):
+            window.statusBar().showMessage("Запрос не успешен! Не удалось установить соединение с сервером.")
+        else:
             window.statusBar().showMessage("Во время запроса произошла неизвестная ошибка!")
-            raise e
+            print(e)
+            return False
+        return True
 
 
 class AppDataModel:
@@ -310,43 +644,323 @@ class AppDataModel:
     Dedicated class for storing and managing AppRequests.
     """
     def __init__(self, back):
-        self.requests: list[AppRequest] = []
-        self.selectedRequest: int = -1 # index of selected request. Or -1 if no request is selected
+        self.requests: dict[str, AppRequest] = {} # id -> AppRequest in collection order
+        self.folders: dict[str, Folder] = {} # id -> Folder
+        self.selectedRequest: str | None = None # id of selected request. Or None if no request is selected
+        self.selectedFolder: str | None = None # id of the folder new requests are created in
+        self.tree = CollectionTreeModel(self)
         self.back = back
+        self.file: str | None = None # file this model was read from or saved to
+        self.journal: CollectionJournal | None = None
+        # AppRequest id -> AppRequest or None if it was deleted. Changes that are not written to any file yet
+        self.changes: dict[str, AppRequest | None] = {}
+        self.environmentsChanged = False
+        self.foldersChanged = False
+        self.limitsChanged = False
+        self.networkChanged = False
+        self.saving = False
+        # environment name -> variables ({{name}} in url, headers and text bodies)
+        self.environments: dict[str, HeaderStore] = {}
+        self.activeEnvironment: str | None = None
+        self.searchIndex = search.SearchIndex() # Filled lazily by the first search
+        self.limits = limits.RequestLimits() # Collection defaults of AppRequest#limits
+        self.network = network.NetworkSettings()
+        self.generation: str | None = None # Changed by every save, see CollectionJournal
 
     @staticmethod
-    def readFile(file: str, back):
+    def readFile(file: str, back, progress: Callable[[int], None] = lambda x: None):
         """
         Reads AppRequests from a file.
+        Can be called from a non-GUI thread, in that case Qt models of AppRequests must be moved to the GUI thread.
+        :param progress: Receives percent of completion. Can raise an exception to cancel reading.
         """
         model = AppDataModel(back)
+        size = max(os.path.getsize(file), 1)
+        chunks = []
+        read = 0
         with open(file, "r", encoding="utf-8") as fr:
-            data = json.load(fr)
-        for request in data.get("r", []):
-            model.requests.append(AppRequest.fromJSON(request, model))
-        model.selectedRequest = int(data.get("s", -1))
+            while chunk := fr.read(READ_CHUNK_SIZE):
+                chunks.append(chunk)
+                read += len(chunk)
+                progress(min(40, read * 40 // size))
+        data = json.loads("".join(chunks))
+        del chunks
+        progress(50)
+        model.file = file
+        model.journal = CollectionJournal(file)
+        data = model.journal.replay(data)
+        model.generation = data.get("jg")
+        for name, variables in data.get("e", {}).items():
+            model.addEnvironment(name).loadFrom(variables)
+        model.activeEnvironment = data.get("ae")
+        model.limits = limits.RequestLimits.fromJSON(data.get("lm"))
+        model.network = network.NetworkSettings.fromJSON(data.get("nw"))
+        for folderId, folder in data.get("fo", {}).items():
+            model.folders[folderId] = Folder.fromJSON(folderId, folder)
+        for folder in model.folders.values():
+            if folder.parent not in model.folders:
+                folder.parent = None
+            model.tree.containerOf(folder).children.append(folder)
+        requests = data.get("r", [])
+        for i, request in enumerate(requests):
+            request = AppRequest.fromJSON(request, model)
+            if request.folder not in model.folders:
+                request.folder = None
+            model.requests[request.id] = request
+            model.tree.containerOf(request).children.append(request)
+            if i % 256 == 0:
+                progress(50 + i * 50 // len(requests))
+        model.tree.root.sortChildren()
+        for folder in model.folders.values():
+            folder.sortChildren()
+        selected = data.get("s")
+        if isinstance(selected, int):
+            # Files written before folders were added store index of the selected request
+            selected = list(model.requests)[selected] if 0 <= selected < len(model.requests) else None
+        model.selectedRequest = selected if selected in model.requests else None
+        progress(100)
         return model
 
     def getSelectedRequest(self) -> AppRequest | None:
         """
         :return: None is there is no AppRequests or user did not select an AppRequest. Otherwise, it returns the selected AppRequest.
         """
-        if self.selectedRequest == -1:
-            return None
-        return self.requests[self.selectedRequest]
+        return self.requests.get(self.selectedRequest)
+
+    def toJSON(self) -> dict:
+        """
+        :return: Snapshot of this AppDataModel that can be written to a file from another thread.
+        """
+        return {
+            "r": [request.toJSON() for request in self.requests.values()],
+            "s": self.selectedRequest,
+            "fo": self.foldersToJSON(),
+            "e": self.environmentsToJSON(),
+            "ae": self.activeEnvironment,
+            "lm": self.limits.toJSON(),
+            "nw": self.network.toJSON(),
+            "jg": self.generation,
+        }
+
+    def environmentsToJSON(self) -> dict:
+        return {name: dict(variables.dict) for name, variables in self.environments.items()}
+
+    def foldersToJSON(self) -> dict:
+        return {folderId: folder.toJSON() for folderId, folder in self.folders.items()}
+
+    def addRequest(self, request: AppRequest, folder: str | None = None):
+        """
+        Adds AppRequest to the end of a folder.
+        """
+        request.folder = folder
+        self.requests[request.id] = request
+        self.tree.insertNode(request)
+        request.markChanged()
+
+    def deleteRequest(self, request: AppRequest):
+        self.tree.removeNode(request)
+        del self.requests[request.id]
+        self.markDeleted(request)
+        if self.selectedRequest == request.id:
+            self.selectedRequest = None
+
+    def addFolder(self, name: str, parent: str | None = None) -> Folder:
+        folder = Folder(name, parent)
+        self.folders[folder.id] = folder
+        self.tree.insertNode(folder)
+        self.markFoldersChanged()
+        return folder
+
+    def deleteFolder(self, folder: Folder):
+        """
+        Deletes folder, its children are moved to its parent folder.
+        """
+        for child in list(folder.children):
+            self.moveNode(child, folder.parent)
+        self.tree.removeNode(folder)
+        del self.folders[folder.id]
+        if self.selectedFolder == folder.id:
+            self.selectedFolder = folder.parent
+        self.markFoldersChanged()
+
+    def moveNode(self, node: AppRequest | Folder, folder: str | None) -> bool:
+        """
+        Moves AppRequest or Folder to the end of another folder.
+        :return: False if a folder would be moved into itself or its sub folder
+        """
+        if isinstance(node, Folder):
+            parent = folder
+            while parent is not None:
+                if parent == node.id:
+                    return False
+                parent = self.folders[parent].parent
+        self.tree.removeNode(node)
+        if isinstance(node, Folder):
+            node.parent = folder
+            self.markFoldersChanged()
+        else:
+            node.folder = folder
+            node.markChanged()
+        self.tree.insertNode(node)
+        return True
+
+    def reorderNode(self, node: AppRequest | Folder, row: int):
+        """
+        Moves AppRequest or Folder to another row of its folder.
+        """
+        for changed in self.tree.moveChild(node, row):
+            if isinstance(changed, Folder):
+                self.markFoldersChanged()
+            else:
+                changed.markChanged()
+
+    def folderPath(self, folder: str | None) -> str:
+        """
+        :return: Names of folder and its ancestors separated with " / "
+        """
+        names = []
+        while folder is not None:
+            names.append(self.folders[folder].name)
+            folder = self.folders[folder].parent
+        return " / ".join(reversed(names))
+
+    def addEnvironment(self, name: str) -> HeaderStore:
+        variables = HeaderStore(False)
+        variables.owner = self
+        self.environments[name] = variables
+        return variables
+
+    def getVariables(self) -> dict:
+        """
+        :return: Copy of variables of the active environment
+        """
+        if self.activeEnvironment not in self.environments:
+            return {}
+        return dict(self.environments[self.activeEnvironment].dict)
+
+    @staticmethod
+    def writeFile(file: str, root: dict, progress: Callable[[int], None] = lambda x: None):
+        """
+        Atomically writes JSON root (see AppDataModel#toJSON) to a file request by request.
+        :param progress: Receives percent of completion. Can raise an exception to cancel writing.
+        """
+        requests = root["r"]
+        with utils.atomicWriter(file) as fw:
+            fw.write("{\n\"s\": " + json.dumps(root["s"]) + ",\n\"e\": " + json.dumps(root["e"]) +
+                     ",\n\"ae\": " + json.dumps(root["ae"]) + ",\n\"fo\": " + json.dumps(root["fo"]) +
+                     ",\n\"lm\": " + json.dumps(root["lm"]) + ",\n\"nw\": " + json.dumps(root["nw"]) +
+                     ",\n\"jg\": " + json.dumps(root["jg"]) + ",\n\"r\": [\n")
+            for i, request in enumerate(requests):
+                if i > 0:
+                    fw.write(",\n")
+                fw.write(json.dumps(request, default=jsonDefault)) # One request per line, encoded by the C encoder
+                if i % 256 == 0:
+                    progress(i * 100 // len(requests))
+            fw.write("\n]\n}")
+        progress(100)
 
     def savefile(self, file: str):
         """
         Saves AppDataModel to a file that can be read again with AppDataModel.readFile.
         """
-        root = {
-            "r": [],
-            "s": self.selectedRequest
-        }
-        for request in self.requests:
-            root["r"].append(request.toJSON())
-        with open(file, "w", encoding="utf-8") as fw:
-            fw.write(json.dumps(root, indent=0))
+        pending = self.beginSave()
+        try:
+            AppDataModel.writeFile(file, self.toJSON())
+        except BaseException:
+            self.abortSave(pending)
+            raise
+        self.finishSave(file)
+
+    def beginSave(self) -> dict:
+        """
+        Should be called right before AppDataModel#toJSON snapshot is taken for saving.
+        Autosave is paused until AppDataModel#finishSave or AppDataModel#abortSave is called.
+        :return: Changes that are going to be saved.
+        """
+        self.saving = True
+        self.generation = uuid.uuid4().hex
+        pending = self.changes
+        self.changes = {}
+        self.environmentsChanged = False
+        self.foldersChanged = False
+        self.limitsChanged = False
+        self.networkChanged = False
+        return pending
+
+    def finishSave(self, file: str):
+        self.saving = False
+        if self.file != file or self.journal is None:
+            self.file = file
+            self.journal = CollectionJournal(file)
+        self.journal.clear(self.generation)
+
+    def abortSave(self, pending: dict):
+        self.saving = False
+        pending.update(self.changes)
+        self.changes = pending
+        self.environmentsChanged = True
+        self.foldersChanged = True
+        self.limitsChanged = True
+        self.networkChanged = True
+
+    def markChanged(self, request: AppRequest | None = None):
+        """
+        :param request: Changed AppRequest or None if environments were changed
+        """
+        if request is None:
+            self.environmentsChanged = True
+        else:
+            self.changes[request.id] = request
+            self.searchIndex.markDirty(request)
+
+    def markFoldersChanged(self):
+        self.foldersChanged = True
+
+    def markLimitsChanged(self):
+        self.limitsChanged = True
+
+    def markNetworkChanged(self):
+        self.networkChanged = True
+
+    def markDeleted(self, request: AppRequest):
+        self.changes[request.id] = None
+        self.searchIndex.remove(request.id)
+
+    def search(self, query: str) -> set[str] | None:
+        """
+        :return: Ids of AppRequests matching the query, see search.SearchIndex#search
+        """
+        return self.searchIndex.search(query, self.requests.values())
+
+    def hasUnsavedChanges(self) -> bool:
+        return len(self.changes) > 0 or self.environmentsChanged or self.foldersChanged or self.limitsChanged \
+            or self.networkChanged
+
+    def autosave(self) -> bool:
+        """
+        Appends changed AppRequests to the journal of the file.
+        Does nothing if this model was never read from or saved to a file or if it is being saved right now.
+        :return: True if the journal grew too big and should be compacted with a full save.
+        """
+        if self.journal is None or self.saving:
+            return False
+        if self.hasUnsavedChanges():
+            changes = {requestId: None if request is None else request.toJSON()
+                       for requestId, request in self.changes.items()}
+            environments = None
+            if self.environmentsChanged:
+                environments = (self.environmentsToJSON(), self.activeEnvironment)
+            folders = self.foldersToJSON() if self.foldersChanged else None
+            collectionLimits = self.limits.toJSON() if self.limitsChanged else None
+            networkSettings = self.network.toJSON() if self.networkChanged else None
+            self.journal.append(changes, self.selectedRequest, environments, folders, collectionLimits,
+                                networkSettings)
+            self.changes.clear()
+            self.environmentsChanged = False
+            self.foldersChanged = False
+            self.limitsChanged = False
+            self.networkChanged = False
+        return self.journal.needsCompaction()
 
 # noinspection PyMethodMayBeStatic
 class AppBackend:
@@ -357,8 +971,13 @@ class AppBackend:
         self.window = None
         self.application: QApplication | None = None
         self.model = AppDataModel(self)
+        self.autosaveTimer: QTimer | None = None
+        self.tasks: list[BackgroundTask] = [] # Running background tasks
+        # AppRequest id -> WebSocket or SSE connection and messages received by it
+        self.streams: dict[str, streaming.StreamConnection] = {}
+        self.streamBuffers: dict[str, streaming.MessageBuffer] = {}
 
-        #self.secretStorage: secrets.SecretsStorage = secrets.SecretsStorage()
+        self.secretStorage: secrets.SecretsStorage = secrets.storage
 
         # Used to bypass python's gc when displaying PyQt windows.
         # Not storing PyQt window will result in gc clearing it
@@ -383,73 +1002,462 @@ class AppBackend:
 
     def openFile0(self, file: str):
         """
-        Updates AppDataModel with selected file.
+        Reads selected file in background and replaces AppDataModel when reading is finished.
         """
-        try:
-            self.model = AppDataModel.readFile(file, self)
-        except KeyError:
+        if file == "":
+            return
+        guiThread = QApplication.instance().thread()
+
+        def read(progress):
+            with profiler.span("backend.open", "backend"): # Measured in the task, not the call that starts it
+                model = AppDataModel.readFile(file, self, progress)
+                for request in model.requests.values():
+                    request.moveToThread(guiThread)
+                model.tree.moveToThread(guiThread)
+                for variables in model.environments.values():
+                    variables.moveToThread(guiThread)
+            return model
+
+        self.runTask("Чтение файла...", read, self.handleFileRead, self.handleFileReadError)
+
+    def handleFileRead(self, model):
+        self.model = model
+        self.emitDataUpdate()
+        if any(request.preScript.strip() or request.postScript.strip() for request in model.requests.values()):
+            QMessageBox.warning(self.window, "Внимание", shared_constraints.SCRIPTS_LOADED_WARNING)
+
+    def handleFileReadError(self, e: BaseException):
+        if isinstance(e, KeyError):
             QMessageBox.warning(self.window, "Внимание", "Файл не совместим с этой версией DenisJava's WebRequests")
-        except Exception:
+        elif not isinstance(e, TaskCancelled):
             QMessageBox.warning(self.window, "Внимание", "Не удалось прочитать файл!")
-        self.emitDataUpdate()
+
+    def askSaveFileName(self) -> str:
+        """
+        Shows QFileDialog for selecting file to save AppDataModel to.
+        :return: selected file or empty string if user cancelled the dialog
+        """
+        return QFileDialog.getSaveFileName(
+            self.window, "Выбрать файл", "" if self.model.file is None else self.model.file,
+            "DenisJava's WebRequests (*.djwr)")[0]
 
     def saveFile(self):
         """
         Shows QFileDialog and saves AppDataModel to selected file.
         """
+        file = self.askSaveFileName()
+        if file != "":
+            self.saveFile0(file, True)
+
+    def saveFile0(self, file: str, notify: bool):
+        """
+        Saves AppDataModel to a file in background.
+        Snapshot of AppDataModel is taken immediately, so user can continue editing requests while file is written.
+        :param notify: Whether to show a message box when file is written
+        """
+        model = self.model
+        if model.saving:
+            return
+        pending = model.beginSave()
+        root = model.toJSON()
+
+        def write(progress):
+            with profiler.span("backend.save", "backend"):
+                AppDataModel.writeFile(file, root, progress)
+
+        def finished(result):
+            model.finishSave(file)
+            if notify:
+                QMessageBox.information(self.window, "Операция успешна", "Файл успешно записан.")
+
+        def failed(e: BaseException):
+            model.abortSave(pending)
+            if not isinstance(e, TaskCancelled):
+                QMessageBox.warning(self.window, "Внимание", "Не удалось записать файл!")
+
+        self.runTask("Запись файла..." if notify else None, write, finished, failed)
+
+    def exportHar(self):
+        """
+        Shows QFileDialog and exports requests with their last responses and timings to a HAR file in background.
+        """
+        file = QFileDialog.getSaveFileName(self.window, "Экспорт в HAR", "", "HTTP Archive (*.har)")[0]
+        if file == "":
+            return
+        root = self.model.toJSON()
+
+        def failed(e: BaseException):
+            if not isinstance(e, TaskCancelled):
+                QMessageBox.warning(self.window, "Внимание", f"Не удалось экспортировать файл: {e}")
+
+        self.runTask("Экспорт в HAR...", lambda progress: har.exportHar(file, root, progress),
+                     lambda count: self.window.statusBar().showMessage(f"Экспортировано запросов: {count}"), failed)
+
+    def importHar(self):
+        """
+        Shows QFileDialog and adds entries of selected HAR file to AppDataModel as new requests.
+        """
+        file = QFileDialog.getOpenFileName(self.window, "Импорт из HAR", "", "HTTP Archive (*.har)")[0]
+        if file == "":
+            return
+        guiThread = QApplication.instance().thread()
+        model = self.model
+
+        def read(progress):
+            requests = []
+            for data in har.importHar(file, progress):
+                request = AppRequest.fromJSON(data, model)
+                request.moveToThread(guiThread)
+                requests.append(request)
+            return requests
+
+        def finished(requests: list[AppRequest]):
+            for request in requests:
+                model.addRequest(request, model.selectedFolder)
+            self.emitDataUpdate()
+            self.window.statusBar().showMessage(f"Импортировано запросов: {len(requests)}")
+
+        def failed(e: BaseException):
+            if not isinstance(e, TaskCancelled):
+                QMessageBox.warning(self.window, "Внимание", f"Не удалось импортировать файл: {e}")
+
+        self.runTask("Импорт из HAR...", read, finished, failed)
+
+    def downloadResponse(self):
+        """
+        Shows QFileDialog and sends selected request again, streaming its response body directly into selected file.
+        Cancelled downloads are resumed by downloading into the same file again.
+        """
+        selected = self.model.getSelectedRequest()
+        if selected is None:
+            QMessageBox.warning(self.window, "Внимание", "Выберите запрос для скачивания ответа")
+            return
+        if selected.protocol in transport.STREAM_PROTOCOLS:
+            QMessageBox.warning(self.window, "Внимание", "Ответ WebSocket и SSE запросов нельзя скачать в файл")
+            return
+        if selected.method != "GET" and QMessageBox.question(
+                self.window, "Внимание", f"Для скачивания запрос {selected.method} будет отправлен ещё раз. Продолжить?"
+        ) != QMessageBox.StandardButton.Yes:
+            return
+        file = QFileDialog.getSaveFileName(self.window, "Скачать ответ в файл", "", "Все файлы (*)")[0]
+        if file == "":
+            return
+        try:
+            variables = self.model.getVariables()
+            request = selected.runPreRequestScript(selected.buildRequest(), variables)
+            request = templating.renderRequest(request, variables, secrets.storage.lookup)
+        except scripting.ScriptError as e:
+            self.window.statusBar().showMessage(f"Ошибка в скрипте перед запросом: {e}")
+            return
+        except secrets.SecretsError as e:
+            self.window.statusBar().showMessage(f"Запрос не отправлен: {e}")
+            return
+        cookies = selected.cookies.toJar()
+        session = network.newSession()
+        proxies = self.model.network.proxies(request["url"])
+        timeout = selected.effectiveLimits().timeout()
+        network.dns.configure(self.model.network)
+
+        def run(progress):
+            percent = 0
+
+            def report(downloaded, total, speed):
+                nonlocal percent
+                percent = 0 if not total else downloaded * 100 // total
+                text = f"Скачано {download.formatSize(downloaded)}"
+                if total is not None:
+                    text += f" из {download.formatSize(total)}"
+                progress(percent, f"{text} ({download.formatSize(speed)}/с)")
+            return download.download(request, file, session, cookies=cookies, proxies=proxies, timeout=timeout,
+                                     progress=report, sleep=retry.cancellableSleep(lambda: progress(percent)),
+                                     check=lambda: progress(percent))
+
+        def finished(result: download.DownloadResult):
+            message = (f"Скачано {download.formatSize(result.size)} за {result.elapsed:.1f} секунд "
+                       f"({download.formatSize(result.speed())}/с)")
+            if result.resumes > 0:
+                message += f", докачек: {result.resumes}"
+            self.window.statusBar().showMessage(message)
+
+        def failed(e: BaseException):
+            if isinstance(e, TaskCancelled):
+                self.window.statusBar().showMessage("Скачивание прервано, выберите тот же файл, чтобы продолжить")
+            elif isinstance(e, requests.exceptions.ConnectionError):
+                QMessageBox.warning(self.window, "Внимание", "Не удалось установить соединение с сервером.")
+            else:
+                QMessageBox.warning(self.window, "Внимание", f"Не удалось скачать ответ: {e}")
+
+        self.runTask("Скачивание ответа...", run, finished, failed)
+
+    def runTask(self, title: str | None, function: Callable, finished: Callable, failed: Callable) -> BackgroundTask:
+        """
+        Runs function in BackgroundTask.
+        :param title: Title of the progress dialog. If None, task runs without showing any progress.
+        """
+        task = BackgroundTask(function)
+        self.tasks.append(task)
+        dialog = None
+        if title is not None:
+            dialog = QProgressDialog(title, "Отмена", 0, 100, self.window)
+            dialog.setWindowModality(Qt.WindowModality.WindowModal)
+            dialog.setMinimumDuration(500)
+            dialog.setAutoClose(False)
+            dialog.setAutoReset(False)
+            # Lambda is called in the GUI thread, a slot of the task would be queued to its busy thread
+            dialog.canceled.connect(lambda: task.cancel())
+            task.progress.connect(dialog.setValue)
+            task.message.connect(dialog.setLabelText)
+
+        def cleanup():
+            if dialog is not None:
+                dialog.close()
+            self.tasks.remove(task)
+            task.wait()
+
+        task.finished.connect(lambda result: (cleanup(), finished(result)))
+        task.failed.connect(lambda e: (cleanup(), failed(e)))
+        task.start()
+        return task
+
+    def runDataset(self):
+        """
+        Shows QFileDialog for selecting a CSV or JSONL dataset and executes selected request once per row in background.
+        """
+        selected = self.model.getSelectedRequest()
+        if selected is None:
+            QMessageBox.warning(self.window, "Внимание", "Выберите запрос для запуска")
+            return
+        if selected.protocol in transport.STREAM_PROTOCOLS:
+            QMessageBox.warning(self.window, "Внимание", "WebSocket и SSE запросы нельзя запускать по набору данных")
+            return
         file = QFileDialog.getOpenFileName(
-            self.window, "Выбрать файл", "",
-            "DenisJava's WebRequests (*.djwr)")[0]
+            self.window, "Выбрать набор данных", "",
+            "Наборы данных (*.csv *.jsonl)")[0]
+        if file == "":
+            return
+        reader = DatasetReader(file)
+        runner = DatasetRunner(selected, self.model.getVariables())
+
+        def failed(e: BaseException):
+            if isinstance(e, TaskCancelled):
+                self.window.statusBar().showMessage("Запуск по набору данных отменён")
+            else:
+                QMessageBox.warning(self.window, "Внимание", f"Не удалось выполнить запуск: {e}")
+
+        self.runTask("Запуск по набору данных...",
+                     lambda progress: runner.run(reader, progress=lambda: progress(reader.position * 100 // reader.size)),
+                     lambda summary: QMessageBox.information(self.window, "Запуск завершён", summary.toText()),
+                     failed)
+
+    def waitForTasks(self):
+        """
+        Blocks until all background tasks are finished and their results are delivered.
+        """
+        for task in list(self.tasks):
+            task.wait()
+        QApplication.processEvents()
+
+    def startAutosave(self):
+        """
+        Starts periodic autosave of AppDataModel into the journal of its file.
+        Should be called after QApplication is created.
+        """
+        self.autosaveTimer = QTimer()
+        self.autosaveTimer.timeout.connect(self.autosave)
+        self.autosaveTimer.start(AUTOSAVE_INTERVAL)
+
+    @profiler.timed("backend.autosave", "backend")
+    def autosave(self):
         try:
-            self.model.savefile(file)
-            QMessageBox.information(self.window, "Операция успешна", "Файл успешно записан.")
-        except Exception:
-            QMessageBox.warning(self.window, "Внимание", "Не удалось записать файл!")
-        self.emitDataUpdate()
+            if self.model.autosave():
+                self.saveFile0(self.model.file, False)
+        except OSError:
+            self.window.statusBar().showMessage("Не удалось выполнить автосохранение!")
 
-    def exit(self):
+    def exit(self) -> bool:
         """
-        Exits the application
+        Exits the application.
+        Unsaved changes of a model with a file are written to the journal.
+        Otherwise, user is asked whether changes should be saved.
+        :return: False if user cancelled exit
         """
-        # TODO: Show Unsaved Changes confirmation
+        self.waitForTasks()
+        if self.model.file is not None:
+            try:
+                self.model.autosave()
+            except OSError:
+                pass
+        elif self.model.hasUnsavedChanges():
+            answer = QMessageBox.question(
+                self.window, "Несохранённые изменения", "Сохранить изменения перед выходом?",
+                QMessageBox.StandardButton.Save | QMessageBox.StandardButton.Discard |
+                QMessageBox.StandardButton.Cancel)
+            if answer == QMessageBox.StandardButton.Cancel:
+                return False
+            if answer == QMessageBox.StandardButton.Save:
+                file = self.askSaveFileName()
+                if file == "":
+                    return False
+                try:
+                    self.model.savefile(file)
+                except Exception:
+                    QMessageBox.warning(self.window, "Внимание", "Не удалось записать файл!")
+                    return False
+        for connection in self.streams.values():
+            connection.close()
+        scripting.engine.shutdown()
+        secrets.storage.close()
+        transport.transport.close()
         quit(0)
 
+    def markCurrentRequestChanged(self):
+        selected = self.model.getSelectedRequest()
+        if selected is not None:
+            selected.markChanged()
+
+    @profiler.timed("backend.emitDataUpdate", "backend")
     def emitDataUpdate(self) -> None:
         """
         Updates frontend widgets according to backend data
         """
         self.window.emitDataUpdate(self)
 
-    def selectRequest(self, items):
-        if len(items) == 0:
+    @profiler.timed("backend.select", "backend")
+    def selectNode(self, node: AppRequest | Folder):
+        """
+        Selects clicked AppRequest or folder of the collection tree. New requests are created in the selected folder.
+        """
+        if isinstance(node, Folder):
+            self.model.selectedFolder = node.id
             return
-        # noinspection PyTypeChecker
-        item = items[0]
-        if item.linkedIndex == -1:
-            # linkedIndex is -1, so this item is not linked to AppRequest
-            self.handleSpecialListItem(item.text())
-        else:
-            if item.linkedIndex < len(self.model.requests):
-                self.model.selectedRequest = item.linkedIndex
-            self.emitDataUpdate()
+        self.model.selectedRequest = node.id
+        self.model.selectedFolder = node.folder
+        self.emitDataUpdate()
 
     def handleSpecialListItem(self, itemText: str):
-        if itemText == shared_constraints.NEW_HTTP_REQUEST:
-            self.model.selectedRequest = len(self.model.requests)
+        if itemText in (shared_constraints.NEW_HTTP_REQUEST, shared_constraints.NEW_WEBSOCKET,
+                        shared_constraints.NEW_SSE):
             req: AppRequest = AppRequest(self.model, "Новый запрос")
-            self.model.requests.append(req)
+            if itemText == shared_constraints.NEW_WEBSOCKET:
+                req.protocol = transport.WEBSOCKET
+                req.url = "ws://localhost/"
+            elif itemText == shared_constraints.NEW_SSE:
+                req.protocol = transport.SSE
+            self.model.addRequest(req, self.model.selectedFolder)
+            self.model.selectedRequest = req.id
         elif itemText == shared_constraints.DELETE_REQUEST:
-            self.model.requests.pop(self.model.selectedRequest)
-            self.model.selectedRequest = max(0, self.model.selectedRequest - 1)
+            deleted = self.model.getSelectedRequest()
+            if deleted is None:
+                return
+            # Previous request of the same folder becomes selected
+            container = self.model.tree.containerOf(deleted)
+            row = container.rowOf(deleted) - 1
+            while row >= 0 and not isinstance(container.children[row], AppRequest):
+                row -= 1
+            self.closeStream(deleted)
+            self.streamBuffers.pop(deleted.id, None)
+            self.model.deleteRequest(deleted)
+            self.model.selectedRequest = container.children[row].id if row >= 0 else None
+        self.emitDataUpdate()
+
+    def createFolder(self):
+        """
+        Asks for a name and creates a folder inside of the selected folder.
+        """
+        name, ok = QInputDialog.getText(self.window, "Новая папка", "Название папки:")
+        if ok and name.strip() != "":
+            folder = self.model.addFolder(name.strip(), self.model.selectedFolder)
+            self.model.selectedFolder = folder.id
+            self.emitDataUpdate()
+
+    def deleteSelectedFolder(self):
+        folder = self.model.folders.get(self.model.selectedFolder)
+        if folder is None:
+            QMessageBox.warning(self.window, "Внимание", "Выберите папку для удаления")
+            return
+        self.model.deleteFolder(folder)
+        self.window.statusBar().showMessage(f"Папка {folder.name} удалена, её содержимое перенесено на уровень выше")
+        self.emitDataUpdate()
+
+    def moveSelectedRequest(self):
+        """
+        Asks for a folder and moves selected AppRequest to it.
+        """
+        selected = self.model.getSelectedRequest()
+        if selected is None:
+            QMessageBox.warning(self.window, "Внимание", "Выберите запрос для перемещения")
+            return
+        folders = sorted(((self.model.folderPath(folderId), folderId) for folderId in self.model.folders),
+                         key=lambda folder: folder[0].lower())
+        names = ["(Корень коллекции)"] + [path for path, folderId in folders]
+        name, ok = QInputDialog.getItem(self.window, "Переместить в папку", "Папка:", names, 0, False)
+        if not ok:
+            return
+        target = None if name == names[0] else folders[names.index(name) - 1][1]
+        self.model.moveNode(selected, target)
+        self.model.selectedFolder = target
+        self.emitDataUpdate()
+
+    def moveSelectedRequestBy(self, offset: int):
+        """
+        Moves selected AppRequest up (negative offset) or down inside of its folder.
+        """
+        selected = self.model.getSelectedRequest()
+        if selected is None:
+            self.window.statusBar().showMessage("Выберите запрос")
+            return
+        if self.model.tree.filter is not None:
+            self.window.statusBar().showMessage("Очистите поиск, чтобы изменить порядок запросов")
+            return
+        self.model.reorderNode(selected, self.model.tree.containerOf(selected).rowOf(selected) + offset)
         self.emitDataUpdate()
 
     def updateCurrentRequest(self, prop: str, value):
         selected = self.model.getSelectedRequest()
         if selected is not None:
             setattr(selected, prop, value)
+            selected.markChanged()
 
+    @profiler.timed("backend.send", "backend")
     def sendRequest(self):
         selected = self.model.getSelectedRequest()
-        if selected is not None:
-            #threading.Thread(target=selected.execute).start()
-            selected.execute()
\ No newline at end of file
+        if selected is None:
+            return
+        if selected.protocol in transport.STREAM_PROTOCOLS:
+            self.openStream(selected)
+        else:
+            selected.execute()
+
+    def openStream(self, request: AppRequest):
+        """
+        Opens WebSocket or SSE connection of the AppRequest. Messages are received in a separate thread.
+        """
+        self.closeStream(request)
+        variables = self.model.getVariables()
+        try:
+            rendered = templating.renderRequest(request.buildRequest(), variables, secrets.storage.lookup)
+        except secrets.SecretsError as e:
+            self.window.statusBar().showMessage(f"Соединение не открыто: {e}")
+            return
+        buffer = self.streamBuffers.setdefault(request.id, streaming.MessageBuffer())
+        buffer.append(streaming.SYSTEM, f"Подключение к {rendered['url']}...")
+        network.dns.configure(self.model.network)
+        self.streams[request.id] = streaming.openConnection(request.protocol, rendered, buffer,
+                                                            self.model.network.proxies(rendered["url"]),
+                                                            request.effectiveLimits().timeout())
+        self.window.statusBar().showMessage(f"Открыто {request.protocol} соединение")
+        self.window.showStreamTab()
+        self.emitDataUpdate()
+
+    def closeStream(self, request: AppRequest | None):
+        if request is not None and request.id in self.streams:
+            self.streams.pop(request.id).close()
+
+    def sendStreamMessage(self, request: AppRequest, text: str):
+        connection = self.streams.get(request.id)
+        if connection is None or not connection.open:
+            return
+        try:
+            connection.send(text)
+        except Exception as e:
+            self.window.statusBar().showMessage(f"Не удалось отправить сообщение: {e}")
\ No newline at end of file
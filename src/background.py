@@ -0,0 +1,68 @@
+import threading
+from typing import Callable, Any
+
+from PyQt6.QtCore import QObject, QThread, pyqtSignal
+
+
+class TaskCancelled(Exception):
+    """
+    Raised inside of a BackgroundTask when user cancelled it.
+    """
+    pass
+
+
+class BackgroundTask(QObject):
+    """
+    Runs function in a separate QThread.
+    Function receives BackgroundTask#reportProgress as its only argument and should call it from time to time,
+    it raises TaskCancelled if BackgroundTask#cancel was called.
+    Signals are delivered to the GUI thread. BackgroundTask lives in its QThread, whose event loop is blocked
+    while function runs, so BackgroundTask#cancel must be called directly, not through a queued signal connection.
+    """
+    # Signals
+    progress = pyqtSignal(int) # Percent of completion (0 - 100)
+    message = pyqtSignal(str) # Text describing current progress, shown in the progress dialog
+    finished = pyqtSignal(object) # Function's result
+    failed = pyqtSignal(object) # Exception raised by function (including TaskCancelled)
+
+    def __init__(self, function: Callable[[Callable[[int], None]], Any]):
+        super().__init__()
+        self.function = function
+        self.cancelled = threading.Event() # Set from the GUI thread, checked by the worker
+        self.running = False
+        self.lastPercent = -1
+        self.thread = QThread()
+        self.moveToThread(self.thread)
+        self.thread.started.connect(self.run)
+
+    def start(self):
+        self.running = True
+        self.thread.start()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def wait(self):
+        self.thread.wait()
+
+    def reportProgress(self, percent: int, text: str | None = None):
+        if self.cancelled.is_set():
+            raise TaskCancelled()
+        if percent != self.lastPercent: # Do not flood GUI thread with identical updates
+            self.lastPercent = percent
+            self.progress.emit(percent)
+        if text is not None:
+            self.message.emit(text)
+
+    def run(self):
+        # noinspection PyBroadException
+        try:
+            result = self.function(self.reportProgress)
+        except BaseException as e:
+            self.running = False
+            self.failed.emit(e)
+        else:
+            self.running = False
+            self.finished.emit(result)
+        finally:
+            self.thread.quit()
@@ -0,0 +1,271 @@
+"""
+Benchmark suite for backend hot paths.
+
+Usage (from the project's root):
+    python -m src.benchmark [--output results.json] [--compare baseline.json] [--threshold 1.25] [--filter name]
+
+Every benchmark is measured several times and written to a JSON file with min/median/mean timings,
+so results of two runs (for example master and PR branch) can be compared with --compare.
+Comparison exits with code 1 if any benchmark became slower than threshold * baseline median.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable
+from urllib.parse import urlsplit
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import requests
+from PyQt6.QtWidgets import QApplication, QMainWindow
+
+import src.backend as backend
+import src.utils as utils
+from src.mock_server import MockRoutes, MockServer
+from src.standin_server import StandInServer, gradientPng
+
+# name -> (setup function, repeats). Setup function returns callable that is measured.
+BENCHMARKS: dict[str, tuple[Callable, int]] = {}
+
+
+def benchmark(name: str, repeats: int = 5):
+    def decorator(setup: Callable):
+        BENCHMARKS[name] = (setup, repeats)
+        return setup
+    return decorator
+
+
+class BenchmarkContext:
+    """
+    Shared state of a benchmark run: Qt application, AppBackend with a real window and stand-in HTTP server.
+    """
+    def __init__(self):
+        self.application = QApplication.instance() or QApplication(sys.argv)
+        self.back = backend.AppBackend()
+        self.back.application = self.application
+        self.back.window = QMainWindow()
+        self.back.emitDataUpdate = lambda: None # Benchmarks measure backend without frontend widgets
+        self.server = StandInServer().start()
+        self.mockServer: MockServer | None = None # Started by the first benchmark that needs it
+        self.tempDir = tempfile.TemporaryDirectory()
+
+    def tempFile(self, name: str) -> str:
+        return os.path.join(self.tempDir.name, name)
+
+    def close(self):
+        self.server.stop()
+        if self.mockServer is not None:
+            self.mockServer.stop()
+        self.tempDir.cleanup()
+
+
+def syntheticCollection(size: int) -> dict:
+    """
+    :return: JSON root of a .djwr file with size requests.
+    """
+    requests = []
+    for i in range(size):
+        requests.append({
+            "n": f"Request #{i}",
+            "p": "HTTP(S)",
+            "m": "POST" if i % 2 else "GET",
+            "url": f"http://localhost/api/v1/items/{i}?page={i % 10}",
+            "s": "200",
+            "c": {},
+            "rqb": {"t": 1, "d": json.dumps({"id": i, "payload": "x" * 200})},
+            "rsb": {"t": 1, "d": json.dumps({"id": i, "items": list(range(50))})},
+            "rqh": {"User-Agent": "benchmark", "Content-Type": "application/json", "X-Request": str(i)},
+            "rsh": {"Content-Type": "application/json", "Content-Length": "180"},
+        })
+    return {"r": requests, "s": 0}
+
+
+def writeCollection(context: BenchmarkContext, size: int) -> str:
+    file = context.tempFile(f"collection-{size}.djwr")
+    if not os.path.exists(file):
+        with open(file, "w", encoding="utf-8") as fw:
+            json.dump(syntheticCollection(size), fw, indent=0)
+    return file
+
+
+def makeRequest(context: BenchmarkContext, url: str, method: str = "GET") -> backend.AppRequest:
+    request = backend.AppRequest(context.back.model, "benchmark")
+    request.url = url
+    request.method = method
+    return request
+
+
+@benchmark("readFile[1k]")
+def benchReadFile1k(context: BenchmarkContext):
+    file = writeCollection(context, 1000)
+    return lambda: backend.AppDataModel.readFile(file, context.back)
+
+
+@benchmark("readFile[10k]", repeats=3)
+def benchReadFile10k(context: BenchmarkContext):
+    file = writeCollection(context, 10000)
+    return lambda: backend.AppDataModel.readFile(file, context.back)
+
+
+@benchmark("savefile[1k]")
+def benchSaveFile1k(context: BenchmarkContext):
+    model = backend.AppDataModel.readFile(writeCollection(context, 1000), context.back)
+    file = context.tempFile("save-1k.djwr")
+    return lambda: model.savefile(file)
+
+
+@benchmark("savefile[10k]", repeats=3)
+def benchSaveFile10k(context: BenchmarkContext):
+    model = backend.AppDataModel.readFile(writeCollection(context, 10000), context.back)
+    file = context.tempFile("save-10k.djwr")
+    return lambda: model.savefile(file)
+
+
+@benchmark("execute[small-json]", repeats=20)
+def benchExecuteJson(context: BenchmarkContext):
+    return makeRequest(context, context.server.url("/json")).execute
+
+
+@benchmark("execute[binary-8mb]")
+def benchExecuteBinary(context: BenchmarkContext):
+    return makeRequest(context, context.server.url(f"/binary?size={8 * 1024 * 1024}")).execute
+
+
+@benchmark("execute[slow-drip]", repeats=3)
+def benchExecuteDrip(context: BenchmarkContext):
+    return makeRequest(context, context.server.url("/drip?chunks=20&delay=0.01")).execute
+
+
+@benchmark("mockServer.replay[1k]", repeats=3)
+def benchMockReplay(context: BenchmarkContext):
+    model = backend.AppDataModel.readFile(writeCollection(context, 1000), context.back)
+    context.mockServer = MockServer(MockRoutes.fromModel(model)).start()
+    session = requests.Session()
+    targets = []
+    for request in model.requests.values():
+        split = urlsplit(request.url)
+        targets.append((request.method, context.mockServer.url(f"{split.path}?{split.query}")))
+
+    def run():
+        for method, url in targets:
+            session.request(method, url).content
+    return run
+
+
+@benchmark("CookieStore.toJar[100]", repeats=20)
+def benchCookieJar(context: BenchmarkContext):
+    store = backend.CookieStore()
+    for i in range(100):
+        store.addCookie(f"cookie{i}", "v" * 32, False, 0, "localhost", "/", "", None, None)
+    return store.toJar
+
+
+@benchmark("HeaderStore.mutation[1k]", repeats=10)
+def benchHeaderStore(context: BenchmarkContext):
+    def run():
+        store = backend.HeaderStore(True)
+        for i in range(1000):
+            store[f"X-Header-{i}"] = str(i)
+        for i in range(0, 1000, 2):
+            del store[f"X-Header-{i}"]
+    return run
+
+
+@benchmark("AssetViewWidget.updateAsset[text-1mb]", repeats=5)
+def benchUpdateAssetText(context: BenchmarkContext):
+    from src.frontend.app_components import AssetViewWidget
+    widget = AssetViewWidget(True, utils.Holder({}))
+    text = ("lorem ipsum dolor sit amet " * 40 + "\n") * 1000
+    return lambda: widget.updateAsset(1, text)
+
+
+@benchmark("AssetViewWidget.updateAsset[png-1024]", repeats=5)
+def benchUpdateAssetImage(context: BenchmarkContext):
+    from src.frontend.app_components import AssetViewWidget
+    widget = AssetViewWidget(False, utils.Holder({}))
+    image = gradientPng(1024, 1024)
+    return lambda: widget.updateAsset(2, image)
+
+
+def measure(function: Callable, repeats: int) -> dict:
+    function() # Warm up
+    timings = []
+    for i in range(repeats):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return {
+        "repeats": repeats,
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "mean": statistics.fmean(timings),
+        "max": max(timings),
+    }
+
+
+def runBenchmarks(nameFilter: str | None = None) -> dict:
+    context = BenchmarkContext()
+    results = {}
+    try:
+        for name, (setup, repeats) in BENCHMARKS.items():
+            if nameFilter is not None and nameFilter not in name:
+                continue
+            results[name] = measure(setup(context), repeats)
+            print(f"{name:<45} median {results[name]['median'] * 1000:10.3f} ms", flush=True)
+    finally:
+        context.close()
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "time": time.time(),
+        },
+        "results": results
+    }
+
+
+def compareResults(current: dict, baseline: dict, threshold: float) -> list[str]:
+    """
+    :return: List of human-readable regressions. Empty if there is none.
+    """
+    regressions = []
+    for name, result in current["results"].items():
+        old = baseline["results"].get(name)
+        if old is None:
+            continue
+        ratio = result["median"] / old["median"] if old["median"] > 0 else 1
+        print(f"{name:<45} {old['median'] * 1000:10.3f} ms -> {result['median'] * 1000:10.3f} ms ({ratio:.2f}x)")
+        if ratio > threshold:
+            regressions.append(f"{name} is {ratio:.2f}x slower than baseline")
+    return regressions
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(description="DenisJava's WebRequests backend benchmarks")
+    parser.add_argument("--output", default="benchmark_results.json", help="File to write results to")
+    parser.add_argument("--compare", default=None, help="Results file of a previous run to compare with")
+    parser.add_argument("--threshold", type=float, default=1.25, help="Allowed slowdown ratio")
+    parser.add_argument("--filter", default=None, help="Only run benchmarks containing this string")
+    args = parser.parse_args(argv)
+
+    results = runBenchmarks(args.filter)
+    with open(args.output, "w", encoding="utf-8") as fw:
+        json.dump(results, fw, indent=2)
+
+    if args.compare is not None:
+        with open(args.compare, "r", encoding="utf-8") as fr:
+            baseline = json.load(fr)
+        regressions = compareResults(results, baseline, args.threshold)
+        for regression in regressions:
+            print("REGRESSION:", regression)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
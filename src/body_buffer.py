@@ -0,0 +1,163 @@
+import base64
+import hashlib
+import io
+import mmap
+import tempfile
+from typing import Iterable
+
+# Bodies bigger than this are spooled to a temporary file and memory-mapped instead of being kept in memory
+SPOOL_THRESHOLD = 1024 * 1024
+# Size of chunks used when (de)coding and copying bodies. Multiple of 57 so base64 lines are never split
+CHUNK_SIZE = 57 * 1024 * 16
+
+
+class BodyBuffer:
+    """
+    Immutable binary body of a request or response (body types 2 and 3).
+    Small bodies are stored as bytes. Big ones live in an anonymous temporary file that is memory-mapped,
+    so they do not take resident memory and can be viewed without copying via BodyBuffer#view.
+    """
+    def __init__(self, data: bytes = b"", spool=None):
+        self.data = data
+        self.spool = spool
+        self.mapping: mmap.mmap | None = None
+        self.hash: bytes | None = None # See BodyBuffer#digest
+        if spool is not None:
+            spool.flush()
+            size = spool.seek(0, io.SEEK_END)
+            if size > 0:
+                self.mapping = mmap.mmap(spool.fileno(), 0, access=mmap.ACCESS_READ)
+
+    @staticmethod
+    def fromBytes(data: bytes):
+        if len(data) <= SPOOL_THRESHOLD:
+            return BodyBuffer(bytes(data))
+        return BodyBuffer.fromChunks(memoryview(data)[i : i + CHUNK_SIZE] for i in range(0, len(data), CHUNK_SIZE))
+
+    @staticmethod
+    def fromChunks(chunks: Iterable[bytes]):
+        """
+        Builds BodyBuffer from a stream of chunks (for example requests.Response#iter_content).
+        Chunks are kept in memory until SPOOL_THRESHOLD is reached, then everything goes to the spool file.
+        """
+        memory = []
+        memorySize = 0
+        spool = None
+        for chunk in chunks:
+            if spool is not None:
+                spool.write(chunk)
+                continue
+            memory.append(bytes(chunk))
+            memorySize += len(chunk)
+            if memorySize > SPOOL_THRESHOLD:
+                spool = tempfile.TemporaryFile()
+                for part in memory:
+                    spool.write(part)
+                memory.clear()
+        if spool is None:
+            return BodyBuffer(b"".join(memory))
+        return BodyBuffer(spool=spool)
+
+    @staticmethod
+    def fromBase64(text: str):
+        """
+        Decodes base64 text (as written by BodyBuffer#toJSON) chunk by chunk.
+        """
+        # base64.encodebytes splits output into lines of 76 characters. Keep chunks aligned to whole lines.
+        lineLength = 77 if len(text) > 76 and text[76] == "\n" else 76
+        step = lineLength * (CHUNK_SIZE // 57)
+        return BodyBuffer.fromChunks(base64.decodebytes(text[i : i + step].encode("ascii"))
+                                     for i in range(0, len(text), step))
+
+    @staticmethod
+    def coerce(data):
+        """
+        :return: BodyBuffer for a BodyBuffer, bytes or base64 str (body JSON of older versions)
+        """
+        if isinstance(data, BodyBuffer):
+            return data
+        if isinstance(data, str):
+            return BodyBuffer.fromBase64(data)
+        return BodyBuffer.fromBytes(b"" if data is None else data)
+
+    def __len__(self):
+        return len(self.mapping) if self.mapping is not None else len(self.data)
+
+    def view(self) -> memoryview:
+        """
+        :return: Read only view of the body without copying it
+        """
+        return memoryview(self.mapping if self.mapping is not None else self.data)
+
+    def digest(self) -> bytes:
+        """
+        :return: Hash of the body, computed once because the body never changes
+        """
+        if self.hash is None:
+            self.hash = hashlib.blake2b(self.view(), digest_size=16).digest()
+        return self.hash
+
+    def open(self) -> io.RawIOBase:
+        """
+        :return: File-like object reading the body. Used for sending the body without copying it.
+        """
+        return BodyReader(self.view())
+
+    def toJSON(self) -> str:
+        view = self.view()
+        return "".join(base64.encodebytes(view[i : i + CHUNK_SIZE]).decode("ascii")
+                       for i in range(0, len(view), CHUNK_SIZE))
+
+
+class BodyReader(io.RawIOBase):
+    """
+    Readable, seekable file over a memoryview
+    """
+    def __init__(self, view: memoryview):
+        super().__init__()
+        self.source = view
+        self.position = 0
+
+    def __len__(self):
+        return len(self.source)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer) -> int:
+        size = min(len(buffer), len(self.source) - self.position)
+        buffer[:size] = self.source[self.position : self.position + size]
+        self.position += size
+        return size
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence = io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += len(self.source)
+        self.position = max(0, min(offset, len(self.source)))
+        return self.position
+
+
+def jsonDefault(o):
+    """
+    `default` argument of json.dump for JSON that contains BodyBuffers
+    """
+    if isinstance(o, BodyBuffer):
+        return o.toJSON()
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+def decodeBodyJSON(value: dict) -> dict:
+    """
+    Replaces base64 text of binary body JSON ({"t": ..., "d": ...}) with BodyBuffer
+    """
+    if value.get("t") in (2, 3) and not isinstance(value.get("d"), BodyBuffer):
+        value["d"] = BodyBuffer.coerce(value.get("d"))
+    return value
@@ -0,0 +1,326 @@
+import uuid
+
+from PyQt6.QtCore import QAbstractItemModel, QModelIndex, Qt, QVariant
+from PyQt6.QtGui import QIcon
+from PyQt6.QtWidgets import QApplication, QStyle
+
+# Rows added to a folder by one fetchMore call
+FETCH_BATCH = 256
+
+
+class Folder:
+    """
+    Folder of a collection. Children are sub folders and AppRequests in display order.
+    Root folder of a collection has id None and is never saved.
+    """
+    def __init__(self, name: str, parent: str | None = None, folderId: str | None = None):
+        self.id = uuid.uuid4().hex if folderId is None else folderId
+        self.name = name
+        self.parent = parent # Id of the parent folder, None for top level folders
+        self.position: float | None = None # Order among siblings, see sortChildren
+        self.children: list = []
+        self.loaded = 0 # Children already exposed to views, see CollectionTreeModel#fetchMore
+        # Child id -> row. Rows of children before `indexed` are valid, others are refreshed by rowOf,
+        # so removing or moving a child does not rebuild the whole index
+        self.rows: dict[str, int] = {}
+        self.indexed = 0
+        self.implicit = False # Some children were read without positions, see sortChildren
+
+    @staticmethod
+    def fromJSON(folderId: str, data: dict):
+        folder = Folder(data["n"], data.get("f"), folderId)
+        folder.position = data.get("o")
+        return folder
+
+    def toJSON(self) -> dict:
+        return {"n": self.name, "f": self.parent, "o": self.position}
+
+    def rowOf(self, node) -> int:
+        row = self.rows.get(node.id)
+        if row is None or row >= self.indexed:
+            # Stale rows are never smaller than `indexed`, children before it did not move
+            for row in range(self.indexed, len(self.children)):
+                self.rows[self.children[row].id] = row
+            self.indexed = len(self.children)
+            row = self.rows[node.id]
+        return row
+
+    def invalidateRows(self, row: int):
+        """
+        Marks rows from `row` to the end as stale after children were inserted, removed or moved there.
+        """
+        self.indexed = min(self.indexed, row)
+
+    def resetChildren(self, children: list):
+        self.children = children
+        self.rows = {}
+        self.indexed = 0
+        self.loaded = 0
+
+    def sortChildren(self):
+        """
+        Orders children read from a file by their positions. Children of files written before positions
+        were added get their row as position.
+        """
+        self.implicit = any(child.position is None for child in self.children)
+        for row, child in enumerate(self.children):
+            if child.position is None:
+                child.position = float(row)
+        self.children.sort(key=lambda child: child.position)
+        self.invalidateRows(0)
+
+    def nextPosition(self) -> float:
+        if not self.children:
+            return 0.0
+        last = self.children[-1].position
+        return float(len(self.children)) if last is None else last + 1.0
+
+
+class CollectionTreeModel(QAbstractItemModel):
+    """
+    Folders and AppRequests of an AppDataModel as a tree. Nodes are addressed by their ids, never by list indexes.
+    Children of a folder are exposed to views in batches of FETCH_BATCH rows when the folder is expanded
+    or scrolled to, so opening a huge collection does not create rows for every request.
+    Structural changes only insert or remove the affected rows.
+    With a filter (see CollectionTreeModel#setFilter) matching requests are shown as a flat list instead.
+    """
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+        self.root = Folder("", None, None)
+        self.root.id = None
+        self.filter: set[str] | None = None
+        self.results = Folder("", None, None) # Matching requests while a filter is set
+        self.results.id = None
+        self.icons: dict[str, QIcon] = {} # Created on first use, QIcon needs QGuiApplication
+
+    # Structure
+
+    def containerOf(self, node) -> Folder:
+        """
+        :return: Folder that contains node
+        """
+        return self.model.folders.get(node.parent if isinstance(node, Folder) else node.folder, self.root)
+
+    def folderOf(self, node) -> Folder:
+        """
+        :return: Folder that shows node as its child, differs from containerOf while a filter is set
+        """
+        return self.results if self.filter is not None else self.containerOf(node)
+
+    def childrenFolder(self, parent: QModelIndex) -> Folder | None:
+        if not parent.isValid():
+            return self.results if self.filter is not None else self.root
+        node = parent.internalPointer()
+        return node if isinstance(node, Folder) else None
+
+    def indexOf(self, node) -> QModelIndex:
+        """
+        :return: Index of node or invalid index if node is not loaded into views yet
+        """
+        if node is None or (node is self.root):
+            return QModelIndex()
+        folder = self.folderOf(node)
+        if folder is self.results and node.id not in self.filter:
+            return QModelIndex()
+        row = folder.rowOf(node)
+        return self.createIndex(row, 0, node) if row < folder.loaded else QModelIndex()
+
+    def reveal(self, node) -> QModelIndex:
+        """
+        Fetches rows of node's folder and its ancestors until node is loaded.
+        :return: Index of node
+        """
+        folder = self.folderOf(node)
+        if folder is self.results and node.id not in self.filter:
+            return QModelIndex()
+        if folder is not self.root and folder is not self.results:
+            self.reveal(folder) # Parent folder has to be loaded before its children
+        parent = self.indexOf(folder) if folder is not self.results else QModelIndex()
+        row = folder.rowOf(node)
+        while folder.loaded <= row:
+            self.fetchMore(parent)
+        return self.createIndex(row, 0, node)
+
+    def insertNode(self, node):
+        """
+        Appends node to the end of its folder. Called after the node was added to AppDataModel.
+        """
+        container = self.containerOf(node)
+        node.position = container.nextPosition()
+        if self.filter is None:
+            self.appendChild(container, node)
+            return
+        self.appendChild(container, node, False)
+        if not isinstance(node, Folder):
+            self.filter.add(node.id) # New requests stay visible while searching
+            self.appendChild(self.results, node)
+
+    def appendChild(self, folder: Folder, node, notify: bool = True):
+        row = len(folder.children)
+        folder.children.append(node)
+        if folder.indexed == row:
+            folder.rows[node.id] = row
+            folder.indexed += 1
+        if folder.loaded == row:
+            # Folder is fully loaded, otherwise the row is exposed by the next fetchMore
+            if notify:
+                self.beginInsertRows(self.parentIndex(folder), row, row)
+            folder.loaded += 1
+            if notify:
+                self.endInsertRows()
+
+    def removeNode(self, node):
+        """
+        Removes node from its folder. Called before the node is removed from AppDataModel.
+        """
+        if self.filter is None:
+            self.removeChild(self.containerOf(node), node)
+            return
+        self.removeChild(self.containerOf(node), node, False)
+        if node.id in self.filter:
+            self.removeChild(self.results, node)
+            self.filter.discard(node.id)
+
+    def removeChild(self, folder: Folder, node, notify: bool = True):
+        row = folder.rowOf(node)
+        loaded = row < folder.loaded
+        if loaded and notify:
+            self.beginRemoveRows(self.parentIndex(folder), row, row)
+        del folder.children[row]
+        del folder.rows[node.id]
+        folder.invalidateRows(row)
+        if loaded:
+            folder.loaded -= 1
+            if notify:
+                self.endRemoveRows()
+
+    def moveChild(self, node, row: int) -> list:
+        """
+        Moves node to another row of its folder with a single row move, positions of other nodes are kept.
+        :return: Nodes whose position changed and should be saved
+        """
+        folder = self.containerOf(node)
+        source = folder.rowOf(node)
+        if row == source or not 0 <= row < len(folder.children):
+            return []
+        notify = self.filter is None
+        parent = self.parentIndex(folder) if notify else QModelIndex()
+        while notify and folder.loaded <= max(row, source):
+            self.fetchMore(parent)
+        if notify:
+            # Destination of beginMoveRows is a row before the move
+            self.beginMoveRows(parent, source, source, parent, row + 1 if row > source else row)
+        del folder.children[source]
+        folder.children.insert(row, node)
+        folder.invalidateRows(min(row, source))
+        changed = [node]
+        if folder.implicit:
+            # Rows read as positions may have shifted since the file was written, so all of them are saved once
+            for position, child in enumerate(folder.children):
+                child.position = float(position)
+            folder.implicit = False
+            changed = list(folder.children)
+        else:
+            before = folder.children[row - 1].position if row > 0 else folder.children[1].position - 2.0
+            after = folder.children[row + 1].position if row + 1 < len(folder.children) else before + 2.0
+            node.position = (before + after) / 2
+            if not before < node.position < after: # Out of float precision between the neighbours
+                for position, child in enumerate(folder.children):
+                    child.position = float(position)
+                changed = list(folder.children)
+        if notify:
+            self.endMoveRows()
+        return changed
+
+    def parentIndex(self, folder: Folder) -> QModelIndex:
+        return QModelIndex() if folder is self.root or folder is self.results else self.indexOf(folder)
+
+    def nodeChanged(self, node):
+        index = self.indexOf(node)
+        if index.isValid():
+            self.dataChanged.emit(index, index, [Qt.ItemDataRole.DisplayRole])
+
+    def setFilter(self, ids: set[str] | None):
+        """
+        :param ids: Ids of requests to show as a flat list or None to show the whole tree
+        """
+        if ids is None and self.filter is None:
+            return
+        self.beginResetModel()
+        self.filter = None if ids is None else set(ids)
+        self.results.resetChildren([] if ids is None else
+                                   [request for requestId, request in self.model.requests.items() if requestId in ids])
+        self.endResetModel()
+
+    # QAbstractItemModel
+
+    def index(self, row, column, parent = QModelIndex()):
+        folder = self.childrenFolder(parent)
+        if folder is None or column != 0 or not 0 <= row < folder.loaded:
+            return QModelIndex()
+        return self.createIndex(row, 0, folder.children[row])
+
+    def parent(self, index = QModelIndex()):
+        if not index.isValid():
+            return QModelIndex()
+        folder = self.folderOf(index.internalPointer())
+        if folder is self.root or folder is self.results:
+            return QModelIndex()
+        return self.createIndex(self.folderOf(folder).rowOf(folder), 0, folder)
+
+    def rowCount(self, parent = QModelIndex()):
+        folder = self.childrenFolder(parent)
+        return 0 if folder is None else folder.loaded
+
+    def columnCount(self, parent = QModelIndex()):
+        return 1
+
+    def hasChildren(self, parent = QModelIndex()):
+        folder = self.childrenFolder(parent)
+        return folder is not None and len(folder.children) > 0
+
+    def canFetchMore(self, parent):
+        folder = self.childrenFolder(parent)
+        return folder is not None and folder.loaded < len(folder.children)
+
+    def fetchMore(self, parent):
+        folder = self.childrenFolder(parent)
+        if folder is None or folder.loaded >= len(folder.children):
+            return
+        count = min(FETCH_BATCH, len(folder.children) - folder.loaded)
+        self.beginInsertRows(parent, folder.loaded, folder.loaded + count - 1)
+        folder.loaded += count
+        self.endInsertRows()
+
+    def data(self, index, role = Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return QVariant()
+        node = index.internalPointer()
+        if role in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.EditRole):
+            return node.name
+        if role == Qt.ItemDataRole.DecorationRole:
+            if not self.icons:
+                self.icons["folder"] = QApplication.style().standardIcon(QStyle.StandardPixmap.SP_DirIcon)
+                self.icons["request"] = QIcon("assets/http.svg")
+            return self.icons["folder" if isinstance(node, Folder) else "request"]
+        return QVariant()
+
+    def setData(self, index, value, role = Qt.ItemDataRole.EditRole):
+        if not index.isValid() or role != Qt.ItemDataRole.EditRole or str(value).strip() == "":
+            return False
+        node = index.internalPointer()
+        if not isinstance(node, Folder):
+            return False
+        node.name = str(value)
+        self.model.markFoldersChanged()
+        self.dataChanged.emit(index, index, [role])
+        return True
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.ItemFlag.ItemIsEnabled
+        flags = Qt.ItemFlag.ItemIsSelectable | Qt.ItemFlag.ItemIsEnabled
+        if isinstance(index.internalPointer(), Folder):
+            flags |= Qt.ItemFlag.ItemIsEditable
+        return flags
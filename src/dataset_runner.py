@@ -0,0 +1,219 @@
+import csv
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Iterator
+
+import requests
+
+import src.network as network
+import src.retry as retry
+import src.secrets_backend as secrets
+import src.templating as templating
+
+# Requests that are executed at the same time by default
+CONCURRENCY = 8
+
+
+class DatasetReader:
+    """
+    Streams rows of a CSV (with header) or JSONL file as dicts without loading the file into memory.
+    DatasetReader#position is the amount of bytes read so far, which is used to report progress.
+    start and end limit reading to a part of the file (see splitDataset), header of a CSV file is always read.
+    """
+    def __init__(self, file: str, start: int = 0, end: int | None = None):
+        self.file = file
+        self.start = start
+        self.end = os.path.getsize(file) if end is None else end
+        self.size = max(self.end - start, 1)
+        self.position = 0
+
+    def lines(self, fr) -> Iterator[str]:
+        for line in fr:
+            if self.start + self.position >= self.end:
+                return
+            self.position += len(line)
+            yield line.decode("utf-8")
+
+    def __iter__(self) -> Iterator[dict]:
+        self.position = 0
+        with open(self.file, "rb") as fr:
+            if self.file.lower().endswith(".csv"):
+                header = next(csv.reader([fr.readline().decode("utf-8")]), [])
+                fr.seek(max(self.start, fr.tell()))
+                self.position = fr.tell() - self.start
+                yield from csv.DictReader(self.lines(fr), header)
+            else:
+                fr.seek(self.start)
+                for line in self.lines(fr):
+                    if line.strip() != "":
+                        yield json.loads(line)
+
+
+def splitDataset(file: str, parts: int) -> list[tuple[int, int, int]]:
+    """
+    Splits a dataset into parts of about the same size that start at row boundaries, so processes of
+    ProcessRunner parse only their own rows. Lines are scanned without parsing them, only quotes of CSV files
+    are counted to find line breaks inside of quoted values.
+    :return: (start, end, index of the first row) of every part, see DatasetReader
+    """
+    size = os.path.getsize(file)
+    isCsv = file.lower().endswith(".csv")
+    bounds = []
+    rows = 0
+    quoted = False
+    with open(file, "rb") as fr:
+        if isCsv:
+            fr.readline() # Header
+        offset = fr.tell()
+        for line in fr:
+            if not quoted:
+                if len(bounds) < parts and offset >= size * len(bounds) // parts:
+                    bounds.append((offset, rows))
+                if line.strip() != b"":
+                    rows += 1 # Blank lines are skipped by DatasetReader
+            if isCsv and line.count(b'"') % 2 == 1:
+                quoted = not quoted
+            offset += len(line)
+    while len(bounds) < parts: # Less rows than parts, the last parts are empty
+        bounds.append((offset, rows))
+    ends = [start for start, row in bounds[1:]] + [size]
+    return [(start, end, row) for (start, row), end in zip(bounds, ends)]
+
+
+class RunStopped(Exception):
+    pass
+
+
+class RowResult:
+    __slots__ = ("row", "status", "elapsed", "testResults", "error", "attempts")
+
+    def __init__(self, row: int, status: int = 0, elapsed: float = 0, testResults: list = None, error: str = "",
+                 attempts: int = 1):
+        self.row = row
+        self.status = status
+        self.elapsed = elapsed
+        self.testResults = [] if testResults is None else testResults
+        self.error = error
+        self.attempts = attempts
+
+    @staticmethod
+    def fromJSON(data: dict):
+        return RowResult(data["row"], data["status"], data["elapsed"], data["tr"], data["error"], data["attempts"])
+
+    def passed(self) -> bool:
+        return self.error == "" and 200 <= self.status < 400 and all(result[1] for result in self.testResults)
+
+    def toJSON(self) -> dict:
+        return {"row": self.row, "status": self.status, "elapsed": self.elapsed, "tr": self.testResults,
+                "error": self.error, "attempts": self.attempts}
+
+
+class RunSummary:
+    def __init__(self):
+        self.total = 0
+        self.passed = 0
+        self.errors = 0
+        self.retries = 0 # attempts made in addition to the first one of every row
+        self.elapsed = 0.0 # total time of the run in seconds
+        self.statuses: dict[int, int] = {}
+
+    def add(self, result: RowResult):
+        self.total += 1
+        self.passed += result.passed()
+        self.errors += result.error != ""
+        self.retries += result.attempts - 1
+        self.statuses[result.status] = self.statuses.get(result.status, 0) + 1
+
+    def toText(self) -> str:
+        rate = self.total / self.elapsed if self.elapsed > 0 else 0
+        statuses = ", ".join(f"{status}: {count}" for status, count in sorted(self.statuses.items()))
+        return (f"Выполнено запросов: {self.total} ({rate:.1f} в секунду)\n"
+                f"Успешно: {self.passed}, с ошибками соединения: {self.errors}, повторных попыток: {self.retries}\n"
+                f"Статус коды: {statuses}")
+
+
+class DatasetRunner:
+    """
+    Executes an AppRequest once per row of a dataset. Row values are available as {{column}} variables.
+    At most `concurrency` requests run at the same time, rows are read only as fast as requests are sent.
+    Every worker thread keeps its own requests.Session, so connections are reused between rows.
+    Rows are retried and rate limited according to the retry policy of the request, the limit is shared by all workers.
+    """
+    def __init__(self, request, variables: dict, concurrency: int = CONCURRENCY):
+        self.request = request
+        self.stopped = False
+        # Workers waiting for backoff or rate limit wake up when the run is stopped
+        self.sleep = retry.cancellableSleep(self.checkStopped)
+        self.template = request.buildRequest() # built once, rendered for every row
+        self.variables = variables
+        self.concurrency = concurrency
+        self.local = threading.local()
+
+    def checkStopped(self):
+        if self.stopped:
+            raise RunStopped()
+
+    def session(self) -> requests.Session:
+        if not hasattr(self.local, "session"):
+            self.local.session = network.newSession()
+        return self.local.session
+
+    def runRow(self, index: int, row: dict) -> RowResult:
+        variables = dict(self.variables)
+        variables.update(row)
+        try:
+            prepared = self.request.runPreRequestScript(dict(self.template), variables)
+            rendered = templating.renderRequest(prepared, variables, secrets.storage.lookup)
+            resp, body, attempts = self.request.sendWithRetries(rendered, self.session(), self.sleep)
+            text = None
+            try:
+                text = str(body.view(), encoding="utf-8")
+            except UnicodeDecodeError:
+                pass
+            results = self.request.runPostResponseScript(resp, variables, text)
+            return RowResult(index, resp.status_code, resp.elapsed.total_seconds(), results, attempts=attempts)
+        except Exception as e:
+            return RowResult(index, error=f"{type(e).__name__}: {e}")
+
+    def run(self, rows, onResult: Callable[[RowResult], None] = lambda x: None,
+            progress: Callable[[], None] = lambda: None) -> RunSummary:
+        """
+        :param rows: Iterable of dicts, for example DatasetReader
+        :param onResult: Called for every row in the calling thread
+        :param progress: Called after every finished row. Can raise an exception to stop the run.
+        """
+        summary = RunSummary()
+        self.stopped = False
+        start = time.perf_counter()
+        pending = set()
+        with ThreadPoolExecutor(self.concurrency) as executor:
+            try:
+                for index, row in enumerate(rows):
+                    pending.add(executor.submit(self.runRow, index, row))
+                    # Keep only a bounded amount of rows in flight
+                    while len(pending) >= self.concurrency * 2:
+                        pending = self.collect(pending, summary, onResult, progress)
+                while pending:
+                    pending = self.collect(pending, summary, onResult, progress)
+            finally:
+                self.stopped = True
+                for future in pending:
+                    future.cancel()
+        summary.elapsed = time.perf_counter() - start
+        return summary
+
+    def collect(self, pending: set, summary: RunSummary, onResult, progress) -> set:
+        """
+        Waits for at least one of pending rows to finish.
+        :return: Rows that are still running
+        """
+        done, notDone = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            result = future.result()
+            summary.add(result)
+            onResult(result)
+            progress()
+        return notDone
@@ -0,0 +1,338 @@
+import bisect
+import difflib
+import json
+from collections import Counter
+from typing import Callable
+
+from src.body_buffer import BodyBuffer
+
+# Unchanged lines shown around every change of a text diff
+CONTEXT_LINES = 3
+# Segments between anchors whose line counts multiply to more than that are shown as replaced
+# instead of being compared with difflib, which is quadratic in the worst case
+MAX_SEGMENT_PRODUCT = 4_000_000
+# JSON values longer than that are truncated in diff rows
+MAX_VALUE_LENGTH = 200
+# Kinds of diff rows
+EQUAL = " "
+DELETED = "-"
+INSERTED = "+"
+CHANGED = "~"
+HUNK = "@"
+TITLE = "#"
+
+
+class DiffRows:
+    """
+    Rows of a diff section. Every row is a (kind, text) tuple.
+    Subclasses may build rows on demand, so a view can show only rows it paints.
+    """
+    def __len__(self):
+        raise NotImplementedError()
+
+    def row(self, index: int) -> tuple[str, str]:
+        raise NotImplementedError()
+
+    def changes(self) -> int:
+        """
+        :return: Number of changed, deleted and inserted entries
+        """
+        raise NotImplementedError()
+
+
+class ListRows(DiffRows):
+    def __init__(self, rows: list[tuple[str, str]] | None = None):
+        self.rows = [] if rows is None else rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def row(self, index: int) -> tuple[str, str]:
+        return self.rows[index]
+
+    def changes(self) -> int:
+        return sum(1 for kind, text in self.rows if kind in (DELETED, INSERTED, CHANGED))
+
+
+class TextDiff(DiffRows):
+    """
+    Line diff of two texts grouped into hunks with CONTEXT_LINES unchanged lines around changes.
+    Only opcodes are stored, text of a row is taken from the compared lines when it is requested.
+    """
+    def __init__(self, old: list[str], new: list[str], hunks: list[list[tuple]]):
+        self.old = old
+        self.new = new
+        self.hunks = hunks
+        self.offsets = [] # Index of the first row of every hunk
+        rows = 0
+        for hunk in hunks:
+            self.offsets.append(rows)
+            rows += 1 + sum(i2 - i1 + (j2 - j1 if tag != "equal" else 0) for tag, i1, i2, j1, j2 in hunk)
+        self.rows = rows
+
+    def __len__(self):
+        return self.rows
+
+    def row(self, index: int) -> tuple[str, str]:
+        number = bisect.bisect_right(self.offsets, index) - 1
+        hunk = self.hunks[number]
+        index -= self.offsets[number]
+        if index == 0:
+            first, last = hunk[0], hunk[-1]
+            return HUNK, f"@@ -{first[1] + 1},{last[2] - first[1]} +{first[3] + 1},{last[4] - first[3]} @@"
+        index -= 1
+        for tag, i1, i2, j1, j2 in hunk:
+            if tag == "equal":
+                if index < i2 - i1:
+                    return EQUAL, self.old[i1 + index]
+                index -= i2 - i1
+                continue
+            if index < i2 - i1:
+                return DELETED, self.old[i1 + index]
+            index -= i2 - i1
+            if index < j2 - j1:
+                return INSERTED, self.new[j1 + index]
+            index -= j2 - j1
+        raise IndexError(index)
+
+    def changes(self) -> int:
+        return sum(max(i2 - i1, j2 - j1) for hunk in self.hunks for tag, i1, i2, j1, j2 in hunk if tag != "equal")
+
+
+class ResponseDiff:
+    """
+    Status, headers and body diffs of two responses as titled sections of rows.
+    """
+    def __init__(self, sections: list[tuple[str, DiffRows]]):
+        self.sections = sections
+        self.offsets = []
+        rows = 0
+        for title, section in sections:
+            self.offsets.append(rows)
+            rows += 1 + len(section)
+        self.rows = rows
+
+    def __len__(self):
+        return self.rows
+
+    def row(self, index: int) -> tuple[str, str]:
+        number = bisect.bisect_right(self.offsets, index) - 1
+        title, rows = self.sections[number]
+        index -= self.offsets[number]
+        return (TITLE, title) if index == 0 else rows.row(index - 1)
+
+    def changes(self) -> int:
+        return sum(rows.changes() for title, rows in self.sections)
+
+
+def longestIncreasing(pairs: list[tuple[int, int]]) -> list[tuple[int, int]]:
+    """
+    :param pairs: (old index, new index) pairs sorted by old index
+    :return: Longest subsequence of pairs with increasing new indexes (patience sorting)
+    """
+    tails = [] # New index of the last pair of the best subsequence of every length
+    tailPairs = []
+    previous = [-1] * len(pairs)
+    for n, (i, j) in enumerate(pairs):
+        length = bisect.bisect_left(tails, j)
+        if length == len(tails):
+            tails.append(j)
+            tailPairs.append(n)
+        else:
+            tails[length] = j
+            tailPairs[length] = n
+        previous[n] = tailPairs[length - 1] if length > 0 else -1
+    result = []
+    n = tailPairs[-1] if tailPairs else -1
+    while n != -1:
+        result.append(pairs[n])
+        n = previous[n]
+    return result[::-1]
+
+
+def diffLines(old: list[str], new: list[str], progress: Callable[[int], None] = lambda percent: None) -> list[tuple]:
+    """
+    Line diff that stays fast on large texts: common prefix and suffix are skipped, lines that occur exactly once
+    in both texts are matched as anchors (like patience diff) and only segments between anchors are compared
+    with difflib.
+    :param progress: Called with percent of compared lines, can raise an exception to stop the diff
+    :return: Opcodes like difflib.SequenceMatcher#get_opcodes
+    """
+    prefix = 0
+    while prefix < len(old) and prefix < len(new) and old[prefix] == new[prefix]:
+        prefix += 1
+    suffix = 0
+    while (suffix < len(old) - prefix and suffix < len(new) - prefix
+           and old[len(old) - 1 - suffix] == new[len(new) - 1 - suffix]):
+        suffix += 1
+    oldEnd, newEnd = len(old) - suffix, len(new) - suffix
+
+    oldCount = Counter(old[prefix:oldEnd])
+    newCount = Counter(new[prefix:newEnd])
+    newIndex = {new[j]: j for j in range(prefix, newEnd) if newCount[new[j]] == 1}
+    pairs = [(i, newIndex[old[i]]) for i in range(prefix, oldEnd) if oldCount[old[i]] == 1 and old[i] in newIndex]
+    anchors = longestIncreasing(pairs) + [(oldEnd, newEnd)]
+
+    opcodes = [("equal", 0, prefix, 0, prefix)]
+    i, j = prefix, prefix
+    for number, (anchorI, anchorJ) in enumerate(anchors):
+        if anchorI - i > 0 and anchorJ - j > 0 and (anchorI - i) * (anchorJ - j) <= MAX_SEGMENT_PRODUCT:
+            matcher = difflib.SequenceMatcher(None, old[i:anchorI], new[j:anchorJ])
+            opcodes.extend((tag, i + i1, i + i2, j + j1, j + j2) for tag, i1, i2, j1, j2 in matcher.get_opcodes())
+        elif anchorI > i or anchorJ > j:
+            tag = "replace" if anchorI > i and anchorJ > j else "delete" if anchorI > i else "insert"
+            opcodes.append((tag, i, anchorI, j, anchorJ))
+        if anchorI < oldEnd:
+            opcodes.append(("equal", anchorI, anchorI + 1, anchorJ, anchorJ + 1))
+        i, j = anchorI + 1, anchorJ + 1
+        progress((number + 1) * 100 // len(anchors))
+    opcodes.append(("equal", oldEnd, len(old), newEnd, len(new)))
+
+    merged = []
+    for opcode in opcodes:
+        tag, i1, i2, j1, j2 = opcode
+        if i1 == i2 and j1 == j2:
+            continue
+        if merged and merged[-1][0] == tag == "equal":
+            merged[-1] = (tag, merged[-1][1], i2, merged[-1][3], j2)
+        else:
+            merged.append(opcode)
+    return merged
+
+
+def groupHunks(opcodes: list[tuple], context: int = CONTEXT_LINES) -> list[list[tuple]]:
+    """
+    Same as difflib.SequenceMatcher#get_grouped_opcodes, but for opcodes of diffLines.
+    """
+    if not any(tag != "equal" for tag, i1, i2, j1, j2 in opcodes):
+        return []
+    opcodes = list(opcodes)
+    if opcodes[0][0] == "equal":
+        tag, i1, i2, j1, j2 = opcodes[0]
+        opcodes[0] = tag, max(i1, i2 - context), i2, max(j1, j2 - context), j2
+    if opcodes[-1][0] == "equal":
+        tag, i1, i2, j1, j2 = opcodes[-1]
+        opcodes[-1] = tag, i1, min(i2, i1 + context), j1, min(j2, j1 + context)
+    hunks = []
+    hunk = []
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag == "equal" and i2 - i1 > context * 2:
+            hunk.append((tag, i1, i1 + context, j1, j1 + context))
+            hunks.append(hunk)
+            hunk = []
+            i1, j1 = i2 - context, j2 - context
+        hunk.append((tag, i1, i2, j1, j2))
+    if hunk and not (len(hunk) == 1 and hunk[0][0] == "equal"):
+        hunks.append(hunk)
+    return hunks
+
+
+def diffText(old: str, new: str, progress: Callable[[int], None] = lambda percent: None) -> TextDiff:
+    oldLines = old.splitlines()
+    newLines = new.splitlines()
+    return TextDiff(oldLines, newLines, groupHunks(diffLines(oldLines, newLines, progress)))
+
+
+def formatValue(value) -> str:
+    text = json.dumps(value, ensure_ascii=False, sort_keys=True)
+    return text if len(text) <= MAX_VALUE_LENGTH else text[:MAX_VALUE_LENGTH] + "…"
+
+
+def diffJson(old, new, path: str = "$", rows: list | None = None) -> list[tuple[str, str]]:
+    """
+    Structural diff of two parsed JSON documents. Objects are compared by keys.
+    Arrays of equal length are compared by indexes, other arrays are aligned by their items first,
+    so an item inserted at the beginning is reported once instead of changing every following index.
+    :return: Rows with JSONPath of every changed, deleted and inserted value
+    """
+    rows = [] if rows is None else rows
+    if isinstance(old, dict) and isinstance(new, dict):
+        for key in old:
+            child = f"{path}.{key}" if key.isidentifier() else f"{path}[{json.dumps(key, ensure_ascii=False)}]"
+            if key not in new:
+                rows.append((DELETED, f"{child}: {formatValue(old[key])}"))
+            else:
+                diffJson(old[key], new[key], child, rows)
+        for key in new:
+            if key not in old:
+                child = f"{path}.{key}" if key.isidentifier() else f"{path}[{json.dumps(key, ensure_ascii=False)}]"
+                rows.append((INSERTED, f"{child}: {formatValue(new[key])}"))
+    elif isinstance(old, list) and isinstance(new, list):
+        if len(old) == len(new):
+            for i in range(len(old)):
+                diffJson(old[i], new[i], f"{path}[{i}]", rows)
+            return rows
+        matcher = difflib.SequenceMatcher(None, [formatValue(item) for item in old], [formatValue(item) for item in new],
+                                          autojunk=False)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == "equal":
+                continue
+            common = min(i2 - i1, j2 - j1) if tag == "replace" else 0
+            for k in range(common):
+                diffJson(old[i1 + k], new[j1 + k], f"{path}[{j1 + k}]", rows)
+            for k in range(i1 + common, i2):
+                rows.append((DELETED, f"{path}[{k}]: {formatValue(old[k])}"))
+            for k in range(j1 + common, j2):
+                rows.append((INSERTED, f"{path}[{k}]: {formatValue(new[k])}"))
+    elif type(old) is not type(new) or old != new:
+        rows.append((CHANGED, f"{path}: {formatValue(old)} → {formatValue(new)}"))
+    return rows
+
+
+def diffHeaders(old: dict, new: dict) -> ListRows:
+    """
+    Header names are compared case-insensitively.
+    """
+    oldHeaders = {name.lower(): (name, value) for name, value in old.items()}
+    newHeaders = {name.lower(): (name, value) for name, value in new.items()}
+    rows = []
+    for key, (name, value) in oldHeaders.items():
+        if key not in newHeaders:
+            rows.append((DELETED, f"{name}: {value}"))
+        elif newHeaders[key][1] != value:
+            rows.append((CHANGED, f"{name}: {value} → {newHeaders[key][1]}"))
+    for key, (name, value) in newHeaders.items():
+        if key not in oldHeaders:
+            rows.append((INSERTED, f"{name}: {value}"))
+    return ListRows(rows)
+
+
+def parseJson(text: str):
+    """
+    :return: Parsed JSON or None if text is not a JSON object or array
+    """
+    if not text.lstrip().startswith(("{", "[")):
+        return None
+    try:
+        return json.loads(text)
+    except ValueError:
+        return None
+
+
+def diffBodies(old: dict, new: dict, progress: Callable[[int], None] = lambda percent: None) -> tuple[str, DiffRows]:
+    """
+    :param old: Body JSON ({"t": ..., "d": ...}) of AppRequest
+    :return: Title of the body section and its rows
+    """
+    if old["t"] == new["t"] == 1:
+        oldJson, newJson = parseJson(old["d"]), parseJson(new["d"])
+        if oldJson is not None and newJson is not None:
+            return "Тело (JSON)", ListRows(diffJson(oldJson, newJson))
+        return "Тело", diffText(old["d"], new["d"], progress)
+    if old["t"] in (2, 3) and new["t"] in (2, 3):
+        oldBody, newBody = BodyBuffer.coerce(old["d"]), BodyBuffer.coerce(new["d"])
+        if oldBody.view() == newBody.view():
+            return "Тело (двоичные данные)", ListRows()
+        return "Тело (двоичные данные)", ListRows([(CHANGED, f"Содержимое различается: {len(oldBody)} → {len(newBody)} байт")])
+    if old["t"] == new["t"] == 0:
+        return "Тело", ListRows()
+    return "Тело", ListRows([(CHANGED, "Тип тела изменился")])
+
+
+def diffResponses(old: dict, new: dict, progress: Callable[[int], None] = lambda percent: None) -> ResponseDiff:
+    """
+    :param old: Response snapshot made by AppRequest#responseSnapshot
+    """
+    status = ListRows([(CHANGED, f"{old['s']} → {new['s']}")] if old["s"] != new["s"] else [])
+    return ResponseDiff([("Статус", status), ("Заголовки", diffHeaders(old["h"], new["h"])),
+                         diffBodies(old["b"], new["b"], progress)])
@@ -0,0 +1,241 @@
+import contextlib
+import json
+import os
+import re
+import threading
+import time
+from typing import Callable
+
+import requests
+
+import src.limits as limits
+from src.body_buffer import CHUNK_SIZE
+
+# Connection drops in a row after which download fails
+MAX_RESUMES = 5
+# Delay before resuming an interrupted download in seconds, doubled for every next attempt
+RESUME_DELAY = 0.5
+# Minimal interval between progress reports in seconds
+PROGRESS_INTERVAL = 0.2
+# Interval of calling `check` of download while waiting for the server in seconds
+CHECK_INTERVAL = 0.2
+CONTENT_RANGE_PATTERN = re.compile(r"bytes (\d+)-\d+/(\d+|\*)")
+
+
+class DownloadError(Exception):
+    pass
+
+
+class DownloadState:
+    """
+    Resume information kept in <file>.part.json next to <file>.part while download is not finished,
+    so a cancelled or crashed download continues from where it stopped.
+    """
+    def __init__(self, url: str, resumable: bool = False, validator: str | None = None, total: int | None = None):
+        self.url = url
+        self.resumable = resumable # Server answered with Accept-Ranges: bytes
+        self.validator = validator # ETag or Last-Modified of the first response, sent with If-Range
+        self.total = total
+
+    @staticmethod
+    def load(file: str, url: str):
+        try:
+            with open(file, "r", encoding="utf-8") as fr:
+                data = json.load(fr)
+        except (OSError, ValueError):
+            return None
+        if data.get("url") != url:
+            return None
+        return DownloadState(url, data.get("r", False), data.get("v"), data.get("t"))
+
+    def save(self, file: str):
+        with open(file, "w", encoding="utf-8") as fw:
+            json.dump({"url": self.url, "r": self.resumable, "v": self.validator, "t": self.total}, fw)
+
+
+class DownloadResult:
+    def __init__(self, file: str, size: int, elapsed: float, resumes: int, status: int):
+        self.file = file
+        self.size = size
+        self.elapsed = elapsed
+        self.resumes = resumes # Range requests made after the first request
+        self.status = status # Status of the first response
+
+    def speed(self) -> float:
+        return self.size / self.elapsed if self.elapsed > 0 else 0
+
+
+def formatSize(size: float) -> str:
+    for unit in ("Б", "КБ", "МБ", "ГБ"):
+        if size < 1024 or unit == "ГБ":
+            return f"{size:.1f} {unit}" if unit != "Б" else f"{int(size)} {unit}"
+        size /= 1024
+
+
+def awaitResponse(send: Callable[[], requests.Response], check: Callable[[], None]) -> requests.Response:
+    """
+    Sends a request in a daemon thread, so a server that does not answer can not block cancellation.
+    :param check: Called every CHECK_INTERVAL seconds until headers are received, should raise an exception
+    to stop waiting. A response that arrives after that is closed.
+    """
+    outcome = []
+    done = threading.Event()
+    lock = threading.Lock()
+    abandoned = False
+
+    def run():
+        try:
+            result = send()
+        except Exception as e:
+            result = e
+        with lock:
+            if abandoned:
+                if isinstance(result, requests.Response):
+                    result.close()
+                return
+            outcome.append(result)
+            done.set()
+
+    threading.Thread(target=run, daemon=True).start()
+    try:
+        while not done.wait(CHECK_INTERVAL):
+            check()
+    except BaseException:
+        with lock:
+            abandoned = True
+            if outcome and isinstance(outcome[0], requests.Response):
+                outcome[0].close()
+        raise
+    if isinstance(outcome[0], Exception):
+        raise outcome[0]
+    return outcome[0]
+
+
+@contextlib.contextmanager
+def abortOnCheck(resp: requests.Response, check: Callable[[], None]):
+    """
+    Calls check from another thread every CHECK_INTERVAL seconds while the body of resp is read.
+    When check raises, the connection is shut down, so a read blocked by a stalled server fails,
+    and the exception of check is raised instead of the connection error.
+    """
+    stopped = threading.Event()
+    errors = []
+
+    def watch():
+        while not stopped.wait(CHECK_INTERVAL):
+            try:
+                check()
+            except Exception as e:
+                errors.append(e)
+                limits.abortResponse(resp)
+                return
+
+    watcher = threading.Thread(target=watch, daemon=True)
+    watcher.start()
+    try:
+        yield
+    except Exception as e:
+        if errors:
+            raise errors[0] from e
+        raise
+    finally:
+        stopped.set()
+        watcher.join()
+
+
+def download(request: dict, file: str, session: requests.Session | None = None, cookies=None, proxies=None,
+             timeout: tuple[float | None, float | None] = (None, None),
+             progress: Callable[[int, int | None, float], None] = lambda downloaded, total, speed: None,
+             sleep: Callable[[float], None] = time.sleep,
+             check: Callable[[], None] = lambda: None) -> DownloadResult:
+    """
+    Streams response of a request built by AppRequest#buildRequest directly into a file.
+    Data goes to <file>.part, which replaces the file when download is complete.
+    Interrupted downloads are resumed with Range requests if the server supports them,
+    If-Range makes the server send the whole body again if it has changed since.
+    :param progress: Receives downloaded bytes, total size (None if unknown) and speed in bytes per second.
+    Can raise an exception to stop the download, in that case .part file is kept for resuming.
+    :param proxies: `proxies` argument of requests, see network.NetworkSettings#proxies
+    :param timeout: Connect and read timeout, see limits.RequestLimits#timeout. Timed out attempts are resumed
+    like dropped connections. The deadline is not applied, downloads are meant for bodies that take long.
+    :param check: Called while waiting for the server, independently of arriving data.
+    Can raise an exception to stop the download like progress.
+    """
+    session = requests.Session() if session is None else session
+    partFile = file + ".part"
+    stateFile = partFile + ".json"
+    state = DownloadState.load(stateFile, request["url"]) if os.path.exists(partFile) else None
+    if state is None or not state.resumable:
+        state = DownloadState(request["url"])
+        open(partFile, "wb").close()
+    downloaded = os.path.getsize(partFile)
+    body = request.get("body")
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    start = time.perf_counter()
+    startSize = downloaded
+    lastReport = 0.0
+    resumes = 0
+    failures = 0
+    firstStatus = None
+    while True:
+        headers = dict(request["headers"])
+        if downloaded > 0:
+            headers["Range"] = f"bytes={downloaded}-"
+            if state.validator is not None:
+                headers["If-Range"] = state.validator
+            resumes += 1
+        try:
+            data = body.open() if hasattr(body, "open") else body # BodyBuffer is read again by every attempt
+            resp = awaitResponse(lambda: session.request(request["method"], request["url"], headers=headers,
+                                                         data=data, cookies=cookies, proxies=proxies,
+                                                         timeout=timeout, stream=True), check)
+            with resp, abortOnCheck(resp, check):
+                firstStatus = resp.status_code if firstStatus is None else firstStatus
+                if resp.status_code == 416 and state.total is not None and downloaded == state.total:
+                    break # Everything was already downloaded
+                if resp.status_code == 206:
+                    match = CONTENT_RANGE_PATTERN.match(resp.headers.get("Content-Range", ""))
+                    if match is None or int(match.group(1)) != downloaded:
+                        raise DownloadError("Сервер вернул неверный Content-Range")
+                    if match.group(2) != "*":
+                        state.total = int(match.group(2))
+                    mode = "ab"
+                elif resp.status_code >= 400:
+                    raise DownloadError(f"Сервер ответил статус кодом {resp.status_code}")
+                else:
+                    # Server ignored Range or the file has changed, start from the beginning
+                    downloaded = 0
+                    length = resp.headers.get("Content-Length")
+                    # iter_content decodes Content-Encoding, so sizes of the file do not match byte ranges of the body
+                    encoded = "Content-Encoding" in resp.headers
+                    state.total = int(length) if length is not None and not encoded else None
+                    state.resumable = resp.headers.get("Accept-Ranges", "").lower() == "bytes" and not encoded
+                    state.validator = resp.headers.get("ETag", resp.headers.get("Last-Modified"))
+                    mode = "wb"
+                state.save(stateFile)
+                with open(partFile, mode) as fw:
+                    for chunk in resp.iter_content(CHUNK_SIZE):
+                        fw.write(chunk)
+                        downloaded += len(chunk)
+                        failures = 0
+                        now = time.perf_counter()
+                        if now - lastReport >= PROGRESS_INTERVAL:
+                            lastReport = now
+                            progress(downloaded, state.total, (downloaded - startSize) / max(now - start, 1e-9))
+            if state.total is None or downloaded >= state.total:
+                break
+            raise requests.exceptions.ChunkedEncodingError("Connection closed before the whole body was received")
+        except (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError,
+                requests.exceptions.Timeout):
+            failures += 1
+            if failures > MAX_RESUMES:
+                raise
+            if not state.resumable:
+                downloaded = 0 # Server can not resume, download from the beginning
+            sleep(RESUME_DELAY * 2 ** (failures - 1))
+    elapsed = time.perf_counter() - start
+    progress(downloaded, state.total, (downloaded - startSize) / max(elapsed, 1e-9))
+    os.replace(partFile, file)
+    os.remove(stateFile)
+    return DownloadResult(file, downloaded, elapsed, resumes, firstStatus)
@@ -1,15 +1,31 @@
-import base64
-from io import BytesIO
-
-from PIL import Image
 from PyQt6.QtCore import QPoint, Qt, pyqtSignal, QSize
 from PyQt6.QtGui import QIcon, QScreen, QFontDatabase, QGuiApplication, QPixmap
-from PyQt6.QtWidgets import QLabel, QPushButton, QListWidgetItem, QMainWindow, QMessageBox, QWidget, QVBoxLayout, \
+from PyQt6.QtWidgets import QLabel, QPushButton, QMainWindow, QMessageBox, QWidget, QVBoxLayout, \
     QHBoxLayout, QSizePolicy, QPlainTextEdit, QScrollArea, QFileDialog
 
 import src.backend as bck
+import src.images as images
 import src.shared_constrains as shared_constrains
 import src.utils as utils
+from src.body_buffer import BodyBuffer
+from src.profiling import profiler
+
+
+# Only this many bytes of binary bodies are shown as hex. Formatting whole multi-megabyte bodies freezes the GUI
+HEX_PREVIEW_LIMIT = 64 * 1024
+
+
+def hexPreview(body: BodyBuffer) -> str:
+    """
+    :return: Hex representation of the beginning of body. 24 bytes per line, split into groups of 4 bytes.
+    """
+    view = body.view()
+    bytes_hex = view[:HEX_PREVIEW_LIMIT].hex(sep=" ", bytes_per_sep=-4).split(" ")
+    bytes_hex = map(lambda x: " ".join(x).upper(), [bytes_hex[i : i + 6] for i in range(0, len(bytes_hex), 6)])
+    text = "\n".join(bytes_hex)
+    if len(view) > HEX_PREVIEW_LIMIT:
+        text += f"\n... ({len(view) - HEX_PREVIEW_LIMIT} more bytes)"
+    return text
 
 
 class QTitleLabel(QLabel):
@@ -37,12 +53,6 @@ class WarningToast(QLabel):
         super().__init__(text)
 
 
-class LinkedListWidgetItem(QListWidgetItem):
-    def __init__(self, *args):
-        super().__init__(*args)
-        self.linkedIndex: int = -1
-
-
 class CustomWindow(QMainWindow):
     """
     Base class for project's windows
@@ -84,6 +94,8 @@ class CustomWindow(QMainWindow):
 class AssetViewWidget(QWidget):
     # Signals
     dataTypeChanged = pyqtSignal(int, utils.Holder)
+    assetEdited = pyqtSignal() # Emitted only when user changes the asset
+    exportRequested = pyqtSignal() # Export button was pressed, see AssetViewWidget#exportAsset
 
     """
     Widget for viewing different types of data.
@@ -99,6 +111,7 @@ class AssetViewWidget(QWidget):
         super().__init__()
         self.loadedAssetType = 0
         self.displayAssetType = 0
+        self.updating = False # True while updateAsset changes widgets, so their signals are not user edits
         layout = QVBoxLayout()
         self.setLayout(layout)
 
@@ -115,16 +128,17 @@ class AssetViewWidget(QWidget):
         controlsLayout.addWidget(controlsImageType)
         controlsLayout.addStretch()
         controlsExportFile = IconButton(QIcon("assets/exportFile.png"))
+        controlsExportFile.clicked.connect(self.exportRequested.emit)
         controlsLayout.addWidget(controlsExportFile)
         if allowEditing:
             controlsUploadFile = IconButton(QIcon("assets/uploadFile.png"))
             controlsUploadFile.clicked.connect(self.importAsset)
             controlsLayout.addWidget(controlsUploadFile)
             controlsCreate = IconButton(QIcon("assets/create.png"))
-            controlsCreate.clicked.connect(lambda: self.updateAsset(1, ""))
+            controlsCreate.clicked.connect(lambda: self.editAsset(1, ""))
             controlsLayout.addWidget(controlsCreate)
         controlsErase = IconButton(QIcon("assets/erase.png"))
-        controlsErase.clicked.connect(lambda: self.updateAsset(0, ""))
+        controlsErase.clicked.connect(lambda: self.editAsset(0, ""))
         controlsLayout.addWidget(controlsErase)
         controls.setLayout(controlsLayout)
         controlsLayout.setContentsMargins(5, 8, 5, 0)
@@ -192,8 +206,9 @@ class AssetViewWidget(QWidget):
         self.switchWidget()
 
     def handleTextDisplayEdit(self):
-        if self.loadedAssetType == 1:
+        if self.loadedAssetType == 1 and not self.updating:
             self.json.value["d"] = self.displayContentWidgets[1].toPlainText()
+            self.assetEdited.emit()
 
     def handleDisplayTypeBtn(self):
         if self.loadedAssetType == 0:
@@ -212,18 +227,57 @@ class AssetViewWidget(QWidget):
         fileName = QFileDialog.getOpenFileName(
             self, 'Выбрать файл', '',
             'Все файлы (*);;JPG Изображение (*.jpg);;PNG Изображение (*.png);;Текстовый файл (*.txt)')[0]
-        extension = fileName.split(".")[-1]
+        if fileName == "":
+            return
         try:
-            if extension in ["jpg", "png", "jpeg", "webp", "tiff"]:
-                with open(fileName, "rb") as fr:
-                    self.updateAsset(2, fr.read())
+            with open(fileName, "rb") as fr:
+                data = fr.read()
+            # Images are recognized by content, bytes go to the body as they are
+            if images.sniffImageFormat(data) is not None:
+                self.editAsset(2, data)
             else:
-                with open(fileName, "r", encoding="utf-8") as fr:
-                    self.updateAsset(1, fr.read())
+                self.editAsset(1, data.decode("utf-8"))
         except Exception:
             QMessageBox.warning(self.window(), "Внимание", "Не удалось прочитать файл!")
 
+    def exportAsset(self):
+        """
+        Writes loaded asset to a file selected in QFileDialog. Binary data is written directly from its BodyBuffer.
+        """
+        if self.loadedAssetType == 0:
+            QMessageBox.warning(self.window(), "Внимание", "Нет данных для сохранения")
+            return
+        fileName = QFileDialog.getSaveFileName(self, 'Сохранить в файл', '', 'Все файлы (*)')[0]
+        if fileName == "":
+            return
+        try:
+            if self.loadedAssetType == 1:
+                with open(fileName, "w", encoding="utf-8") as fw:
+                    fw.write(self.json.value["d"])
+            else:
+                with open(fileName, "wb") as fw:
+                    fw.write(BodyBuffer.coerce(self.json.value["d"]).view())
+        except OSError:
+            QMessageBox.warning(self.window(), "Внимание", "Не удалось записать файл!")
+
+    def editAsset(self, assetType: int, data):
+        """
+        Same as updateAsset, but for changes made by user.
+        """
+        self.updateAsset(assetType, data)
+        self.assetEdited.emit()
+
+    @profiler.timed("widget.updateAsset", "frontend")
     def updateAsset(self, assetType: int, data, json=False):
+        self.updating = True
+        try:
+            self.updateAsset0(assetType, data, json)
+        finally:
+            self.updating = False
+        self.switchWidget()
+        self.dataTypeChanged.emit(assetType, self.json)
+
+    def updateAsset0(self, assetType: int, data, json: bool):
         self.loadedAssetType = assetType
         self.displayAssetType = assetType
         self.displayContentWidgets[1].setPlainText("Data can not be displayed as text")
@@ -238,50 +292,40 @@ class AssetViewWidget(QWidget):
             self.displayContentWidgets[1].setDisabled(False)
             self.json.value["d"] = data
         elif assetType == 2:
-            # Decode bytes if input is JSON
-            imageBytes = base64.decodebytes(data.encode(encoding="utf-8")) if json else data
-
-            imageFormat = "UNKNOWN-IMAGE-FORMAT"
-            size = (-1, -1)
-            with Image.open(BytesIO(imageBytes)) as pilImage:
-                imageFormat = pilImage.format
-                size = (pilImage.width, pilImage.height)
-
-
-            # Display the image
-            pixmap = QPixmap()
-            pixmap.loadFromData(imageBytes)
-            if pixmap.height() < 100 or pixmap.width() < 100:
-                pixmap = pixmap.scaled(QSize(max(pixmap.width() * 2, 100), max(pixmap.height() * 2, 100)),
-                                       Qt.AspectRatioMode.KeepAspectRatioByExpanding,
-                                       Qt.TransformationMode.SmoothTransformation)
-            self.imageDisplayLabel.setPixmap(pixmap)
-            self.imageDisplayLabel.resize(self.imageDisplayLabel.sizeHint())
-            self.imageScrollWrapper.setVisible(True)
-            self.imageDisplayError.setVisible(False)
+            # JSON holds BodyBuffer (or base64 text in older files), imported files are raw bytes
+            body = BodyBuffer.coerce(data)
+            imageFormat = images.sniffImageFormat(body.view()) or "UNKNOWN-IMAGE-FORMAT"
+
+            # Display the image, decoded once per body and cached
+            image = images.cache.decode(body)
+            if image is not None:
+                pixmap = QPixmap.fromImage(image)
+                if pixmap.height() < 100 or pixmap.width() < 100:
+                    pixmap = pixmap.scaled(QSize(max(pixmap.width() * 2, 100), max(pixmap.height() * 2, 100)),
+                                           Qt.AspectRatioMode.KeepAspectRatioByExpanding,
+                                           Qt.TransformationMode.SmoothTransformation)
+                self.imageDisplayLabel.setPixmap(pixmap)
+                self.imageDisplayLabel.resize(self.imageDisplayLabel.sizeHint())
+                self.imageScrollWrapper.setVisible(True)
+                self.imageDisplayError.setVisible(False)
 
             # Write image to JSON
-            self.json.value["d"] = data if json else base64.encodebytes(data).decode(encoding="utf-8")
+            self.json.value["d"] = body
             self.json.value["f"] = imageFormat
 
             # Show hex representation of image
             self.displayContentWidgets[1].setReadOnly(True)
             self.displayContentWidgets[1].setDisabled(False)
-            bytes_hex = imageBytes.hex(sep=" ", bytes_per_sep=-4).split(" ")
-            bytes_hex = map(lambda x: " ".join(x).upper(), [bytes_hex[i : i + 6] for i in range(0, len(bytes_hex), 6)])
-            self.displayContentWidgets[1].setPlainText(f"{imageFormat} image hex representation.\n" + "\n".join(bytes_hex))
-            self.imageDisplayMeta.setPlainText(f"{imageFormat} {size[0]}x{size[1]}px image. {len(imageBytes)} bytes")
+            self.displayContentWidgets[1].setPlainText(f"{imageFormat} image hex representation.\n" + hexPreview(body))
+            size = "?x?" if image is None else f"{image.width()}x{image.height()}"
+            self.imageDisplayMeta.setPlainText(f"{imageFormat} {size}px image. {len(body)} bytes")
             self.imageDisplayMeta.resize(self.imageDisplayMeta.sizeHint())
         elif assetType == 3:
-            imageBytes = base64.decodebytes(data.encode(encoding="utf-8")) if json else data
-            self.json.value["d"] = data if json else base64.encodebytes(data).decode(encoding="utf-8")
+            body = BodyBuffer.coerce(data)
+            self.json.value["d"] = body
             self.displayContentWidgets[1].setReadOnly(True)
             self.displayContentWidgets[1].setDisabled(False)
-            bytes_hex = imageBytes.hex(sep=" ", bytes_per_sep=-4).split(" ")
-            bytes_hex = map(lambda x: " ".join(x).upper(), [bytes_hex[i: i + 6] for i in range(0, len(bytes_hex), 6)])
-            self.displayContentWidgets[1].setPlainText("\n".join(bytes_hex))
-        self.switchWidget()
-        self.dataTypeChanged.emit(assetType, self.json)
+            self.displayContentWidgets[1].setPlainText(hexPreview(body))
 
     def importJson(self, json: dict):
         self.json.value = json
@@ -0,0 +1,163 @@
+from PyQt6.QtCore import QAbstractListModel, Qt, QVariant
+from PyQt6.QtGui import QColor, QFont
+from PyQt6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QListView, QPushButton, QComboBox
+
+from src import backend as bck, diffing
+from src.background import TaskCancelled
+
+# Compared snapshots, indexes of the target selector
+PREVIOUS = 0
+BASELINE = 1
+# Text color of diff rows
+COLORS = {
+    diffing.DELETED: QColor("#FF6B6B"),
+    diffing.INSERTED: QColor("#6CCB5F"),
+    diffing.CHANGED: QColor("#FFC857"),
+    diffing.HUNK: QColor("#6CB6FF"),
+    diffing.TITLE: QColor("#FF4C00"),
+}
+
+
+class DiffListModel(QAbstractListModel):
+    """
+    Read only list over a diffing.ResponseDiff. Rows are built when the view paints them,
+    so a diff of a huge body costs only the rows that are visible.
+    """
+    def __init__(self):
+        super().__init__()
+        self.diff: diffing.ResponseDiff | None = None
+        self.titleFont = QFont()
+        self.titleFont.setBold(True)
+
+    def setDiff(self, diff: diffing.ResponseDiff | None):
+        self.beginResetModel()
+        self.diff = diff
+        self.endResetModel()
+
+    def rowCount(self, parent = None):
+        return 0 if self.diff is None else len(self.diff)
+
+    def data(self, index, role = Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or self.diff is None:
+            return QVariant()
+        kind, text = self.diff.row(index.row())
+        if role == Qt.ItemDataRole.DisplayRole:
+            return text if kind in (diffing.TITLE, diffing.HUNK) else f"{kind} {text}"
+        if role == Qt.ItemDataRole.ForegroundRole and kind in COLORS:
+            return COLORS[kind]
+        if role == Qt.ItemDataRole.FontRole and kind == diffing.TITLE:
+            return self.titleFont
+        return QVariant()
+
+
+class DiffViewWidget(QWidget):
+    """
+    Compares the last response of the selected AppRequest with the previous response or a pinned baseline.
+    Diff is computed in background when the tab is visible and compared responses change.
+    """
+    def __init__(self, back: bck.AppBackend):
+        super().__init__()
+        self.back = back
+        self.selected: bck.AppRequest | None = None
+        self.computedKey = None # Compared snapshots of the shown (or computing) diff
+        self.task = None
+        layout = QVBoxLayout()
+
+        controls = QWidget()
+        controlsLayout = QHBoxLayout()
+        controlsLayout.setContentsMargins(5, 8, 5, 0)
+        self.target = QComboBox()
+        self.target.addItems(["С предыдущим ответом", "С эталоном"])
+        self.target.currentIndexChanged.connect(lambda index: self.refresh())
+        controlsLayout.addWidget(self.target)
+        self.summary = QLabel()
+        controlsLayout.addWidget(self.summary)
+        controlsLayout.addStretch()
+        self.pinBtn = QPushButton("Закрепить как эталон")
+        self.pinBtn.clicked.connect(self.pinBaseline)
+        controlsLayout.addWidget(self.pinBtn)
+        self.clearBtn = QPushButton("Сбросить эталон")
+        self.clearBtn.clicked.connect(self.clearBaseline)
+        controlsLayout.addWidget(self.clearBtn)
+        controls.setLayout(controlsLayout)
+        layout.addWidget(controls)
+
+        self.model = DiffListModel()
+        self.list = QListView()
+        self.list.setUniformItemSizes(True) # Lets the view skip measuring every row
+        self.list.setModel(self.model)
+        layout.addWidget(self.list)
+        self.setLayout(layout)
+
+    def emitDataUpdate(self, back: bck.AppBackend, selected: bck.AppRequest):
+        self.selected = selected
+        self.refresh()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.refresh()
+
+    def comparedSnapshots(self) -> tuple[dict | None, dict | None]:
+        if self.selected is None:
+            return None, None
+        old = self.selected.previousResponse if self.target.currentIndex() == PREVIOUS else self.selected.baseline
+        return old, self.selected.responseSnapshot()
+
+    def refresh(self):
+        hasResponse = self.selected is not None and self.selected.statusCode != "XXX"
+        self.pinBtn.setDisabled(not hasResponse)
+        self.clearBtn.setDisabled(self.selected is None or self.selected.baseline is None)
+        if not self.isVisible():
+            return # Diff is computed when the tab is shown
+        old, new = self.comparedSnapshots()
+        if old is None or new is None:
+            self.cancelTask()
+            self.computedKey = None
+            self.model.setDiff(None)
+            if self.selected is None:
+                self.summary.setText("")
+            elif new is None:
+                self.summary.setText("Запрос ещё не отправлялся")
+            else:
+                self.summary.setText("Нет предыдущего ответа" if self.target.currentIndex() == PREVIOUS
+                                     else "Эталон не закреплён")
+            return
+        # Snapshots are replaced on every response, bodies are compared by identity of their data
+        key = (id(old), id(old["b"]["d"]), new["s"], id(new["b"]["d"]), tuple(new["h"].items()))
+        if key == self.computedKey:
+            return
+        self.cancelTask()
+        self.computedKey = key
+        self.summary.setText("Сравнение...")
+
+        def finished(diff: diffing.ResponseDiff):
+            if self.computedKey == key:
+                self.task = None
+                self.model.setDiff(diff)
+                changes = diff.changes()
+                self.summary.setText("Различий нет" if changes == 0 else f"Различий: {changes}")
+
+        def failed(e: BaseException):
+            if self.computedKey == key:
+                self.task = None # Key is kept, so a cancelled diff is not started again until responses change
+                self.model.setDiff(None)
+                self.summary.setText("Сравнение отменено" if isinstance(e, TaskCancelled) else f"Ошибка сравнения: {e}")
+
+        self.task = self.back.runTask("Сравнение ответов...",
+                                      lambda progress: diffing.diffResponses(old, new, progress), finished, failed)
+
+    def cancelTask(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    def pinBaseline(self):
+        if self.selected is not None:
+            self.selected.pinBaseline()
+            self.back.window.statusBar().showMessage("Текущий ответ закреплён как эталон")
+            self.refresh()
+
+    def clearBaseline(self):
+        if self.selected is not None:
+            self.selected.clearBaseline()
+            self.refresh()
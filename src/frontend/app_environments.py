@@ -0,0 +1,115 @@
+from PyQt6.QtCore import Qt
+from PyQt6.QtGui import QIcon
+from PyQt6.QtWidgets import QVBoxLayout, QHBoxLayout, QWidget, QComboBox, QTableView, QHeaderView, QInputDialog, \
+    QLabel
+
+from src import backend as bck
+from src.frontend.app_components import CustomWindow, IconButton, QTitleLabel
+
+
+class EnvironmentsWindow(CustomWindow):
+    """
+    Window for editing environments of the collection.
+    Variables of the active environment are substituted into {{name}} placeholders when requests are sent.
+    """
+    def __init__(self, window: CustomWindow, back: bck.AppBackend):
+        super().__init__(back)
+        self.setWindowTitle("Переменные окружения")
+        self.back = back
+        self.back.antiGC["environments"] = self
+        layout = QVBoxLayout()
+        layout.setAlignment(Qt.AlignmentFlag.AlignTop)
+        layout.addWidget(QTitleLabel("Переменные окружения"))
+        layout.addWidget(QLabel("Используйте {{имя}} в адресе, заголовках и теле запроса."))
+
+        controls = QWidget()
+        controlsLayout = QHBoxLayout()
+        controlsLayout.setContentsMargins(5, 8, 5, 0)
+        self.selector = QComboBox()
+        self.selector.currentTextChanged.connect(self.selectEnvironment)
+        controlsLayout.addWidget(self.selector)
+        controlsLayout.addStretch()
+        createEnvironment = IconButton(QIcon("assets/create.png"))
+        createEnvironment.setToolTip("Новое окружение")
+        createEnvironment.clicked.connect(self.createEnvironment)
+        controlsLayout.addWidget(createEnvironment)
+        eraseEnvironment = IconButton(QIcon("assets/erase.png"))
+        eraseEnvironment.setToolTip("Удалить окружение")
+        eraseEnvironment.clicked.connect(self.deleteEnvironment)
+        controlsLayout.addWidget(eraseEnvironment)
+        createVariable = IconButton(QIcon("assets/text.png"))
+        createVariable.setToolTip("Новая переменная")
+        createVariable.clicked.connect(self.createVariable)
+        controlsLayout.addWidget(createVariable)
+        controls.setLayout(controlsLayout)
+        layout.addWidget(controls)
+
+        self.emptyStore = bck.HeaderStore(False)
+        self.table = QTableView()
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        layout.addWidget(self.table)
+
+        w = QWidget()
+        w.setLayout(layout)
+        self.setCentralWidget(w)
+        self.resize(600, 400)
+        self.centerOnScreen()
+        self.updateSelector()
+        self.show()
+
+    def updateSelector(self):
+        model = self.back.model
+        self.selector.blockSignals(True)
+        self.selector.clear()
+        self.selector.addItems(list(model.environments.keys()))
+        if model.activeEnvironment in model.environments:
+            self.selector.setCurrentText(model.activeEnvironment)
+        self.selector.blockSignals(False)
+        self.selectEnvironment(self.selector.currentText())
+
+    def selectEnvironment(self, name: str):
+        model = self.back.model
+        store = model.environments.get(name)
+        if store is None:
+            self.table.setModel(self.emptyStore)
+            self.table.setDisabled(True)
+            return
+        if model.activeEnvironment != name:
+            model.activeEnvironment = name
+            model.markChanged()
+        self.table.setDisabled(False)
+        self.table.setModel(store)
+        store.changeListener = self.changeListener
+
+    def changeListener(self, store: bck.HeaderStore):
+        store.beginResetModel()
+        store.endResetModel()
+
+    def createEnvironment(self):
+        name, ok = QInputDialog.getText(self, "Новое окружение", "Название окружения:")
+        if not ok or name.strip() == "" or name in self.back.model.environments:
+            return
+        self.back.model.addEnvironment(name)
+        self.back.model.activeEnvironment = name
+        self.back.model.markChanged()
+        self.updateSelector()
+
+    def deleteEnvironment(self):
+        name = self.selector.currentText()
+        if name not in self.back.model.environments:
+            return
+        del self.back.model.environments[name]
+        self.back.model.activeEnvironment = None
+        self.back.model.markChanged()
+        self.updateSelector()
+
+    def createVariable(self):
+        store = self.back.model.environments.get(self.selector.currentText())
+        if store is not None:
+            store["..."] = "..."
+            self.back.model.markChanged()
+
+    def closeEvent(self, a0):
+        del self.back.antiGC["environments"]
+        super().closeEvent(a0)
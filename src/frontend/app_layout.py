@@ -1,14 +1,22 @@
 import sys
 
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QModelIndex
 from PyQt6.QtGui import QIcon, QCloseEvent
 from PyQt6.QtWidgets import QVBoxLayout, QWidget, QHBoxLayout, QComboBox, QLineEdit, QPushButton, QTableView, \
-    QHeaderView, QTabWidget, QListWidget, QStyle, QLabel
+    QHeaderView, QTabWidget, QTreeView, QListWidget, QStyle, QLabel, QPlainTextEdit, QCheckBox
 
-from src import backend as bck, shared_constrains as shared_constrains, utils
+from src import backend as bck, shared_constrains as shared_constrains, utils, transport
+from src.profiling import profiler
 from src.frontend.app_about import AboutWindow, InfoWindow
-from src.frontend.app_components import CustomWindow, WarningToast, IconButton, AssetViewWidget, \
-    LinkedListWidgetItem
+from src.frontend.app_diff import DiffViewWidget
+from src.frontend.app_environments import EnvironmentsWindow
+from src.frontend.app_profiler import ProfilerDock
+from src.frontend.app_retry import RetryPolicyWindow
+from src.frontend.app_limits import LimitsWindow
+from src.frontend.app_network import NetworkDock, NetworkSettingsWindow
+from src.frontend.app_secrets import SecretsWindow
+from src.frontend.app_stream import StreamViewWidget
+from src.frontend.app_components import CustomWindow, WarningToast, IconButton, AssetViewWidget
 
 # Window UI Layout:
 #
@@ -16,7 +24,7 @@ from src.frontend.app_components import CustomWindow, WarningToast, IconButton,
 # │░File░Request░...░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░░ <-- QMenuBar (defined in MainWindow)
 # │┌───────┐                                               │
 # ││+ HTTP │   Request name <---------------------------------- QLineEdit (defined in MainWidget)
-# ││...    │   [ GET ↓][https://example.com________][send]  <-- UrlSelectorWidget
+# ││...    │   [ GET ↓][HTTP(S) ↓][https://example.com_][send] <-- UrlSelectorWidget
 # ││...    │   [Body][Headers][Cookie]                     │
 # ││       │   ┌─────────────────────────────────────────┐ │
 # ││       │   │                                         │  <-- QTabWidget (defined in MainWidget)
@@ -26,7 +34,7 @@ from src.frontend.app_components import CustomWindow, WarningToast, IconButton,
 # ││       │   │                                         │ │
 # │└───────┘   └─────────────────────────────────────────┘ │
 # └─ ^ ────────────────────────────────────────────────────┘
-#    └ QListWidget (defined in MainWidget)
+#    └ QTreeView of folders and requests (defined in MainWidget, model is src.collection_tree)
 #
 # Tabs in QTabWidget:
 #     [Body]    : Contains two own tabs inside for request and response data.
@@ -37,11 +45,17 @@ from src.frontend.app_components import CustomWindow, WarningToast, IconButton,
 #
 #     [Cookies] : Filled with CookiesViewWidget
 #
+#     [Scripts] : Filled with ScriptsViewWidget
+#
+#     [Stream]  : Filled with StreamViewWidget (app_stream.py), messages of WebSocket and SSE connections
+#
+#     [Diff]    : Filled with DiffViewWidget (app_diff.py), last response compared with the previous one or a baseline
+#
 # NOTICE: About windows defined in src.app_about
 
 class UrlSelectorWidget(QWidget):
     """
-    UrlSelectorWidget manages HTTP method selector, url's QLineEdit and submit button
+    UrlSelectorWidget manages HTTP method selector, protocol selector, url's QLineEdit and submit button
     """
     def __init__(self, back: bck.AppBackend):
         super().__init__()
@@ -51,6 +65,11 @@ class UrlSelectorWidget(QWidget):
         self.methodSelector.currentTextChanged.connect(
             lambda: back.updateCurrentRequest("method", self.methodSelector.currentText()))
         layout.addWidget(self.methodSelector)
+        self.protocolSelector = QComboBox(self)
+        self.protocolSelector.addItems(transport.PROTOCOLS)
+        self.protocolSelector.setToolTip("HTTP/2 используется для https адресов, если сервер его поддерживает")
+        self.protocolSelector.textActivated.connect(lambda text: back.updateCurrentRequest("protocol", text))
+        layout.addWidget(self.protocolSelector)
         self.lineEdit = QLineEdit(self)
         self.lineEdit.textEdited.connect(lambda: back.updateCurrentRequest("url", self.lineEdit.text()))
         layout.addWidget(self.lineEdit)
@@ -60,15 +79,20 @@ class UrlSelectorWidget(QWidget):
         layout.setSpacing(0)
         self.setLayout(layout)
 
+    @profiler.timed("widget.urlSelector", "frontend")
     def emitDataUpdate(self, back: bck.AppBackend, selected: bck.AppRequest):
         if selected is None:
             self.methodSelector.setCurrentIndex(0)
             self.methodSelector.setDisabled(True)
+            self.protocolSelector.setCurrentIndex(0)
+            self.protocolSelector.setDisabled(True)
             self.lineEdit.setText("")
             self.lineEdit.setDisabled(True)
             return
         self.methodSelector.setCurrentIndex(shared_constrains.HTTP_METHODS.index(selected.method))
         self.methodSelector.setDisabled(False)
+        self.protocolSelector.setCurrentText(selected.protocol)
+        self.protocolSelector.setDisabled(False)
         self.lineEdit.setText(selected.url)
         self.lineEdit.setDisabled(False)
 
@@ -91,6 +115,7 @@ class CookiesViewWidget(QWidget):
         self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
         self.table.horizontalHeader().setStretchLastSection(True)
 
+    @profiler.timed("widget.cookies", "frontend")
     def emitDataUpdate(self, back: bck.AppBackend, selected: bck.AppRequest):
         if selected is None:
             self.table.setDisabled(True)
@@ -111,12 +136,22 @@ class BodyViewWidget(QTabWidget):
         super().__init__()
         self.back = back
         self.requestView = AssetViewWidget(True, utils.Holder({}))
-        self.requestView.dataTypeChanged.connect(lambda x, y: self.back.model.getSelectedRequest()
-                                                 .setContentTypeHeader(x, y))
+        self.requestView.dataTypeChanged.connect(self.handleDataTypeChange)
+        self.requestView.assetEdited.connect(back.markCurrentRequestChanged)
+        self.requestView.exportRequested.connect(self.requestView.exportAsset)
         self.addTab(self.requestView, QIcon("assets/request.png"), "Request")
         self.responseView = AssetViewWidget(False, utils.Holder({}))
+        self.responseView.assetEdited.connect(back.markCurrentRequestChanged)
+        # Response is downloaded again straight to disk instead of saving the copy held in memory
+        self.responseView.exportRequested.connect(back.downloadResponse)
         self.addTab(self.responseView, QIcon("assets/response.png"), "Response")
 
+    def handleDataTypeChange(self, dataType: int, jsonHolder: utils.Holder):
+        selected = self.back.model.getSelectedRequest()
+        if selected is not None:
+            selected.setContentTypeHeader(dataType, jsonHolder)
+
+    @profiler.timed("widget.body", "frontend")
     def emitDataUpdate(self, back: bck.AppBackend, selected: bck.AppRequest):
         if selected is not None:
             self.requestView.importJsonHolder(selected.requestBody)
@@ -133,6 +168,7 @@ class HeadersViewWidget(QWidget):
     def __init__(self, back: bck.AppBackend, isRequestSide: bool):
         super().__init__()
         self.isRequestSide = isRequestSide
+        self.back = back
         layout = QVBoxLayout()
 
         controls = QWidget()
@@ -159,7 +195,9 @@ class HeadersViewWidget(QWidget):
 
     def createHandler(self):
         self.model["..."] = "..."
+        self.back.markCurrentRequestChanged()
 
+    @profiler.timed("widget.headers", "frontend")
     def emitDataUpdate(self, back: bck.AppBackend, selected: bck.AppRequest):
         if selected is None:
             self.table.setDisabled(True)
@@ -172,6 +210,7 @@ class HeadersViewWidget(QWidget):
             self.table.model().beginResetModel()
             self.table.model().endResetModel()
 
+    @profiler.timed("widget.headers.reset", "frontend")
     def changeListener(self, model: bck.HeaderStore):
         if model is self.table.model():
             self.table.model().beginResetModel()
@@ -197,6 +236,53 @@ class SidedHeadersViewWidget(QTabWidget):
         self.responseView.emitDataUpdate(back, selected)
 
 
+class ScriptsViewWidget(QWidget):
+    """
+    Editors for pre-request and post-response scripts and results of the last post-response script.
+    """
+    def __init__(self, back: bck.AppBackend):
+        super().__init__()
+        self.back = back
+        self.updating = False
+        layout = QVBoxLayout()
+        layout.addWidget(WarningToast(shared_constrains.SCRIPTS_WARNING))
+
+        self.tabs = QTabWidget()
+        self.preScript = QPlainTextEdit()
+        self.preScript.setObjectName("assetTextDisplay")
+        self.preScript.setPlaceholderText("request[\"headers\"][\"X-Token\"] = \"...\"")
+        self.preScript.textChanged.connect(lambda: self.scriptChanged("preScript", self.preScript))
+        self.tabs.addTab(self.preScript, QIcon("assets/request.png"), "Pre-request")
+        self.postScript = QPlainTextEdit()
+        self.postScript.setObjectName("assetTextDisplay")
+        self.postScript.setPlaceholderText("check(\"status is 200\", response.status == 200)")
+        self.postScript.textChanged.connect(lambda: self.scriptChanged("postScript", self.postScript))
+        self.tabs.addTab(self.postScript, QIcon("assets/response.png"), "Post-response")
+        layout.addWidget(self.tabs)
+
+        self.results = QListWidget()
+        self.results.setMaximumHeight(150)
+        layout.addWidget(self.results)
+        self.setLayout(layout)
+
+    def scriptChanged(self, prop: str, editor: QPlainTextEdit):
+        if not self.updating:
+            self.back.updateCurrentRequest(prop, editor.toPlainText())
+
+    @profiler.timed("widget.scripts", "frontend")
+    def emitDataUpdate(self, back: bck.AppBackend, selected: bck.AppRequest):
+        self.updating = True
+        self.preScript.setPlainText("" if selected is None else selected.preScript)
+        self.postScript.setPlainText("" if selected is None else selected.postScript)
+        self.updating = False
+        self.preScript.setDisabled(selected is None)
+        self.postScript.setDisabled(selected is None)
+        self.results.clear()
+        if selected is not None:
+            for name, passed, message in selected.testResults:
+                self.results.addItem(("✓ " if passed else "✗ ") + name + ("" if message == "" else f": {message}"))
+
+
 class MainWidget(QWidget):
     """
     Main widget of MainWindow.
@@ -222,6 +308,8 @@ class MainWidget(QWidget):
         self.statusCode = QLabel()
         self.statusCode.setObjectName("statusCode")
         requestNameWrapperLayout.addWidget(self.statusCode)
+        self.timings = QLabel() # negotiated protocol and timings of the last response
+        requestNameWrapperLayout.addWidget(self.timings)
 
         dashboardLayout.addWidget(requestNameWrapper)
         self.urlSelectorWidget: UrlSelectorWidget = UrlSelectorWidget(back)
@@ -233,14 +321,45 @@ class MainWidget(QWidget):
         self.tabWidget.addTab(self.sidedHeadersViewWidget, "Headers")
         self.cookies = CookiesViewWidget(back)
         self.tabWidget.addTab(self.cookies, QIcon("assets/bidirectional.png"), "Cookies")
+        self.scripts = ScriptsViewWidget(back)
+        self.tabWidget.addTab(self.scripts, "Scripts")
+        self.stream = StreamViewWidget(back)
+        self.tabWidget.addTab(self.stream, "Stream")
+        self.diff = DiffViewWidget(back)
+        self.tabWidget.addTab(self.diff, "Diff")
         dashboardLayout.addWidget(self.tabWidget)
         dashboardLayout.setAlignment(Qt.AlignmentFlag.AlignTop)
         dashboard.setLayout(dashboardLayout)
 
         layout = QHBoxLayout(self)
-        self.requestList: QListWidget = QListWidget()
-        self.requestList.itemClicked.connect(lambda: back.selectRequest(self.requestList.selectedItems()))
-        layout.addWidget(self.requestList)
+        sidebar = QWidget()
+        sidebarLayout = QVBoxLayout(sidebar)
+        sidebarLayout.setContentsMargins(0, 0, 0, 0)
+        self.searchBox = QLineEdit()
+        self.searchBox.setPlaceholderText("Поиск запросов")
+        self.searchBox.setClearButtonEnabled(True)
+        self.searchBox.textChanged.connect(lambda: self.updateFilter(back))
+        sidebarLayout.addWidget(self.searchBox)
+        self.searchBodies = QCheckBox("Искать в телах")
+        self.searchBodies.toggled.connect(lambda: self.updateFilter(back))
+        sidebarLayout.addWidget(self.searchBodies)
+        createButtons = QWidget()
+        createButtonsLayout = QHBoxLayout(createButtons)
+        createButtonsLayout.setContentsMargins(0, 0, 0, 0)
+        createRequest = QPushButton(shared_constrains.NEW_HTTP_REQUEST)
+        createRequest.clicked.connect(lambda: back.handleSpecialListItem(shared_constrains.NEW_HTTP_REQUEST))
+        createButtonsLayout.addWidget(createRequest)
+        createFolder = QPushButton("+ Папка")
+        createFolder.clicked.connect(back.createFolder)
+        createButtonsLayout.addWidget(createFolder)
+        sidebarLayout.addWidget(createButtons)
+        self.requestTree = QTreeView()
+        self.requestTree.setHeaderHidden(True)
+        self.requestTree.setUniformRowHeights(True) # Lets the view skip measuring every row
+        self.requestTree.setEditTriggers(QTreeView.EditTrigger.EditKeyPressed | QTreeView.EditTrigger.DoubleClicked)
+        self.requestTree.clicked.connect(lambda index: back.selectNode(index.internalPointer()))
+        sidebarLayout.addWidget(self.requestTree)
+        layout.addWidget(sidebar)
         layout.addWidget(dashboard)
         layout.setStretchFactor(dashboard, 1)
         self.setLayout(layout)
@@ -250,30 +369,46 @@ class MainWidget(QWidget):
         if selected is None:
             return
         selected.name = self.requestName.text()
-        self.updateRequestList(self.back)
+        selected.markChanged()
+        self.back.model.tree.nodeChanged(selected)
 
     def emitDataUpdate(self, back: bck.AppBackend):
-        self.updateRequestList(back)
+        self.updateRequestTree(back)
         selected: bck.AppRequest = back.model.getSelectedRequest()
         if selected is None:
             self.requestName.setText(shared_constrains.NO_REQUEST_SELECTED)
             self.statusCode.setText("XXX")
+            self.timings.setText("")
         else:
             self.requestName.setText(selected.name)
             self.statusCode.setText(selected.statusCode)
+            self.timings.setText(transport.formatTimings(selected.timings))
         self.urlSelectorWidget.emitDataUpdate(back, selected)
         self.cookies.emitDataUpdate(back, selected)
         self.bodyView.emitDataUpdate(back, selected)
         self.sidedHeadersViewWidget.emitDataUpdate(back, selected)
-
-    def updateRequestList(self, back: bck.AppBackend):
-        self.requestList.clear()
-        self.requestList.addItem(LinkedListWidgetItem(shared_constrains.NEW_HTTP_REQUEST))
-        for i, req in enumerate(back.model.requests):
-            item = LinkedListWidgetItem(req.name)
-            item.setIcon(QIcon("assets/http.svg"))
-            item.linkedIndex = i
-            self.requestList.addItem(item)
+        self.scripts.emitDataUpdate(back, selected)
+        self.stream.emitDataUpdate(back, selected)
+        self.diff.emitDataUpdate(back, selected)
+
+    @profiler.timed("widget.requestTree", "frontend")
+    def updateRequestTree(self, back: bck.AppBackend):
+        """
+        Shows the tree of the current AppDataModel and selects the selected request in it.
+        Rows are changed by the tree model itself, so nothing is rebuilt here.
+        """
+        if self.requestTree.model() is not back.model.tree:
+            # Model is replaced when a file is opened
+            self.requestTree.setModel(back.model.tree)
+            self.updateFilter(back)
+        selected = back.model.getSelectedRequest()
+        index = QModelIndex() if selected is None else back.model.tree.reveal(selected)
+        if index != self.requestTree.currentIndex():
+            self.requestTree.setCurrentIndex(index)
+
+    def updateFilter(self, back: bck.AppBackend):
+        back.model.searchIndex.setIncludeBodies(self.searchBodies.isChecked(), back.model.requests.values())
+        back.model.tree.setFilter(back.model.search(self.searchBox.text()))
 
 
 class MainWindow(CustomWindow):
@@ -295,6 +430,9 @@ class MainWindow(CustomWindow):
         filesMenu.addAction(self.style().standardIcon(QStyle.StandardPixmap.SP_FileIcon), "Сохранить") \
             .triggered.connect(back.saveFile)
         filesMenu.addSeparator()
+        filesMenu.addAction("Импорт из HAR...").triggered.connect(back.importHar)
+        filesMenu.addAction("Экспорт в HAR...").triggered.connect(back.exportHar)
+        filesMenu.addSeparator()
         filesMenu.addAction(self.style().standardIcon(QStyle.StandardPixmap.SP_BrowserStop), "Выход") \
             .triggered.connect(back.exit)
 
@@ -303,15 +441,44 @@ class MainWindow(CustomWindow):
         createRequestMenu = requestMenu.addMenu("Новый")
         createRequestMenu.addAction("HTTP/HTTPS Запрос").triggered.connect(
             lambda: back.handleSpecialListItem(shared_constrains.NEW_HTTP_REQUEST))
+        createRequestMenu.addAction(shared_constrains.NEW_WEBSOCKET).triggered.connect(
+            lambda: back.handleSpecialListItem(shared_constrains.NEW_WEBSOCKET))
+        createRequestMenu.addAction(shared_constrains.NEW_SSE).triggered.connect(
+            lambda: back.handleSpecialListItem(shared_constrains.NEW_SSE))
 
         requestMenu.addAction(shared_constrains.DELETE_REQUEST).triggered.connect(
             lambda: back.handleSpecialListItem(shared_constrains.DELETE_REQUEST))
+        requestMenu.addAction("Переместить в папку...").triggered.connect(back.moveSelectedRequest)
+        requestMenu.addAction("Переместить выше").triggered.connect(lambda: back.moveSelectedRequestBy(-1))
+        requestMenu.addAction("Переместить ниже").triggered.connect(lambda: back.moveSelectedRequestBy(1))
+        requestMenu.addSeparator()
+        requestMenu.addAction("Новая папка...").triggered.connect(back.createFolder)
+        requestMenu.addAction("Удалить выбранную папку").triggered.connect(back.deleteSelectedFolder)
+        requestMenu.addSeparator()
         requestMenu.addAction(self.style().standardIcon(QStyle.StandardPixmap.SP_CommandLink), "Отправить") \
             .triggered.connect(back.sendRequest)
+        requestMenu.addAction("Повторы и ограничение частоты...").triggered.connect(self.showRetryPolicyWindow)
+        requestMenu.addAction("Лимиты запроса...").triggered.connect(self.showLimitsWindow)
 
         secretsMenu = self.menuBar().addMenu("Секреты")
+        secretsMenu.addAction("Управление секретами...").triggered.connect(self.showSecretsWindow)
+        secretsMenu.addAction("Заблокировать").triggered.connect(back.secretStorage.lockStorage)
 
         testsMenu = self.menuBar().addMenu("Тестирование")
+        testsMenu.addAction("Переменные окружения...").triggered.connect(self.showEnvironmentsWindow)
+        testsMenu.addAction("Запуск по набору данных...").triggered.connect(back.runDataset)
+        testsMenu.addSeparator()
+        self.profilerDock = ProfilerDock(profiler)
+        self.addDockWidget(Qt.DockWidgetArea.BottomDockWidgetArea, self.profilerDock)
+        self.profilerDock.hide()
+        testsMenu.addAction(self.profilerDock.toggleViewAction())
+        testsMenu.addAction("Экспорт трассировки...").triggered.connect(self.profilerDock.exportTrace)
+        testsMenu.addSeparator()
+        self.networkDock = NetworkDock()
+        self.addDockWidget(Qt.DockWidgetArea.BottomDockWidgetArea, self.networkDock)
+        self.networkDock.hide()
+        testsMenu.addAction(self.networkDock.toggleViewAction())
+        testsMenu.addAction("Настройки сети...").triggered.connect(self.showNetworkSettingsWindow)
 
         helpMenu = self.menuBar().addMenu("Помощь")
         helpMenu.addAction("О программе").triggered.connect(self.showAboutWindow)
@@ -319,11 +486,11 @@ class MainWindow(CustomWindow):
         libsMenu = helpMenu.addMenu("Использованные библиотеки")
         libsMenu.addAction("PyQt6").triggered.connect(back.showQtAboutWindow)
         libsMenu.addAction("requests").triggered.connect(lambda: self.libraryAbout("requests"))
-        libsMenu.addAction("pillow").triggered.connect(lambda: self.libraryAbout("pillow"))
 
         helpMenu.addAction("Список статус кодов").triggered.connect(lambda: self.libraryAbout("statusCodes"))
 
         self.statusBar().showMessage("")
+        back.startAutosave()
 
         if "-dev" in sys.argv:
             self.statusBar().showMessage("DenisJava's WebRequests запущен в режиме разработчика")
@@ -341,8 +508,45 @@ class MainWindow(CustomWindow):
         self.back.antiGC["about"] = window
         window.show()
 
+    def showEnvironmentsWindow(self):
+        if "environments" in self.back.antiGC:
+            return
+        EnvironmentsWindow(self, self.back)
+
+    def showRetryPolicyWindow(self):
+        if "retry" in self.back.antiGC:
+            return
+        selected = self.back.model.getSelectedRequest()
+        if selected is None:
+            self.statusBar().showMessage("Выберите запрос")
+            return
+        RetryPolicyWindow(self, self.back, selected)
+
+    def showLimitsWindow(self):
+        if "limits" in self.back.antiGC:
+            return
+        selected = self.back.model.getSelectedRequest()
+        if selected is None:
+            self.statusBar().showMessage("Выберите запрос")
+            return
+        LimitsWindow(self, self.back, selected)
+
+    def showNetworkSettingsWindow(self):
+        if "network" in self.back.antiGC:
+            return
+        NetworkSettingsWindow(self, self.back)
+
+    def showSecretsWindow(self):
+        if "secrets" in self.back.antiGC:
+            return
+        SecretsWindow(self, self.back)
+
     def closeEvent(self, event: QCloseEvent):
-        self.back.exit()
+        if not self.back.exit():
+            event.ignore()
 
     def emitDataUpdate(self, back: bck.AppBackend):
         self.widget.emitDataUpdate(back)
+
+    def showStreamTab(self):
+        self.widget.tabWidget.setCurrentWidget(self.widget.stream)
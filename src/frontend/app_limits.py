@@ -0,0 +1,106 @@
+from PyQt6.QtCore import Qt
+from PyQt6.QtWidgets import QVBoxLayout, QWidget, QFormLayout, QSpinBox, QDoubleSpinBox, QComboBox, QPushButton, \
+    QLabel
+
+from src import backend as bck, limits
+from src.frontend.app_components import CustomWindow, QTitleLabel
+
+# Indexes of the scope selector
+REQUEST = 0
+COLLECTION = 1
+# Spin box value shown as "По умолчанию", stored as None (inherited limit)
+INHERITED = -1
+
+
+class LimitsWindow(CustomWindow):
+    """
+    Window for editing resource limits of the selected AppRequest or default limits of the collection.
+    """
+    def __init__(self, window: CustomWindow, back: bck.AppBackend, request: bck.AppRequest):
+        super().__init__(back)
+        self.setWindowTitle("Лимиты запроса")
+        self.back = back
+        self.request = request
+        self.back.antiGC["limits"] = self
+        layout = QVBoxLayout()
+        layout.setAlignment(Qt.AlignmentFlag.AlignTop)
+        layout.addWidget(QTitleLabel("Лимиты запроса"))
+
+        self.scope = QComboBox()
+        self.scope.addItems([f"Запрос: {request.name}", "Значения по умолчанию для коллекции"])
+        self.scope.currentIndexChanged.connect(lambda index: self.loadLimits())
+        layout.addWidget(self.scope)
+
+        form = QFormLayout()
+        self.connectTimeout = self.createSpinBox(QDoubleSpinBox(), " с")
+        form.addRow("Таймаут соединения:", self.connectTimeout)
+        self.readTimeout = self.createSpinBox(QDoubleSpinBox(), " с")
+        form.addRow("Таймаут чтения:", self.readTimeout)
+        self.deadline = self.createSpinBox(QDoubleSpinBox(), " с")
+        self.deadline.setToolTip("Время всего запроса вместе со скачиванием тела")
+        form.addRow("Общее время запроса:", self.deadline)
+        self.maxRedirects = self.createSpinBox(QSpinBox(), "")
+        self.maxRedirects.setToolTip("0 - не следовать перенаправлениям")
+        form.addRow("Перенаправлений:", self.maxRedirects)
+        self.maxSize = self.createSpinBox(QSpinBox(), " КБ")
+        form.addRow("Размер тела ответа:", self.maxSize)
+        formWidget = QWidget()
+        formWidget.setLayout(form)
+        layout.addWidget(formWidget)
+        self.hint = QLabel()
+        self.hint.setWordWrap(True)
+        layout.addWidget(self.hint)
+
+        save = QPushButton("Сохранить")
+        save.clicked.connect(self.saveLimits)
+        layout.addWidget(save)
+
+        w = QWidget()
+        w.setLayout(layout)
+        self.setCentralWidget(w)
+        self.loadLimits()
+        self.resize(500, 350)
+        self.centerOnScreen()
+        self.show()
+
+    @staticmethod
+    def createSpinBox(box, suffix: str):
+        box.setRange(INHERITED, 2 ** 31 - 1)
+        box.setSpecialValueText("По умолчанию")
+        box.setSuffix(suffix)
+        return box
+
+    def editedLimits(self) -> limits.RequestLimits:
+        return self.request.limits if self.scope.currentIndex() == REQUEST else self.back.model.limits
+
+    def loadLimits(self):
+        edited = self.editedLimits()
+        self.connectTimeout.setValue(INHERITED if edited.connectTimeout is None else edited.connectTimeout)
+        self.readTimeout.setValue(INHERITED if edited.readTimeout is None else edited.readTimeout)
+        self.deadline.setValue(INHERITED if edited.deadline is None else edited.deadline)
+        self.maxRedirects.setValue(INHERITED if edited.maxRedirects is None else edited.maxRedirects)
+        self.maxSize.setValue(INHERITED if edited.maxSize is None else edited.maxSize // 1024)
+        defaults = limits.DEFAULT_LIMITS if self.scope.currentIndex() == COLLECTION else \
+            self.back.model.limits.merged(limits.DEFAULT_LIMITS)
+        self.hint.setText(f"0 - без ограничения. По умолчанию: соединение {defaults.connectTimeout or '∞'} с, "
+                          f"чтение {defaults.readTimeout or '∞'} с, всего {defaults.deadline or '∞'} с, "
+                          f"перенаправлений {defaults.maxRedirects}, "
+                          f"тело {defaults.maxSize // 1024 if defaults.maxSize else '∞'} КБ.")
+
+    def saveLimits(self):
+        def value(box):
+            return None if box.value() == INHERITED else box.value()
+        maxSize = value(self.maxSize)
+        edited = limits.RequestLimits(value(self.connectTimeout), value(self.readTimeout), value(self.deadline),
+                                      value(self.maxRedirects), None if maxSize is None else maxSize * 1024)
+        if self.scope.currentIndex() == REQUEST:
+            self.request.limits = edited
+            self.request.markChanged()
+        else:
+            self.back.model.limits = edited
+            self.back.model.markLimitsChanged()
+        self.close()
+
+    def closeEvent(self, a0):
+        del self.back.antiGC["limits"]
+        super().closeEvent(a0)
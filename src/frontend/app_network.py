@@ -0,0 +1,200 @@
+import ipaddress
+
+from PyQt6.QtCore import QAbstractTableModel, Qt, QVariant, QTimer
+from PyQt6.QtWidgets import QDockWidget, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QTableView, QHeaderView, \
+    QPushButton, QTabWidget, QFormLayout, QLineEdit, QDoubleSpinBox, QPlainTextEdit, QMessageBox
+
+import src.network as network
+import src.transport as transport
+from src import backend as bck
+from src.frontend.app_components import CustomWindow, QTitleLabel
+
+
+class RowsTableModel(QAbstractTableModel):
+    """
+    Read only table of tuples, replaced as a whole by refresh
+    """
+    def __init__(self, headers: tuple[str, ...]):
+        super().__init__()
+        self.headers = headers
+        self.rows = []
+
+    def refresh(self, rows: list[tuple]):
+        self.beginResetModel()
+        self.rows = rows
+        self.endResetModel()
+
+    def rowCount(self, parent = None):
+        return len(self.rows)
+
+    def columnCount(self, parent = None):
+        return len(self.headers)
+
+    def data(self, index, role = Qt.ItemDataRole.DisplayRole):
+        if index.isValid() and role == Qt.ItemDataRole.DisplayRole and index.row() < len(self.rows):
+            return str(self.rows[index.row()][index.column()])
+        return QVariant()
+
+    def headerData(self, section, orientation, role = Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole:
+            return QVariant()
+        if orientation == Qt.Orientation.Horizontal and 0 <= section < self.columnCount():
+            return self.headers[section]
+        return section + 1
+
+
+class NetworkDock(QDockWidget):
+    """
+    Dock with open connection pools, DNS cache and connection reuse per origin.
+    Refreshes itself only while visible.
+    """
+    def __init__(self):
+        super().__init__("Сеть")
+        widget = QWidget()
+        layout = QVBoxLayout()
+
+        controls = QWidget()
+        controlsLayout = QHBoxLayout()
+        controlsLayout.setContentsMargins(5, 8, 5, 0)
+        self.totalsLabel = QLabel()
+        controlsLayout.addWidget(self.totalsLabel)
+        controlsLayout.addStretch()
+        clearDnsBtn = QPushButton("Сбросить DNS кэш")
+        clearDnsBtn.clicked.connect(self.clearDns)
+        controlsLayout.addWidget(clearDnsBtn)
+        clearStatsBtn = QPushButton("Очистить статистику")
+        clearStatsBtn.clicked.connect(self.clearStats)
+        controlsLayout.addWidget(clearStatsBtn)
+        controls.setLayout(controlsLayout)
+        layout.addWidget(controls)
+
+        self.tabs = QTabWidget()
+        self.poolModel = RowsTableModel(("Клиент", "Пул", "Соединений", "Свободно", "Запросов"))
+        self.tabs.addTab(self.createTable(self.poolModel), "Пулы соединений")
+        self.originModel = RowsTableModel(("Сервер", "Запросов", "Соединений", "Переиспользовано"))
+        self.tabs.addTab(self.createTable(self.originModel), "Переиспользование")
+        self.dnsModel = RowsTableModel(("Хост", "Адреса", "Истекает через", "Попаданий", "Промахов"))
+        self.tabs.addTab(self.createTable(self.dnsModel), "DNS кэш")
+        layout.addWidget(self.tabs)
+
+        widget.setLayout(layout)
+        self.setWidget(widget)
+
+        self.refreshTimer = QTimer(self)
+        self.refreshTimer.timeout.connect(self.refresh)
+        self.visibilityChanged.connect(self.handleVisibility)
+
+    @staticmethod
+    def createTable(model: RowsTableModel) -> QTableView:
+        table = QTableView()
+        table.setModel(model)
+        table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
+        table.horizontalHeader().setStretchLastSection(True)
+        return table
+
+    def handleVisibility(self, visible: bool):
+        if visible:
+            self.refreshTimer.start(500)
+            self.refresh()
+        else:
+            self.refreshTimer.stop()
+
+    def refresh(self):
+        self.poolModel.refresh(network.poolSnapshot() + transport.transport.poolSnapshot())
+        origins = network.stats.snapshot()
+        self.originModel.refresh([(origin, requests, connections, max(0, requests - connections))
+                                  for origin, requests, connections in origins])
+        self.dnsModel.refresh([(host, ", ".join(addresses), "переопределён" if ttl is None else f"{ttl:.0f} с",
+                                hits, misses) for host, addresses, ttl, hits, misses in network.dns.snapshot()])
+        hits, misses, overridden = network.dns.totals()
+        requests = sum(row[1] for row in origins)
+        connections = sum(row[2] for row in origins)
+        self.totalsLabel.setText(f"Запросов: {requests}, новых соединений: {connections}, "
+                                 f"DNS: {hits} из кэша, {misses} запросов, {overridden} переопределено")
+
+    def clearDns(self):
+        network.dns.clear()
+        self.refresh()
+
+    def clearStats(self):
+        network.stats.clear()
+        self.refresh()
+
+
+class NetworkSettingsWindow(CustomWindow):
+    """
+    Window for editing proxy and DNS settings of the collection.
+    """
+    def __init__(self, window: CustomWindow, back: bck.AppBackend):
+        super().__init__(back)
+        self.setWindowTitle("Настройки сети")
+        self.back = back
+        self.back.antiGC["network"] = self
+        settings = back.model.network
+        layout = QVBoxLayout()
+        layout.setAlignment(Qt.AlignmentFlag.AlignTop)
+        layout.addWidget(QTitleLabel("Настройки сети"))
+
+        form = QFormLayout()
+        self.proxy = QLineEdit(settings.proxy)
+        self.proxy.setPlaceholderText("http://host:3128 или socks5://host:1080")
+        form.addRow("Прокси:", self.proxy)
+        self.noProxy = QLineEdit(settings.noProxy)
+        self.noProxy.setPlaceholderText("localhost, *.example.com")
+        form.addRow("Без прокси:", self.noProxy)
+        self.dnsTtl = QDoubleSpinBox()
+        self.dnsTtl.setRange(0, 24 * 60 * 60)
+        self.dnsTtl.setSuffix(" с")
+        self.dnsTtl.setSpecialValueText("Не кэшировать")
+        self.dnsTtl.setValue(settings.dnsTtl)
+        form.addRow("Время жизни DNS кэша:", self.dnsTtl)
+        formWidget = QWidget()
+        formWidget.setLayout(form)
+        layout.addWidget(formWidget)
+
+        layout.addWidget(QLabel("Переопределение адресов (хост=IP, по одному на строку):"))
+        self.overrides = QPlainTextEdit("\n".join(f"{host}={ip}" for host, ip in settings.overrides.items()))
+        layout.addWidget(self.overrides)
+
+        save = QPushButton("Сохранить")
+        save.clicked.connect(self.saveSettings)
+        layout.addWidget(save)
+
+        w = QWidget()
+        w.setLayout(layout)
+        self.setCentralWidget(w)
+        self.resize(500, 400)
+        self.centerOnScreen()
+        self.show()
+
+    def parseOverrides(self) -> dict[str, str] | None:
+        """
+        :return: host -> IP or None if a line is invalid (a warning is shown)
+        """
+        overrides = {}
+        for line in self.overrides.toPlainText().splitlines():
+            if line.strip() == "":
+                continue
+            host, separator, ip = line.partition("=")
+            try:
+                if separator == "" or host.strip() == "":
+                    raise ValueError()
+                ipaddress.ip_address(ip.strip())
+            except ValueError:
+                QMessageBox.warning(self, "Внимание", f"Неверная строка: {line}")
+                return None
+            overrides[host.strip().lower()] = ip.strip()
+        return overrides
+
+    def saveSettings(self):
+        overrides = self.parseOverrides()
+        if overrides is None:
+            return
+        self.back.model.network = network.NetworkSettings(self.proxy.text().strip(), self.noProxy.text().strip(),
+                                                          self.dnsTtl.value(), overrides)
+        self.back.model.markNetworkChanged()
+        self.close()
+
+    def closeEvent(self, a0):
+        del self.back.antiGC["network"]
+        super().closeEvent(a0)
@@ -0,0 +1,117 @@
+from PyQt6.QtCore import QAbstractTableModel, Qt, QVariant, QTimer
+from PyQt6.QtWidgets import QDockWidget, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QTableView, QHeaderView, \
+    QPushButton, QFileDialog, QMessageBox
+
+from src.profiling import Profiler, EventLoopLagMonitor
+
+
+class SpanTableModel(QAbstractTableModel):
+    """
+    Read only table of the most recent spans (newest first)
+    """
+    def __init__(self, source: Profiler, count: int = 200):
+        super().__init__()
+        self.source = source
+        self.count = count
+        self.rows = []
+
+    def refresh(self):
+        self.beginResetModel()
+        self.rows = list(reversed(self.source.recentSpans(self.count)))
+        self.endResetModel()
+
+    def rowCount(self, parent = None):
+        return len(self.rows)
+
+    def columnCount(self, parent = None):
+        return 3 # Name, Category, Duration
+
+    def data(self, index, role = Qt.ItemDataRole.DisplayRole):
+        if index.isValid() and role == Qt.ItemDataRole.DisplayRole and index.row() < len(self.rows):
+            span = self.rows[index.row()]
+            if index.column() == 0:
+                return span.name
+            elif index.column() == 1:
+                return span.category
+            return f"{span.duration / 1_000_000:.3f} ms"
+        return QVariant()
+
+    def headerData(self, section, orientation, role = Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole:
+            return QVariant()
+        if orientation == Qt.Orientation.Horizontal and 0 <= section < self.columnCount():
+            return ("Span", "Category", "Duration")[section]
+        return section + 1
+
+
+class ProfilerDock(QDockWidget):
+    """
+    Dock with recent profiler spans and event loop lag.
+    Refreshes itself only while visible.
+    """
+    def __init__(self, source: Profiler):
+        super().__init__("Производительность")
+        self.source = source
+        self.lagMonitor = EventLoopLagMonitor(source)
+
+        widget = QWidget()
+        layout = QVBoxLayout()
+
+        controls = QWidget()
+        controlsLayout = QHBoxLayout()
+        controlsLayout.setContentsMargins(5, 8, 5, 0)
+        self.lagLabel = QLabel("Задержка цикла событий: - ms")
+        controlsLayout.addWidget(self.lagLabel)
+        controlsLayout.addStretch()
+        clearBtn = QPushButton("Очистить")
+        clearBtn.clicked.connect(self.clearSpans)
+        controlsLayout.addWidget(clearBtn)
+        exportBtn = QPushButton("Экспорт трассировки...")
+        exportBtn.clicked.connect(self.exportTrace)
+        controlsLayout.addWidget(exportBtn)
+        controls.setLayout(controlsLayout)
+        layout.addWidget(controls)
+
+        self.spanModel = SpanTableModel(source)
+        self.table = QTableView()
+        self.table.setModel(self.spanModel)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        layout.addWidget(self.table)
+
+        widget.setLayout(layout)
+        self.setWidget(widget)
+
+        self.refreshTimer = QTimer(self)
+        self.refreshTimer.timeout.connect(self.refresh)
+        self.visibilityChanged.connect(self.handleVisibility)
+
+    def handleVisibility(self, visible: bool):
+        if visible:
+            self.lagMonitor.start()
+            self.refreshTimer.start(500)
+            self.refresh()
+        else:
+            self.lagMonitor.stop()
+            self.refreshTimer.stop()
+
+    def refresh(self):
+        self.spanModel.refresh()
+        lags = [lag for _, lag in list(self.source.lagSamples)[-20:]]
+        worst = max(lags) if lags else 0
+        self.lagLabel.setText(f"Задержка цикла событий: {self.lagMonitor.lastLag:.1f} ms (макс. {worst:.1f} ms)")
+
+    def clearSpans(self):
+        self.source.clear()
+        self.refresh()
+
+    def exportTrace(self):
+        file = QFileDialog.getSaveFileName(
+            self, "Экспорт трассировки", "trace.json",
+            "Chrome trace (*.json)")[0]
+        if file == "":
+            return
+        try:
+            self.source.exportChromeTrace(file)
+        except Exception:
+            QMessageBox.warning(self.window(), "Внимание", "Не удалось записать файл!")
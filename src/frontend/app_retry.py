@@ -0,0 +1,85 @@
+from PyQt6.QtCore import Qt
+from PyQt6.QtWidgets import QVBoxLayout, QWidget, QFormLayout, QSpinBox, QDoubleSpinBox, QLineEdit, QCheckBox, \
+    QPushButton, QLabel, QMessageBox
+
+from src import backend as bck, retry
+from src.frontend.app_components import CustomWindow, QTitleLabel
+
+
+class RetryPolicyWindow(CustomWindow):
+    """
+    Window for editing retry policy of the selected AppRequest or of every AppRequest of the collection.
+    """
+    def __init__(self, window: CustomWindow, back: bck.AppBackend, request: bck.AppRequest):
+        super().__init__(back)
+        self.setWindowTitle("Повторы и ограничение частоты")
+        self.back = back
+        self.request = request
+        self.back.antiGC["retry"] = self
+        policy = request.retryPolicy
+        layout = QVBoxLayout()
+        layout.setAlignment(Qt.AlignmentFlag.AlignTop)
+        layout.addWidget(QTitleLabel("Повторы и ограничение частоты"))
+        layout.addWidget(QLabel(f"Запрос: {request.name}"))
+
+        form = QFormLayout()
+        self.retries = QSpinBox()
+        self.retries.setRange(0, 100)
+        self.retries.setValue(policy.retries)
+        form.addRow("Повторных попыток:", self.retries)
+        self.backoff = QDoubleSpinBox()
+        self.backoff.setRange(0, 3600)
+        self.backoff.setSuffix(" с")
+        self.backoff.setValue(policy.backoff)
+        form.addRow("Задержка перед первым повтором:", self.backoff)
+        self.maxBackoff = QDoubleSpinBox()
+        self.maxBackoff.setRange(0, 3600)
+        self.maxBackoff.setSuffix(" с")
+        self.maxBackoff.setValue(policy.maxBackoff)
+        form.addRow("Максимальная задержка:", self.maxBackoff)
+        self.statuses = QLineEdit(", ".join(str(status) for status in policy.statuses))
+        form.addRow("Повторять при статус кодах:", self.statuses)
+        self.rate = QDoubleSpinBox()
+        self.rate.setRange(0, 100000)
+        self.rate.setDecimals(2)
+        self.rate.setValue(policy.rate)
+        self.rate.setToolTip("0 - без ограничения")
+        form.addRow("Запросов в секунду на хост:", self.rate)
+        self.burst = QSpinBox()
+        self.burst.setRange(1, 100000)
+        self.burst.setValue(policy.burst)
+        form.addRow("Запросов подряд без ожидания:", self.burst)
+        formWidget = QWidget()
+        formWidget.setLayout(form)
+        layout.addWidget(formWidget)
+        layout.addWidget(QLabel("Заголовок Retry-After у ответов 429 и 503 учитывается всегда."))
+
+        self.applyToAll = QCheckBox("Применить ко всем запросам коллекции")
+        layout.addWidget(self.applyToAll)
+        save = QPushButton("Сохранить")
+        save.clicked.connect(self.savePolicy)
+        layout.addWidget(save)
+
+        w = QWidget()
+        w.setLayout(layout)
+        self.setCentralWidget(w)
+        self.resize(500, 400)
+        self.centerOnScreen()
+        self.show()
+
+    def savePolicy(self):
+        try:
+            statuses = [int(status) for status in self.statuses.text().replace(",", " ").split()]
+        except ValueError:
+            QMessageBox.warning(self, "Внимание", "Статус коды должны быть числами")
+            return
+        requests = self.back.model.requests.values() if self.applyToAll.isChecked() else [self.request]
+        for request in requests:
+            request.retryPolicy = retry.RetryPolicy(self.retries.value(), self.backoff.value(), self.maxBackoff.value(),
+                                                    statuses, self.rate.value(), self.burst.value())
+            request.markChanged()
+        self.close()
+
+    def closeEvent(self, a0):
+        del self.back.antiGC["retry"]
+        super().closeEvent(a0)
@@ -0,0 +1,106 @@
+from PyQt6.QtCore import Qt
+from PyQt6.QtGui import QIcon
+from PyQt6.QtWidgets import QVBoxLayout, QHBoxLayout, QWidget, QListWidget, QInputDialog, QLabel, QLineEdit, \
+    QPushButton, QMessageBox
+
+from src import backend as bck, shared_constrains, secrets_backend as secrets
+from src.frontend.app_components import CustomWindow, IconButton, QTitleLabel, WarningToast
+
+
+class SecretsWindow(CustomWindow):
+    """
+    Window for managing secrets of SecretsStorage.
+    Values are never displayed, only their names.
+    """
+    def __init__(self, window: CustomWindow, back: bck.AppBackend):
+        super().__init__(back)
+        self.setWindowTitle("Секреты")
+        self.back = back
+        self.storage: secrets.SecretsStorage = back.secretStorage
+        self.back.antiGC["secrets"] = self
+        layout = QVBoxLayout()
+        layout.setAlignment(Qt.AlignmentFlag.AlignTop)
+        layout.addWidget(QTitleLabel("Секреты"))
+        layout.addWidget(WarningToast(shared_constrains.SECRETS_WARNING))
+        layout.addWidget(QLabel("Используйте {{secret.имя}} в адресе, заголовках и теле запроса."))
+
+        controls = QWidget()
+        controlsLayout = QHBoxLayout()
+        controlsLayout.setContentsMargins(5, 8, 5, 0)
+        self.lockButton = QPushButton()
+        self.lockButton.clicked.connect(self.toggleLock)
+        controlsLayout.addWidget(self.lockButton)
+        controlsLayout.addStretch()
+        self.createButton = IconButton(QIcon("assets/create.png"))
+        self.createButton.setToolTip("Новый секрет")
+        self.createButton.clicked.connect(self.createSecret)
+        controlsLayout.addWidget(self.createButton)
+        self.eraseButton = IconButton(QIcon("assets/erase.png"))
+        self.eraseButton.setToolTip("Удалить секрет")
+        self.eraseButton.clicked.connect(self.deleteSecret)
+        controlsLayout.addWidget(self.eraseButton)
+        controls.setLayout(controlsLayout)
+        layout.addWidget(controls)
+
+        self.list = QListWidget()
+        self.list.itemDoubleClicked.connect(lambda item: self.editSecret(item.text()))
+        layout.addWidget(self.list)
+
+        w = QWidget()
+        w.setLayout(layout)
+        self.setCentralWidget(w)
+        self.resize(600, 400)
+        self.centerOnScreen()
+        self.updateState()
+        self.show()
+
+    def updateState(self):
+        unlocked = self.storage.isUnlocked()
+        self.lockButton.setText("Заблокировать" if unlocked else "Разблокировать...")
+        self.createButton.setDisabled(not unlocked)
+        self.eraseButton.setDisabled(not unlocked)
+        self.list.setDisabled(not unlocked)
+        self.list.clear()
+        if unlocked:
+            self.list.addItems(self.storage.names())
+
+    def toggleLock(self):
+        if self.storage.isUnlocked():
+            self.storage.lockStorage()
+        else:
+            title = "Разблокировать" if self.storage.isCreated() else "Задайте пароль хранилища секретов"
+            password, ok = QInputDialog.getText(self, title, "Пароль:", QLineEdit.EchoMode.Password)
+            if not ok or password == "":
+                return
+            try:
+                self.storage.unlock(password)
+            except secrets.SecretsError as e:
+                QMessageBox.warning(self, "Внимание", str(e))
+        self.updateState()
+
+    def createSecret(self):
+        name, ok = QInputDialog.getText(self, "Новый секрет", "Название секрета:")
+        if not ok or name.strip() == "":
+            return
+        self.editSecret(name.strip())
+
+    def editSecret(self, name: str):
+        value, ok = QInputDialog.getText(self, name, "Значение:", QLineEdit.EchoMode.Password)
+        if not ok:
+            return
+        try:
+            self.storage.set(name, value)
+        except secrets.SecretsError as e:
+            QMessageBox.warning(self, "Внимание", str(e))
+        self.updateState()
+
+    def deleteSecret(self):
+        item = self.list.currentItem()
+        if item is None:
+            return
+        self.storage.delete(item.text())
+        self.updateState()
+
+    def closeEvent(self, a0):
+        del self.back.antiGC["secrets"]
+        super().closeEvent(a0)
@@ -0,0 +1,161 @@
+from PyQt6.QtCore import QAbstractListModel, Qt, QVariant, QTimer, QModelIndex
+from PyQt6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QListView, QPushButton, QCheckBox, QLineEdit
+
+from src import backend as bck, transport
+from src.streaming import MessageBuffer
+
+# Interval between view updates in milliseconds. Messages received in between are added as one batch
+REFRESH_INTERVAL = 100
+
+
+class MessageListModel(QAbstractListModel):
+    """
+    Read only list over a MessageBuffer. Row 0 is message number `first` of the buffer.
+    Only the amount of rows is tracked, text of a message is read from the buffer when the view paints it,
+    so thousands of messages per second cost one row insertion per refresh.
+    """
+    def __init__(self):
+        super().__init__()
+        self.buffer: MessageBuffer | None = None
+        self.first = 0
+        self.count = 0
+
+    def setBuffer(self, buffer: MessageBuffer | None):
+        self.beginResetModel()
+        self.buffer = buffer
+        self.first, received = (0, 0) if buffer is None else buffer.snapshot()
+        self.count = received - self.first
+        self.endResetModel()
+
+    def refresh(self) -> bool:
+        """
+        Synchronizes rows with the buffer.
+        :return: True if rows were added
+        """
+        if self.buffer is None:
+            return False
+        dropped, received = self.buffer.snapshot()
+        if received < self.first + self.count:
+            self.setBuffer(self.buffer) # Buffer was cleared
+            return False
+        if dropped > self.first and self.count > 0:
+            removed = min(dropped - self.first, self.count)
+            self.beginRemoveRows(QModelIndex(), 0, removed - 1)
+            self.first += removed
+            self.count -= removed
+            self.endRemoveRows()
+        self.first = max(self.first, dropped)
+        count = received - self.first
+        if count <= self.count:
+            return False
+        self.beginInsertRows(QModelIndex(), self.count, count - 1)
+        self.count = count
+        self.endInsertRows()
+        return True
+
+    def rowCount(self, parent = None):
+        return self.count
+
+    def data(self, index, role = Qt.ItemDataRole.DisplayRole):
+        if index.isValid() and role == Qt.ItemDataRole.DisplayRole and self.buffer is not None:
+            message = self.buffer.get(self.first + index.row())
+            return "" if message is None else message.toText() # Dropped messages disappear on the next refresh
+        return QVariant()
+
+
+class StreamViewWidget(QWidget):
+    """
+    Messages of WebSocket and SSE connections of the selected AppRequest.
+    """
+    def __init__(self, back: bck.AppBackend):
+        super().__init__()
+        self.back = back
+        self.selected: bck.AppRequest | None = None
+        self.lastReceived = 0
+        layout = QVBoxLayout()
+
+        controls = QWidget()
+        controlsLayout = QHBoxLayout()
+        controlsLayout.setContentsMargins(5, 8, 5, 0)
+        self.stateLabel = QLabel()
+        controlsLayout.addWidget(self.stateLabel)
+        self.rateLabel = QLabel()
+        controlsLayout.addWidget(self.rateLabel)
+        controlsLayout.addStretch()
+        self.autoscroll = QCheckBox("Прокручивать к новым")
+        self.autoscroll.setChecked(True)
+        controlsLayout.addWidget(self.autoscroll)
+        clearBtn = QPushButton("Очистить")
+        clearBtn.clicked.connect(self.clearMessages)
+        controlsLayout.addWidget(clearBtn)
+        self.closeBtn = QPushButton("Закрыть соединение")
+        self.closeBtn.clicked.connect(lambda: self.back.closeStream(self.selected))
+        controlsLayout.addWidget(self.closeBtn)
+        controls.setLayout(controlsLayout)
+        layout.addWidget(controls)
+
+        self.model = MessageListModel()
+        self.list = QListView()
+        self.list.setUniformItemSizes(True) # Lets the view skip measuring every row
+        self.list.setModel(self.model)
+        layout.addWidget(self.list)
+
+        sendWrapper = QWidget()
+        sendLayout = QHBoxLayout()
+        sendLayout.setContentsMargins(0, 0, 0, 0)
+        self.messageEdit = QLineEdit()
+        self.messageEdit.setPlaceholderText("Сообщение для отправки по WebSocket")
+        self.messageEdit.returnPressed.connect(self.sendMessage)
+        sendLayout.addWidget(self.messageEdit)
+        self.sendBtn = QPushButton("Отправить")
+        self.sendBtn.clicked.connect(self.sendMessage)
+        sendLayout.addWidget(self.sendBtn)
+        sendWrapper.setLayout(sendLayout)
+        layout.addWidget(sendWrapper)
+        self.setLayout(layout)
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(REFRESH_INTERVAL)
+
+    def emitDataUpdate(self, back: bck.AppBackend, selected: bck.AppRequest):
+        buffer = None if selected is None else back.streamBuffers.get(selected.id)
+        if selected is not self.selected or buffer is not self.model.buffer:
+            self.selected = selected
+            self.model.setBuffer(buffer)
+            self.lastReceived = 0 if buffer is None else buffer.received
+        self.updateState()
+
+    def updateState(self):
+        connection = None if self.selected is None else self.back.streams.get(self.selected.id)
+        isOpen = connection is not None and connection.open
+        if self.selected is None or self.selected.protocol not in transport.STREAM_PROTOCOLS:
+            self.stateLabel.setText("Выберите WebSocket или SSE запрос и нажмите \"Отправить\"")
+        else:
+            self.stateLabel.setText("Подключено" if isOpen else "Не подключено")
+        canSend = isOpen and self.selected.protocol == transport.WEBSOCKET
+        self.messageEdit.setDisabled(not canSend)
+        self.sendBtn.setDisabled(not canSend)
+        self.closeBtn.setDisabled(not isOpen)
+
+    def refresh(self):
+        if not self.isVisible() or self.model.buffer is None:
+            return
+        if self.model.refresh() and self.autoscroll.isChecked():
+            self.list.scrollToBottom()
+        received = self.model.buffer.received
+        rate = (received - self.lastReceived) * 1000 // REFRESH_INTERVAL
+        self.lastReceived = received
+        self.rateLabel.setText(f"Сообщений: {received} ({rate} в секунду)")
+        self.updateState()
+
+    def clearMessages(self):
+        if self.model.buffer is not None:
+            self.model.buffer.clear()
+            self.model.setBuffer(self.model.buffer)
+            self.lastReceived = 0
+
+    def sendMessage(self):
+        if self.selected is not None and self.messageEdit.text() != "":
+            self.back.sendStreamMessage(self.selected, self.messageEdit.text())
+            self.messageEdit.clear()
@@ -0,0 +1,367 @@
+"""
+Export and import of collections in HAR 1.2 format (http://www.softwareishard.com/blog/har-12-spec/).
+Both directions stream entries one by one, so big captures are never built in memory as a whole.
+"""
+import base64
+import datetime
+import http
+import json
+import os
+import urllib.parse
+from typing import Callable, Iterator, TextIO
+
+import src.images as images
+import src.transport as transport
+import src.utils as utils
+from src.body_buffer import BodyBuffer, CHUNK_SIZE
+
+# Amount of characters read from HAR file at once
+READ_CHUNK_SIZE = 1024 * 1024
+# Stands for a binary response body in entry JSON until HarWriter streams the body in its place
+BODY_PLACEHOLDER = "\0body\0"
+CREATOR = {"name": "DenisJava's WebRequests", "version": "1.0"}
+# AppRequest#timings key -> HAR timings key
+TIMINGS = {"connect": "connect", "tls": "ssl", "send": "send", "wait": "wait", "receive": "receive"}
+
+
+class HarWriter:
+    """
+    Writes HAR log to a text file entry by entry.
+    Binary response bodies are base64 encoded chunk by chunk directly into the file.
+    """
+    def __init__(self, fw: TextIO):
+        self.fw = fw
+        self.entries = 0
+        fw.write('{"log": {"version": "1.2", "creator": ' + json.dumps(CREATOR) + ', "pages": [], "entries": [\n')
+
+    def writeEntry(self, entry: dict, body: BodyBuffer | None = None):
+        """
+        :param body: Binary response body. If given, entry's response.content.text is replaced with its base64
+        """
+        if self.entries > 0:
+            self.fw.write(",\n")
+        self.entries += 1
+        if body is None:
+            self.fw.write(json.dumps(entry))
+            return
+        entry["response"]["content"]["text"] = BODY_PLACEHOLDER
+        entry["response"]["content"]["encoding"] = "base64"
+        prefix, suffix = json.dumps(entry).split(json.dumps(BODY_PLACEHOLDER), 1)
+        self.fw.write(prefix + '"')
+        view = body.view()
+        for i in range(0, len(view), CHUNK_SIZE): # CHUNK_SIZE is divisible by 3, so chunks join without padding
+            self.fw.write(base64.b64encode(view[i : i + CHUNK_SIZE]).decode("ascii"))
+        self.fw.write('"' + suffix)
+
+    def close(self):
+        self.fw.write("\n]}}\n")
+
+
+class HarReader:
+    """
+    Iterates entries of a HAR file without loading the whole file.
+    Only the structure around log.entries is parsed by hand, every entry is decoded by json.
+    HarReader#position and HarReader#size are used to report progress.
+    """
+    def __init__(self, file: str):
+        self.file = file
+        self.size = max(os.path.getsize(file), 1)
+        self.position = 0
+        self.buffer = ""
+        self.offset = 0 # Position in the buffer
+        self.eof = False
+        self.fr: TextIO | None = None
+        self.decoder = json.JSONDecoder()
+
+    def read(self, amount: int = READ_CHUNK_SIZE):
+        chunk = self.fr.read(amount)
+        self.position += len(chunk)
+        if chunk == "":
+            self.eof = True
+        # Drop consumed part of the buffer
+        self.buffer = self.buffer[self.offset:] + chunk
+        self.offset = 0
+
+    def peek(self) -> str:
+        """
+        :return: Next non-whitespace character without consuming it
+        """
+        while True:
+            while self.offset < len(self.buffer) and self.buffer[self.offset] in " \t\r\n":
+                self.offset += 1
+            if self.offset < len(self.buffer):
+                return self.buffer[self.offset]
+            if self.eof:
+                raise ValueError("Unexpected end of HAR file")
+            self.read()
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} at {self.position - len(self.buffer) + self.offset}")
+        self.offset += 1
+
+    def value(self):
+        """
+        Decodes the next JSON value. Reads more of the file while the value is incomplete.
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.offset)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+                self.read(max(READ_CHUNK_SIZE, len(self.buffer))) # Grow geometrically for huge values
+                continue
+            if end == len(self.buffer) and not self.eof:
+                self.read() # Number at the end of the buffer might continue in the file
+                continue
+            self.offset = end
+            return value
+
+    def members(self) -> Iterator[str]:
+        """
+        Iterates keys of an object, value of every key must be consumed by the caller.
+        """
+        self.expect("{")
+        while (char := self.peek()) != "}":
+            if char == ",":
+                self.offset += 1
+                continue
+            key = self.value()
+            self.expect(":")
+            yield key
+        self.offset += 1
+
+    def __iter__(self) -> Iterator[dict]:
+        self.position = 0
+        self.buffer = ""
+        self.offset = 0
+        self.eof = False
+        with open(self.file, "r", encoding="utf-8-sig") as self.fr:
+            for key in self.members():
+                if key != "log":
+                    self.value()
+                    continue
+                for logKey in self.members():
+                    if logKey != "entries":
+                        self.value()
+                        continue
+                    self.expect("[")
+                    while (char := self.peek()) != "]":
+                        if char == ",":
+                            self.offset += 1
+                            continue
+                        yield self.value()
+                    self.offset += 1
+
+
+def isoTime(timestamp: float) -> str:
+    return datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc).isoformat()
+
+
+def nameValues(values: dict) -> list[dict]:
+    return [{"name": name, "value": value} for name, value in values.items()]
+
+
+def headerValue(headers: dict, name: str, default: str = "") -> str:
+    """
+    :return: Value of a header with case-insensitive name, HTTP/2 and browsers write header names in lower case
+    """
+    name = name.lower()
+    for key, value in headers.items():
+        if key.lower() == name:
+            return value
+    return default
+
+
+def entryFromJSON(request: dict) -> tuple[dict, BodyBuffer | None]:
+    """
+    Converts AppRequest JSON (see AppRequest#toJSON) to a HAR entry.
+    :return: Entry and binary response body that should be written with HarWriter#writeEntry
+    """
+    timings = request.get("tm", {})
+    protocol = timings.get("protocol", "HTTP/1.1")
+    requestHeaders = request.get("rqh", {})
+    responseHeaders = request.get("rsh", {})
+    harRequest = {
+        "method": request.get("m", "GET"),
+        "url": request.get("url", ""),
+        "httpVersion": protocol,
+        "cookies": [],
+        "headers": nameValues(requestHeaders),
+        "queryString": [{"name": name, "value": value} for name, value in
+                        urllib.parse.parse_qsl(urllib.parse.urlsplit(request.get("url", "")).query)],
+        "headersSize": -1,
+        "bodySize": 0,
+    }
+    requestBody = request.get("rqb", {"t": 0})
+    if requestBody["t"] == 1:
+        text = str(requestBody["d"])
+        harRequest["postData"] = {"mimeType": headerValue(requestHeaders, "Content-Type", "text/plain"), "text": text}
+        harRequest["bodySize"] = len(text.encode("utf-8"))
+    elif requestBody["t"] == 2:
+        body = BodyBuffer.coerce(requestBody["d"])
+        harRequest["postData"] = {"mimeType": headerValue(requestHeaders, "Content-Type", "application/octet-stream"),
+                                  "text": base64.b64encode(body.view()).decode("ascii"), "_encoding": "base64"}
+        harRequest["bodySize"] = len(body)
+
+    status = int(request["s"]) if str(request.get("s", "")).isdigit() else 0
+    try:
+        statusText = http.HTTPStatus(status).phrase
+    except ValueError:
+        statusText = ""
+    mimeType = headerValue(responseHeaders, "Content-Type")
+    content = {"size": 0, "mimeType": mimeType}
+    responseBody = request.get("rsb", {"t": 0})
+    binaryBody = None
+    if responseBody["t"] == 1:
+        content["text"] = str(responseBody["d"])
+        content["size"] = len(content["text"].encode("utf-8"))
+    elif responseBody["t"] in (2, 3):
+        binaryBody = BodyBuffer.coerce(responseBody["d"])
+        content["size"] = len(binaryBody)
+    cookies = []
+    for name, cookie in request.get("c", {}).items():
+        value, secure, version, domain, path, port, comment, expires, discard = cookie
+        harCookie = {"name": name, "value": value, "secure": bool(secure)}
+        if domain:
+            harCookie["domain"] = domain
+        if path:
+            harCookie["path"] = path
+        if expires:
+            harCookie["expires"] = isoTime(expires)
+        cookies.append(harCookie)
+
+    harTimings = {"blocked": -1, "dns": -1, "connect": -1, "ssl": -1, "send": 0, "wait": 0, "receive": 0}
+    for key, harKey in TIMINGS.items():
+        if key in timings:
+            harTimings[harKey] = timings[key]
+    total = sum(value for key, value in harTimings.items() if value > 0 and key != "ssl") # ssl is part of connect
+    entry = {
+        "startedDateTime": isoTime(timings.get("started", 0)),
+        "time": total,
+        "request": harRequest,
+        "response": {
+            "status": status,
+            "statusText": statusText,
+            "httpVersion": protocol,
+            "cookies": cookies,
+            "headers": nameValues(responseHeaders),
+            "content": content,
+            "redirectURL": headerValue(responseHeaders, "Location"),
+            "headersSize": -1,
+            "bodySize": content["size"],
+        },
+        "cache": {},
+        "timings": harTimings,
+        "comment": request.get("n", ""),
+    }
+    return entry, binaryBody
+
+
+def requestJSONFromEntry(entry: dict) -> dict:
+    """
+    Converts a HAR entry to AppRequest JSON that can be loaded with AppRequest.fromJSON.
+    """
+    harRequest = entry["request"]
+    harResponse = entry.get("response", {})
+    url = harRequest["url"]
+    split = urllib.parse.urlsplit(url)
+    requestBody = {"t": 0, "d": ""}
+    postData = harRequest.get("postData")
+    if postData is not None and "text" in postData:
+        if postData.get("_encoding") == "base64" or postData.get("encoding") == "base64":
+            body = BodyBuffer.fromBase64(postData["text"])
+            requestBody = {"t": 2, "d": body, "f": images.sniffImageFormat(body.view())
+                           or postData.get("mimeType", "image/png").rpartition("/")[2].upper()}
+        else:
+            requestBody = {"t": 1, "d": postData["text"]}
+
+    content = harResponse.get("content", {})
+    responseBody = {"t": 0, "d": ""}
+    if "text" in content:
+        if content.get("encoding") == "base64":
+            body = BodyBuffer.fromBase64(content["text"])
+            imageFormat = images.sniffImageFormat(body.view())
+            responseBody = {"t": 3, "d": body} if imageFormat is None else {"t": 2, "d": body, "f": imageFormat}
+        else:
+            responseBody = {"t": 1, "d": content["text"]}
+
+    cookies = {}
+    for cookie in harResponse.get("cookies", []):
+        expires = cookie.get("expires")
+        if expires:
+            try:
+                expires = int(datetime.datetime.fromisoformat(expires.replace("Z", "+00:00")).timestamp())
+            except ValueError:
+                expires = None
+        cookies[cookie["name"]] = [cookie.get("value", ""), bool(cookie.get("secure", False)), 0,
+                                   cookie.get("domain", ""), cookie.get("path", ""), "", "<no comment>",
+                                   expires or None, False]
+
+    timings = {}
+    httpVersion = harResponse.get("httpVersion") or harRequest.get("httpVersion") or ""
+    if httpVersion:
+        timings["protocol"] = "HTTP/2" if httpVersion.lower() in ("h2", "http/2", "http/2.0") else httpVersion.upper()
+    try:
+        timings["started"] = datetime.datetime.fromisoformat(entry["startedDateTime"].replace("Z", "+00:00")).timestamp()
+    except (KeyError, ValueError):
+        pass
+    for key, harKey in TIMINGS.items():
+        value = entry.get("timings", {}).get(harKey, -1)
+        if value is not None and value >= 0:
+            timings[key] = value
+
+    status = harResponse.get("status", 0)
+    responseHeaders = {header["name"]: header["value"] for header in harResponse.get("headers", [])
+                       if not header["name"].startswith(":")}
+    if harResponse.get("redirectURL") and not headerValue(responseHeaders, "Location"):
+        responseHeaders["Location"] = harResponse["redirectURL"] # Some tools write the target only as redirectURL
+    return {
+        "n": entry.get("comment") or f"{harRequest['method']} {split.netloc}{split.path}",
+        "p": transport.HTTP2 if timings.get("protocol") == "HTTP/2" else transport.HTTP1,
+        "m": harRequest["method"],
+        "url": url,
+        "s": str(status) if status else "XXX",
+        "c": cookies,
+        "rqb": requestBody,
+        "rsb": responseBody,
+        "rqh": {header["name"]: header["value"] for header in harRequest.get("headers", [])
+                if not header["name"].startswith(":")}, # HTTP/2 pseudo headers can not be sent by hand
+        "rsh": responseHeaders,
+        "tm": timings,
+    }
+
+
+def exportHar(file: str, root: dict, progress: Callable[[int], None] = lambda x: None) -> int:
+    """
+    Atomically writes requests of AppDataModel JSON root (see AppDataModel#toJSON) as HAR.
+    WebSocket and SSE requests are skipped.
+    :param progress: Receives percent of completion. Can raise an exception to cancel writing.
+    :return: Amount of written entries
+    """
+    requests = root["r"]
+    with utils.atomicWriter(file) as fw:
+        writer = HarWriter(fw)
+        for i, request in enumerate(requests):
+            if request.get("p") in transport.STREAM_PROTOCOLS:
+                continue
+            entry, body = entryFromJSON(request)
+            writer.writeEntry(entry, body)
+            progress(i * 100 // len(requests))
+        writer.close()
+    progress(100)
+    return writer.entries
+
+
+def importHar(file: str, progress: Callable[[int], None] = lambda x: None) -> Iterator[dict]:
+    """
+    Iterates AppRequest JSONs of every entry of a HAR file.
+    :param progress: Receives percent of completion. Can raise an exception to cancel reading.
+    """
+    reader = HarReader(file)
+    for entry in reader:
+        yield requestJSONFromEntry(entry)
+        progress(min(99, reader.position * 100 // reader.size))
+    progress(100)
@@ -0,0 +1,79 @@
+from collections import OrderedDict
+
+from PyQt6.QtGui import QImage
+
+from src.body_buffer import BodyBuffer
+
+# (magic bytes, format). Formats are named like Pillow names them
+SIGNATURES = [
+    (b"\x89PNG\r\n\x1a\n", "PNG"),
+    (b"\xff\xd8\xff", "JPEG"),
+    (b"GIF87a", "GIF"),
+    (b"GIF89a", "GIF"),
+]
+MIME_TYPES = {"PNG": "image/png", "JPEG": "image/jpeg", "GIF": "image/gif", "WEBP": "image/webp", "BMP": "image/bmp"}
+# Sizes of BMP info headers, "BM" alone is too short to tell a bitmap from text
+BMP_HEADER_SIZES = (12, 40, 52, 56, 64, 108, 124)
+# Decoded pixels kept by ImageCache
+CACHE_CAPACITY = 256 * 1024 * 1024
+
+
+def sniffImageFormat(data) -> str | None:
+    """
+    Detects image format by magic bytes, so Content-Type of a response (or extension of a file) does not matter.
+    :param data: bytes or memoryview of a body
+    :return: Format name (see SIGNATURES) or None if data is not an image
+    """
+    head = bytes(data[:32])
+    for magic, imageFormat in SIGNATURES:
+        if head.startswith(magic):
+            return imageFormat
+    if head.startswith(b"RIFF") and head[8:12] == b"WEBP":
+        return "WEBP"
+    if head.startswith(b"BM") and len(head) >= 18 and int.from_bytes(head[14:18], "little") in BMP_HEADER_SIZES:
+        return "BMP"
+    return None
+
+
+def mimeType(imageFormat: str) -> str:
+    return MIME_TYPES.get(imageFormat, "image/" + imageFormat.lower())
+
+
+class ImageCache:
+    """
+    Decoded images by digest of their body (see BodyBuffer#digest), least recently used are dropped
+    when decoded pixels take more than `capacity` bytes. Bodies that are not images are remembered as None,
+    so selecting a request again never decodes its body again.
+    """
+    def __init__(self, capacity: int = CACHE_CAPACITY):
+        self.capacity = capacity
+        self.size = 0
+        self.images: OrderedDict[bytes, QImage | None] = OrderedDict()
+
+    def decode(self, body: BodyBuffer) -> QImage | None:
+        """
+        :return: Decoded image or None if body can not be decoded
+        """
+        key = body.digest()
+        if key in self.images:
+            self.images.move_to_end(key)
+            return self.images[key]
+        # PyQt copies the view into a QByteArray once, no bytes object of the body is created before that
+        image = QImage.fromData(body.view())
+        image = None if image.isNull() else image
+        cost = 0 if image is None else image.sizeInBytes()
+        if cost <= self.capacity:
+            self.images[key] = image
+            self.size += cost
+            while self.size > self.capacity:
+                dropped = self.images.popitem(last=False)[1]
+                self.size -= 0 if dropped is None else dropped.sizeInBytes()
+        return image
+
+    def clear(self):
+        self.images.clear()
+        self.size = 0
+
+
+# Cache shared by all AssetViewWidgets
+cache = ImageCache()
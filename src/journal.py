@@ -0,0 +1,142 @@
+import json
+import os
+import time
+
+from src.body_buffer import jsonDefault
+
+# Journal is compacted into the main file when it has more entries than this
+COMPACT_ENTRIES = 1000
+# ...or when the last compaction happened longer than this amount of seconds ago
+COMPACT_INTERVAL = 600
+# Interval between autosaves in milliseconds
+AUTOSAVE_INTERVAL = 5000
+
+
+class CollectionJournal:
+    """
+    Write-ahead journal stored next to a .djwr file (<file>.journal).
+    Every line is a JSON object:
+    {"g": <generation>} - first line, generation of the main file the journal belongs to
+    {"id": <request id>, "r": <AppRequest JSON>} - request was created or changed (new requests go to the end)
+    {"id": <request id>, "d": 1} - request was deleted
+    {"s": <selected request>} - selection at the moment of the write
+    {"e": <environments>, "ae": <active environment>} - environments were changed
+    {"fo": <folders>} - folders were created, renamed, moved or deleted
+    {"lm": <limits>} - default request limits of the collection were changed
+    {"nw": <network settings>} - proxy or DNS settings of the collection were changed
+    Lines are only appended, so writing costs O(changes). A partially written last line (after a crash) is ignored.
+    Every save of the main file stores a new generation in it ("jg"). A journal of another generation was left
+    by a crash between writing the main file and clearing the journal, its changes are already in the main file,
+    so it is not replayed.
+    """
+    def __init__(self, file: str):
+        self.file = file
+        self.journalFile = file + ".journal"
+        self.generation: str | None = None # Generation of the main file, written to the first line
+        self.entries = 0
+        self.lastCompaction = time.monotonic()
+        if os.path.exists(self.journalFile):
+            with open(self.journalFile, "rb+") as fr:
+                end = 0
+                for line in fr:
+                    if line.endswith(b"\n"):
+                        self.entries += 1
+                        end += len(line)
+                # Drop partially written last line, so new entries do not get glued to it
+                fr.truncate(end)
+
+    def append(self, changes: dict, selected: str | None, environments: tuple[dict, str | None] | None = None,
+               folders: dict | None = None, limits: dict | None = None, network: dict | None = None):
+        """
+        :param changes: request id -> AppRequest JSON or None if request was deleted
+        :param selected: id of the selected request
+        :param environments: environments JSON and name of the active environment if they were changed
+        :param folders: folders JSON if they were changed
+        :param limits: collection limits JSON if they were changed
+        :param network: network settings JSON if they were changed
+        """
+        lines = []
+        for requestId, change in changes.items():
+            if change is None:
+                lines.append(json.dumps({"id": requestId, "d": 1}))
+            else:
+                lines.append(json.dumps({"id": requestId, "r": change}, default=jsonDefault))
+        if environments is not None:
+            lines.append(json.dumps({"e": environments[0], "ae": environments[1]}))
+        if folders is not None:
+            lines.append(json.dumps({"fo": folders}))
+        if limits is not None:
+            lines.append(json.dumps({"lm": limits}))
+        if network is not None:
+            lines.append(json.dumps({"nw": network}))
+        lines.append(json.dumps({"s": selected}))
+        header = [] if os.path.exists(self.journalFile) else [json.dumps({"g": self.generation})]
+        with open(self.journalFile, "a", encoding="utf-8") as fw:
+            fw.write("\n".join(header + lines) + "\n")
+            fw.flush()
+            os.fsync(fw.fileno())
+        self.entries += len(lines)
+
+    def replay(self, root: dict) -> dict:
+        """
+        Applies journal entries to JSON root of the main file. A journal of another generation is deleted.
+        """
+        self.generation = root.get("jg")
+        if not os.path.exists(self.journalFile):
+            return root
+        requests = root.setdefault("r", [])
+        positions = {request.get("id"): i for i, request in enumerate(requests)}
+        deleted = set()
+        stale = False
+        with open(self.journalFile, "r", encoding="utf-8") as fr:
+            for i, line in enumerate(fr):
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    break # Unfinished write, nothing valid can follow it
+                if i == 0 and entry.get("g") != self.generation:
+                    # Journals written before generations were added have no header, like their files have no "jg"
+                    stale = True
+                    break
+                if "g" in entry:
+                    continue
+                if "s" in entry:
+                    root["s"] = entry["s"]
+                elif "e" in entry:
+                    root["e"] = entry["e"]
+                    root["ae"] = entry["ae"]
+                elif "fo" in entry:
+                    root["fo"] = entry["fo"]
+                elif "lm" in entry:
+                    root["lm"] = entry["lm"]
+                elif "nw" in entry:
+                    root["nw"] = entry["nw"]
+                elif entry.get("d"):
+                    deleted.add(entry["id"])
+                else:
+                    deleted.discard(entry["id"])
+                    if entry["id"] in positions:
+                        requests[positions[entry["id"]]] = entry["r"]
+                    else:
+                        positions[entry["id"]] = len(requests)
+                        requests.append(entry["r"])
+        if stale:
+            self.clear(self.generation)
+        elif deleted:
+            root["r"] = [request for request in requests if request.get("id") not in deleted]
+        return root
+
+    def needsCompaction(self) -> bool:
+        return self.entries >= COMPACT_ENTRIES or \
+            (self.entries > 0 and time.monotonic() - self.lastCompaction >= COMPACT_INTERVAL)
+
+    def clear(self, generation: str | None = None):
+        """
+        Should be called after the main file was rewritten with all changes.
+        :param generation: Generation stored in the rewritten main file
+        """
+        if os.path.exists(self.journalFile):
+            os.remove(self.journalFile)
+        self.generation = generation
+        self.entries = 0
+        self.lastCompaction = time.monotonic()
@@ -0,0 +1,164 @@
+import contextlib
+import socket
+import threading
+import time
+from typing import Callable, Iterable, Iterator
+
+import requests
+
+# JSON keys of RequestLimits fields
+KEYS = {"connectTimeout": "ct", "readTimeout": "rt", "deadline": "dl", "maxRedirects": "mr", "maxSize": "ms"}
+
+
+class LimitExceeded(requests.exceptions.RequestException):
+    """
+    Base class of errors raised when a response breaks one of RequestLimits.
+    """
+    pass
+
+
+class DeadlineExceeded(LimitExceeded):
+    """
+    Not a requests Timeout, so retries (see retry.sendWithRetries) do not start the request again.
+    """
+    pass
+
+
+class ResponseTooLarge(LimitExceeded):
+    pass
+
+
+def abortResponse(response: requests.Response):
+    """
+    Makes a read of a streamed requests.Response that is blocked in another thread fail.
+    Socket is shut down instead of closed, so the reading thread still owns the file descriptor.
+    """
+    connection = response.raw.connection
+    if connection is not None and connection.sock is not None:
+        try:
+            connection.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass # Connection is already closed
+
+
+class RequestLimits:
+    """
+    Resource limits of sending a request. A field that is None is taken from the collection defaults
+    (see RequestLimits#merged), 0 disables the limit. maxRedirects of 0 means redirects are not followed.
+    Times are in seconds, maxSize is in bytes.
+    """
+    def __init__(self, connectTimeout: float | None = None, readTimeout: float | None = None,
+                 deadline: float | None = None, maxRedirects: int | None = None, maxSize: int | None = None):
+        self.connectTimeout = connectTimeout
+        self.readTimeout = readTimeout
+        self.deadline = deadline # Time of the whole request including downloading the body
+        self.maxRedirects = maxRedirects
+        self.maxSize = maxSize
+
+    @staticmethod
+    def fromJSON(data: dict | None):
+        data = {} if data is None else data
+        return RequestLimits(**{name: data.get(key) for name, key in KEYS.items()})
+
+    def toJSON(self) -> dict:
+        return {key: getattr(self, name) for name, key in KEYS.items() if getattr(self, name) is not None}
+
+    def merged(self, defaults) -> "RequestLimits":
+        """
+        :return: Limits with unset fields taken from defaults
+        """
+        return RequestLimits(**{name: getattr(defaults, name) if getattr(self, name) is None else getattr(self, name)
+                                for name in KEYS})
+
+    def deadlineAt(self, start: float) -> float | None:
+        """
+        :param start: time.perf_counter() when the request was started
+        :return: time.perf_counter() of the deadline or None if there is no deadline
+        """
+        return start + self.deadline if self.deadline else None
+
+    def timeout(self, deadline: float | None = None) -> tuple[float | None, float | None]:
+        """
+        :param deadline: time.perf_counter() of the deadline, see RequestLimits#deadlineAt
+        :return: (connect, read) timeout for requests, both capped by the time left until the deadline
+        :raise DeadlineExceeded: If the deadline has already passed
+        """
+        left = None if deadline is None else deadline - time.perf_counter()
+        if left is not None and left <= 0:
+            raise DeadlineExceeded(f"Response was not received in {self.deadline} seconds")
+
+        def cap(value):
+            value = value or None
+            if left is not None:
+                return left if value is None else min(value, left)
+            return value
+        return cap(self.connectTimeout), cap(self.readTimeout)
+
+    @contextlib.contextmanager
+    def timeoutsOf(self, deadline: float | None):
+        """
+        Raises timeouts that happened because they were capped by the deadline as DeadlineExceeded.
+        """
+        try:
+            yield
+        except requests.exceptions.Timeout as e:
+            if deadline is not None and time.perf_counter() >= deadline:
+                raise DeadlineExceeded(f"Response was not received in {self.deadline} seconds") from e
+            raise
+
+    def checkLength(self, headers):
+        """
+        Aborts before the body is read if Content-Length is already over maxSize.
+        """
+        length = headers.get("Content-Length")
+        if self.maxSize and length is not None and length.isdigit() and int(length) > self.maxSize:
+            raise ResponseTooLarge(f"Response body is {length} bytes, limit is {self.maxSize}")
+
+    @contextlib.contextmanager
+    def watchdog(self, deadline: float | None, abort: Callable[[], None]):
+        """
+        Calls abort from another thread when the deadline passes, so a body that keeps trickling in
+        (and never lets limitChunks see the time) is still cut off. Errors caused by the abort
+        are raised as DeadlineExceeded.
+        :param deadline: time.perf_counter() of the deadline, see RequestLimits#deadlineAt
+        :param abort: Should make the blocked read fail, e.g. shut down the socket
+        """
+        if deadline is None:
+            yield
+            return
+        fired = threading.Event()
+
+        def fire():
+            fired.set()
+            abort()
+
+        timer = threading.Timer(max(0.0, deadline - time.perf_counter()), fire)
+        timer.daemon = True
+        timer.start()
+        try:
+            yield
+        except Exception as e:
+            if fired.is_set():
+                raise DeadlineExceeded(f"Response was not received in {self.deadline} seconds") from e
+            raise
+        finally:
+            timer.cancel()
+
+    def limitChunks(self, chunks: Iterable[bytes], deadline: float | None) -> Iterator[bytes]:
+        """
+        Passes chunks of a response body through until maxSize or the deadline is exceeded.
+        :param deadline: time.perf_counter() of the deadline, see RequestLimits#deadlineAt
+        """
+        size = 0
+        for chunk in chunks:
+            size += len(chunk)
+            if self.maxSize and size > self.maxSize:
+                raise ResponseTooLarge(f"Response body is bigger than {self.maxSize} bytes")
+            if deadline is not None and time.perf_counter() > deadline:
+                raise DeadlineExceeded(f"Response was not received in {self.deadline} seconds")
+            yield chunk
+
+
+# Used for fields that are set neither in the request nor in the collection
+DEFAULT_LIMITS = RequestLimits(10.0, 60.0, 0, 30, 0)
+
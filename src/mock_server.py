@@ -0,0 +1,313 @@
+"""
+Mock server that replays responses saved in a collection.
+
+Usage (from the project's root):
+    python -m src.mock_server collection.djwr [--env NAME] [--host 127.0.0.1] [--port 8080]
+                                              [--latency 0] [--jitter 0] [--throughput 0]
+
+Every HTTP(S) request of the collection that has a saved response becomes a route: method, path and query
+of its URL ({{variables}} of --env are substituted) answer with the saved status, headers and body.
+Host of the URL is ignored, so all services of a collection are served from one port.
+Requests that match no route get 404 with a JSON description.
+--latency and --jitter (milliseconds) delay every response, --throughput (KB/s) limits speed of sending
+a body per connection. Served with asyncio, so thousands of keep-alive connections cost no threads.
+"""
+import argparse
+import asyncio
+import http
+import json
+import random
+import sys
+import threading
+import time
+from urllib.parse import urlsplit, parse_qsl, urlencode
+
+import src.backend as backend
+import src.templating as templating
+import src.transport as transport
+
+# Saved response headers that describe the original transfer, not the replayed one
+SKIPPED_HEADERS = {"content-length", "transfer-encoding", "content-encoding", "connection", "keep-alive"}
+# Limit of request line with headers
+MAX_HEAD_SIZE = 64 * 1024
+# Interval of throughput shaping in seconds, a body is sent in parts of throughput * SHAPING_INTERVAL bytes
+SHAPING_INTERVAL = 0.05
+
+
+class ShapingSettings:
+    """
+    Latency and throughput of replayed responses.
+    latency and jitter are in seconds, every response waits latency ± jitter before it is sent.
+    throughput is in bytes per second per connection, 0 sends bodies at full speed.
+    """
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, throughput: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.throughput = throughput
+
+    def delay(self) -> float:
+        return max(0.0, self.latency + random.uniform(-self.jitter, self.jitter))
+
+
+class MockResponse:
+    """
+    Saved response of an AppRequest, encoded once when routes are built.
+    Binary bodies are kept as BodyBuffers and sent from their memoryview without copying.
+    """
+    def __init__(self, name: str, status: int, headers: list[tuple[str, str]], body):
+        self.name = name
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    @staticmethod
+    def fromRequest(request: backend.AppRequest):
+        value = request.responseBody.value
+        if value.get("t") in (2, 3):
+            body = value["d"].view()
+        else:
+            body = str(value.get("d", "")).encode("utf-8")
+        headers = [(name, value) for name, value in request.responseHeaders.dict.items()
+                   if name.lower() not in SKIPPED_HEADERS]
+        return MockResponse(request.name, int(request.statusCode), headers, body)
+
+    def head(self, keepAlive: bool) -> bytes:
+        try:
+            reason = http.HTTPStatus(self.status).phrase
+        except ValueError:
+            reason = ""
+        lines = [f"HTTP/1.1 {self.status} {reason}"]
+        lines += [f"{name}: {value}" for name, value in self.headers]
+        lines.append(f"Content-Length: {len(self.body)}")
+        lines.append(f"Connection: {'keep-alive' if keepAlive else 'close'}")
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1", errors="replace")
+
+
+def routeKey(method: str, url: str) -> tuple[str, str, str]:
+    """
+    :return: Method, path and query with sorted parameters, so order of parameters does not matter
+    """
+    split = urlsplit(url)
+    return method.upper(), split.path or "/", urlencode(sorted(parse_qsl(split.query, keep_blank_values=True)))
+
+
+class MockRoutes:
+    """
+    Saved responses by route key (see routeKey). A request with a query that was never saved is answered
+    by a route with the same method and path if there is one. The first request of the collection wins
+    if several requests have the same route.
+    """
+    def __init__(self):
+        self.routes: dict[tuple[str, str, str], MockResponse] = {}
+        self.paths: dict[tuple[str, str], MockResponse] = {}
+
+    @staticmethod
+    def fromModel(model: backend.AppDataModel, variables: dict | None = None):
+        """
+        :param variables: Substituted into URLs, variables of the active environment by default
+        """
+        variables = model.getVariables() if variables is None else variables
+        routes = MockRoutes()
+        for request in model.requests.values():
+            if request.protocol in transport.STREAM_PROTOCOLS or not str(request.statusCode).isdigit():
+                continue # Streams can not be replayed, requests without a status were never sent
+            key = routeKey(request.method, templating.render(request.url, variables))
+            if key not in routes.routes:
+                response = MockResponse.fromRequest(request)
+                routes.routes[key] = response
+                routes.paths.setdefault(key[:2], response)
+        return routes
+
+    def __len__(self):
+        return len(self.routes)
+
+    def find(self, method: str, target: str) -> MockResponse | None:
+        key = routeKey(method, target)
+        response = self.routes.get(key)
+        if response is None and method.upper() == "HEAD":
+            response = self.routes.get(("GET", *key[1:]))
+        return response if response is not None else self.paths.get(key[:2])
+
+
+def notFound(method: str, target: str) -> MockResponse:
+    body = json.dumps({"error": "No saved response", "method": method, "target": target}).encode()
+    return MockResponse("", 404, [("Content-Type", "application/json")], body)
+
+
+class MockServer:
+    """
+    asyncio HTTP/1.1 server of MockRoutes. Can run in a daemon thread (start/stop, like StandInServer)
+    or in the calling thread (serveForever).
+    Usage: with MockServer(routes) as server: requests.get(server.url("/api/items"))
+    """
+    def __init__(self, routes: MockRoutes, shaping: ShapingSettings | None = None, host: str = "127.0.0.1",
+                 port: int = 0):
+        self.routes = routes
+        self.shaping = ShapingSettings() if shaping is None else shaping
+        self.host = host
+        self.port = port
+        self.served = 0
+        self.missed = 0
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self.server: asyncio.Server | None = None
+        self.thread: threading.Thread | None = None
+
+    def url(self, path: str = "/") -> str:
+        return f"http://{self.host}:{self.port}{path}"
+
+    async def listen(self):
+        self.server = await asyncio.start_server(self.handleConnection, self.host, self.port, limit=MAX_HEAD_SIZE)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def readBody(self, reader: asyncio.StreamReader, headers: dict[str, str]):
+        """
+        Reads and drops body of a request, replayed responses do not depend on it.
+        """
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            while True:
+                size = int((await reader.readuntil(b"\r\n")).split(b";")[0], 16)
+                await reader.readexactly(size + 2)
+                if size == 0:
+                    return
+        length = int(headers.get("content-length", 0))
+        if length > 0:
+            await reader.readexactly(length)
+
+    async def sendBody(self, writer: asyncio.StreamWriter, body):
+        throughput = self.shaping.throughput
+        if throughput <= 0:
+            writer.write(body)
+            await writer.drain()
+            return
+        part = max(1, int(throughput * SHAPING_INTERVAL))
+        start = time.perf_counter()
+        for offset in range(0, len(body), part):
+            writer.write(body[offset : offset + part])
+            await writer.drain()
+            # Sleep until the time the sent bytes are due at, so the average speed is kept despite slow wakeups
+            delay = start + (offset + part) / throughput - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+    async def handleConnection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except asyncio.IncompleteReadError:
+                    return # Client closed a kept alive connection
+                lines = head.decode("latin-1").split("\r\n")
+                method, target, version = lines[0].split(" ", 2)
+                headers = {}
+                for line in lines[1:]:
+                    name, separator, value = line.partition(":")
+                    if separator:
+                        headers[name.strip().lower()] = value.strip()
+                await self.readBody(reader, headers)
+                connection = headers.get("connection", "").lower()
+                keepAlive = connection != "close" and (version != "HTTP/1.0" or connection == "keep-alive")
+
+                response = self.routes.find(method, target)
+                if response is None:
+                    self.missed += 1
+                    response = notFound(method, target)
+                else:
+                    self.served += 1
+                delay = self.shaping.delay()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                writer.write(response.head(keepAlive))
+                if method.upper() != "HEAD":
+                    await self.sendBody(writer, response.body)
+                else:
+                    await writer.drain()
+                if not keepAlive:
+                    return
+        except (ConnectionError, asyncio.LimitOverrunError, asyncio.IncompleteReadError, ValueError):
+            pass # Broken or malformed request, the connection is dropped
+        except asyncio.CancelledError:
+            pass # Server is stopped. Not re-raised, asyncio streams of Python 3.11 log cancelled handlers as errors
+        finally:
+            writer.close()
+
+    async def shutdown(self):
+        self.server.close()
+        # Handlers of kept alive connections are waiting for the next request, they are cancelled
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self.server.wait_closed()
+
+    def start(self):
+        """
+        :raise OSError: If the port can not be bound
+        """
+        started = threading.Event()
+        errors = []
+
+        def run():
+            self.loop = asyncio.new_event_loop()
+            try:
+                self.loop.run_until_complete(self.listen())
+            except OSError as e:
+                errors.append(e)
+                self.loop.close()
+                return
+            finally:
+                started.set()
+            self.loop.run_forever()
+            self.loop.run_until_complete(self.shutdown())
+            self.loop.close()
+        self.thread = threading.Thread(target=run, daemon=True)
+        self.thread.start()
+        started.wait()
+        if errors:
+            raise errors[0]
+        return self
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+    def serveForever(self):
+        async def serve():
+            await self.listen()
+            print(f"Serving {len(self.routes)} saved responses at {self.url()}", flush=True)
+            async with self.server:
+                await self.server.serve_forever()
+        asyncio.run(serve())
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, excType, excValue, traceback):
+        self.stop()
+
+
+def main(argv: list[str]) -> int:
+    from src.process_runner import loadCollection
+    parser = argparse.ArgumentParser(description="DenisJava's WebRequests mock server")
+    parser.add_argument("collection", help=".djwr file")
+    parser.add_argument("--env", default=None, help="Environment to take URL variables from")
+    parser.add_argument("--secrets", default=None, help="Secrets database, secrets.db by default")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=8080, help="Port to listen on, 0 - any free port")
+    parser.add_argument("--latency", type=float, default=0, help="Delay of every response in milliseconds")
+    parser.add_argument("--jitter", type=float, default=0, help="Random deviation of the delay in milliseconds")
+    parser.add_argument("--throughput", type=float, default=0,
+                        help="Speed of sending bodies in KB/s per connection, 0 - unlimited")
+    args = parser.parse_args(argv)
+
+    model = loadCollection({"collection": args.collection, "env": args.env, "secrets": args.secrets})
+    shaping = ShapingSettings(args.latency / 1000, args.jitter / 1000, int(args.throughput * 1024))
+    server = MockServer(MockRoutes.fromModel(model), shaping, args.host, args.port)
+    try:
+        server.serveForever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
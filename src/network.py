@@ -0,0 +1,267 @@
+import ipaddress
+import socket
+import threading
+import time
+import urllib.parse
+import weakref
+
+import httpcore
+import requests
+import urllib3.util.connection
+
+# Seconds a resolved address is reused. The system resolver does not report TTLs of records, so it is fixed
+DEFAULT_DNS_TTL = 60.0
+
+
+class NetworkSettings:
+    """
+    Network settings of a collection: proxy for HTTP(S) requests and DNS cache.
+    proxy is an URL like http://host:3128 or socks5://host:1080, empty string means no proxy
+    (proxies from environment variables are still used). Hosts of noProxy (comma separated,
+    *.example.com for subdomains) are connected directly. overrides maps host names to IP addresses
+    that are used instead of resolving them, for example to hit a specific backend behind a load balancer.
+    """
+    def __init__(self, proxy: str = "", noProxy: str = "", dnsTtl: float = DEFAULT_DNS_TTL,
+                 overrides: dict[str, str] | None = None):
+        self.proxy = proxy
+        self.noProxy = noProxy
+        self.dnsTtl = dnsTtl
+        self.overrides: dict[str, str] = {} if overrides is None else dict(overrides)
+
+    @staticmethod
+    def fromJSON(data: dict | None):
+        data = {} if data is None else data
+        return NetworkSettings(data.get("p", ""), data.get("np", ""), data.get("ttl", DEFAULT_DNS_TTL), data.get("o"))
+
+    def toJSON(self) -> dict:
+        return {"p": self.proxy, "np": self.noProxy, "ttl": self.dnsTtl, "o": dict(self.overrides)}
+
+    def noProxyHosts(self) -> list[str]:
+        return [host.strip() for host in self.noProxy.split(",") if host.strip() != ""]
+
+    def bypassesProxy(self, host: str) -> bool:
+        """
+        :return: True if host is listed in noProxy, *.example.com matches subdomains of example.com
+        """
+        host = host.lower().rstrip(".")
+        for pattern in self.noProxyHosts():
+            pattern = pattern.lower()
+            if pattern.startswith("*."):
+                if host.endswith(pattern[1:]):
+                    return True
+            elif host == pattern:
+                return True
+        return False
+
+    def proxies(self, url: str) -> dict | None:
+        """
+        requests only applies its no_proxy setting to proxies from environment variables, so noProxy is checked here.
+        :return: `proxies` argument of requests for a request to url, None if no proxy is set
+        """
+        if self.proxy == "":
+            return None
+        if self.bypassesProxy(urllib.parse.urlsplit(url).hostname or ""):
+            return {"http": None, "https": None} # None values also disable proxies from environment variables
+        return {"http": self.proxy, "https": self.proxy}
+
+
+class DnsCache:
+    """
+    Process wide cache of resolved host names in front of the system resolver. Used by every
+    HTTP(S) connection of requests and httpx (see install and ResolvingBackend).
+    Overridden hosts are never resolved.
+    """
+    def __init__(self, ttl: float = DEFAULT_DNS_TTL):
+        self.ttl = ttl
+        self.overrides: dict[str, str] = {}
+        self.entries: dict[str, tuple[list[str], float]] = {} # host -> addresses and time.monotonic() of expiry
+        self.hosts: dict[str, list[int]] = {} # host -> [hits, misses, overridden]
+        self.lock = threading.Lock()
+
+    def configure(self, settings: NetworkSettings):
+        with self.lock:
+            if settings.dnsTtl != self.ttl or settings.overrides != self.overrides:
+                self.ttl = settings.dnsTtl
+                self.overrides = dict(settings.overrides)
+                self.entries.clear() # Addresses resolved with the old TTL or overrides are not valid anymore
+
+    def count(self, host: str, kind: int):
+        self.hosts.setdefault(host, [0, 0, 0])[kind] += 1
+
+    def resolve(self, host: str, port: int) -> list[str]:
+        """
+        :return: IP addresses of host
+        :raise socket.gaierror: If host can not be resolved
+        """
+        try:
+            ipaddress.ip_address(host)
+            return [host]
+        except ValueError:
+            pass
+        with self.lock:
+            if host in self.overrides:
+                self.count(host, 2)
+                return [self.overrides[host]]
+            entry = self.entries.get(host)
+            if entry is not None and entry[1] > time.monotonic():
+                self.count(host, 0)
+                return entry[0]
+            self.count(host, 1)
+        # Resolved without the lock, so a slow lookup does not block other hosts
+        addresses = []
+        for family, kind, protocol, name, address in socket.getaddrinfo(host, port, type=socket.SOCK_STREAM):
+            if address[0] not in addresses:
+                addresses.append(address[0])
+        with self.lock:
+            if self.ttl > 0:
+                self.entries[host] = (addresses, time.monotonic() + self.ttl)
+        return addresses
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hosts.clear()
+
+    def snapshot(self) -> list[tuple]:
+        """
+        :return: (host, addresses, seconds until expiry or None for overrides, hits, misses) for every known host
+        """
+        now = time.monotonic()
+        with self.lock:
+            rows = []
+            for host, (hits, misses, overridden) in sorted(self.hosts.items()):
+                if host in self.overrides:
+                    rows.append((host, [self.overrides[host]], None, overridden, misses))
+                else:
+                    addresses, expires = self.entries.get(host, ([], now))
+                    rows.append((host, addresses, max(0.0, expires - now), hits, misses))
+            return rows
+
+    def totals(self) -> tuple[int, int, int]:
+        """
+        :return: Hits, misses and overridden lookups of all hosts
+        """
+        with self.lock:
+            return tuple(sum(counts[i] for counts in self.hosts.values()) for i in range(3))
+
+
+class ConnectionStats:
+    """
+    Lifetime counters of sent requests and opened TCP connections per origin (host:port).
+    Requests minus connections is the amount of requests that reused a connection.
+    """
+    def __init__(self):
+        self.origins: dict[str, list[int]] = {} # origin -> [requests, connections]
+        self.lock = threading.Lock()
+
+    def add(self, origin: str, index: int):
+        with self.lock:
+            self.origins.setdefault(origin, [0, 0])[index] += 1
+
+    def requestSent(self, url: str):
+        split = urllib.parse.urlsplit(url)
+        port = split.port or (443 if split.scheme in ("https", "wss") else 80)
+        self.add(f"{split.hostname}:{port}", 0)
+
+    def connectionOpened(self, host: str, port: int):
+        self.add(f"{host}:{port}", 1)
+
+    def snapshot(self) -> list[tuple[str, int, int]]:
+        with self.lock:
+            return [(origin, counts[0], counts[1]) for origin, counts in sorted(self.origins.items())]
+
+    def clear(self):
+        with self.lock:
+            self.origins.clear()
+
+
+dns = DnsCache()
+stats = ConnectionStats()
+sessions = weakref.WeakSet() # requests.Sessions whose pools are shown by poolSnapshot
+local = threading.local()
+
+
+def newSession() -> requests.Session:
+    """
+    :return: Session whose connection pools are shown in diagnostics
+    """
+    session = requests.Session()
+    sessions.add(session)
+    return session
+
+
+def threadSession() -> requests.Session:
+    """
+    :return: Session of the calling thread, so requests sent one after another reuse connections
+    """
+    if not hasattr(local, "session"):
+        local.session = newSession()
+    return local.session
+
+
+originalCreateConnection = urllib3.util.connection.create_connection
+
+
+def createConnection(address, *args, **kwargs):
+    """
+    Replacement of urllib3.util.connection.create_connection that resolves hosts through the DnsCache.
+    """
+    host, port = address
+    stats.connectionOpened(host, port)
+    lastError = None
+    for ip in dns.resolve(host, port):
+        try:
+            return originalCreateConnection((ip, port), *args, **kwargs)
+        except OSError as e:
+            lastError = e
+    raise lastError if lastError is not None else socket.gaierror(f"No addresses for {host}")
+
+
+class ResolvingBackend(httpcore.SyncBackend):
+    """
+    Network backend of httpcore that resolves hosts through the DnsCache. TLS still uses the host name.
+    """
+    def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        stats.connectionOpened(host, port)
+        try:
+            addresses = dns.resolve(host, port)
+        except socket.gaierror as e:
+            raise httpcore.ConnectError(str(e)) from e
+        lastError = None
+        for ip in addresses:
+            try:
+                return super().connect_tcp(ip, port, timeout, local_address, socket_options)
+            except httpcore.ConnectError as e:
+                lastError = e
+        raise lastError
+
+
+def install():
+    """
+    Routes connections of requests (urllib3) through the DnsCache. httpx clients use ResolvingBackend instead.
+    """
+    urllib3.util.connection.create_connection = createConnection
+
+
+def poolSnapshot() -> list[tuple[str, str, int, int, int]]:
+    """
+    :return: (client, origin, opened connections, idle connections, requests) for every HTTP/1 connection pool
+    of sessions created with newSession
+    """
+    rows = []
+    for session in list(sessions):
+        for adapter in session.adapters.values():
+            managers = [adapter.poolmanager, *getattr(adapter, "proxy_manager", {}).values()]
+            for manager in managers:
+                for key in manager.pools.keys():
+                    pool = manager.pools.get(key)
+                    if pool is None:
+                        continue
+                    # Queue of a pool is filled with None placeholders for connections that are not opened yet
+                    idle = 0 if pool.pool is None else sum(1 for conn in list(pool.pool.queue) if conn is not None)
+                    rows.append(("requests", f"{pool.scheme}://{pool.host}:{pool.port}", pool.num_connections,
+                                 idle, pool.num_requests))
+    return rows
+
+
+install()
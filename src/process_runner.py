@@ -0,0 +1,181 @@
+import multiprocessing
+import multiprocessing.connection
+import os
+import time
+import traceback
+from typing import Callable
+
+import src.backend as backend
+import src.secrets_backend as secrets
+import src.transport as transport
+from src.dataset_runner import DatasetReader, DatasetRunner, RunSummary, RowResult, CONCURRENCY, splitDataset
+
+# Results a worker collects before sending them to the parent process
+RESULT_BATCH = 64
+
+
+def loadCollection(options: dict) -> backend.AppDataModel:
+    """
+    Reads the collection and unlocks secrets like the headless runner does.
+    :param options: "collection", "env" and "secrets" of the run, see ProcessRunner
+    """
+    if options.get("secrets") is not None:
+        secrets.storage.file = options["secrets"]
+    if "DJWR_SECRETS_PASSWORD" in os.environ:
+        try:
+            secrets.storage.unlock(os.environ["DJWR_SECRETS_PASSWORD"])
+        except secrets.SecretsError as e:
+            raise SystemExit(str(e))
+    model = backend.AppDataModel.readFile(options["collection"], None)
+    if options.get("env") is not None:
+        model.activeEnvironment = options["env"]
+    return model
+
+
+def shardRows(rows, shard: int, shards: int):
+    for index, row in enumerate(rows):
+        if index % shards == shard:
+            yield row
+
+
+def splitRateLimits(requests: list[backend.AppRequest], shards: int):
+    """
+    Every process has its own rate limiter, so rate and burst of every request are divided between processes.
+    :raise SystemExit: If burst of a rate limited request can not be divided, a process needs at least one token
+    """
+    for request in requests:
+        policy = request.retryPolicy
+        if policy.rate > 0 and policy.burst < shards:
+            raise SystemExit(f"Burst {policy.burst} of request {request.name} is smaller than {shards} processes, "
+                             f"use fewer processes")
+    for request in requests:
+        request.retryPolicy.rate /= shards
+        request.retryPolicy.burst /= shards
+
+
+def runShard(connection: multiprocessing.connection.Connection, options: dict, shard: int, shards: int,
+             part: tuple[int, int, int] | None = None):
+    """
+    Entry point of a worker process. Runs every `shards`-th request starting from `shard` or rows of
+    a part of the dataset and sends results to the parent in batches:
+    ("r", [(request name, RowResult JSON), ...]), then ("done", None) or ("error", traceback).
+    :param part: Part of the dataset, see dataset_runner.splitDataset
+    """
+    batch = []
+
+    def onResult(request: backend.AppRequest, result: RowResult):
+        batch.append((request.name, result.toJSON()))
+        if len(batch) >= RESULT_BATCH:
+            connection.send(("r", batch[:]))
+            batch.clear()
+
+    try:
+        model = loadCollection(options)
+        variables = model.getVariables()
+        concurrency = options.get("concurrency", CONCURRENCY)
+        if options.get("dataset") is not None:
+            request = findRequest(model, options.get("request"))
+            splitRateLimits([request], shards)
+            runner = DatasetRunner(request, variables, concurrency)
+            start, end, firstRow = part
+
+            def onRow(result: RowResult):
+                result.row += firstRow # Row indexes of DatasetRunner are local to the part
+                onResult(request, result)
+            runner.run(DatasetReader(options["dataset"], start, end), onRow)
+        else:
+            name = options.get("request")
+            runnable = [request for request in model.requests.values()
+                        if (name is None or request.name == name) and request.protocol not in transport.STREAM_PROTOCOLS]
+            splitRateLimits(runnable, shards)
+            for request in shardRows(runnable, shard, shards):
+                runner = DatasetRunner(request, variables, concurrency)
+                runner.run([{}], lambda result: onResult(request, result))
+        if batch:
+            connection.send(("r", batch))
+        connection.send(("done", None))
+    except SystemExit as e:
+        connection.send(("error", str(e))) # Expected failure like a missing request, traceback is noise
+    except BaseException:
+        connection.send(("error", traceback.format_exc()))
+    finally:
+        connection.close()
+
+
+def findRequest(model: backend.AppDataModel, name: str | None) -> backend.AppRequest:
+    for request in model.requests.values():
+        if name is None or request.name == name:
+            return request
+    raise SystemExit(f"Request {name} not found")
+
+
+class ProcessRunner:
+    """
+    Runs a collection (or a dataset) in several processes, so decoding bodies and running scripts is not
+    limited by the GIL of one process. Requests are sharded round-robin between processes, a dataset is split
+    into parts of consecutive rows (see dataset_runner.splitDataset), so every row is parsed only once.
+    Every process reads the collection itself and executes its shard with DatasetRunner.
+    Rate limits are divided evenly between processes (see splitRateLimits), so they are only approximate:
+    a process that finished its shard does not give its share to the others.
+    Results are streamed back over pipes and aggregated into one RunSummary in the calling process.
+    Processes are spawned, not forked, because Qt and open connections of the parent must not be shared.
+    """
+    def __init__(self, options: dict, processes: int | None = None):
+        """
+        :param options: "collection" file and optional "env", "secrets", "request", "dataset" and "concurrency"
+        :param processes: Worker processes, amount of CPU cores by default
+        """
+        self.options = options
+        self.processes = max(1, processes or os.cpu_count() or 1)
+
+    def run(self, onResult: Callable[[str, RowResult], None] = lambda name, result: None) -> RunSummary:
+        """
+        :param onResult: Receives request name and its result in the calling process
+        :raise RuntimeError: If a worker process failed, other workers are stopped
+        """
+        context = multiprocessing.get_context("spawn")
+        parts = [None] * self.processes
+        if self.options.get("dataset") is not None:
+            try:
+                parts = splitDataset(self.options["dataset"], self.processes)
+            except OSError as e:
+                raise RuntimeError(f"Dataset can not be read: {e}")
+        summary = RunSummary()
+        start = time.perf_counter()
+        workers = {} # Reading end of a pipe -> shard and process that did not finish yet
+        processes = []
+        try:
+            for shard in range(self.processes):
+                receiver, sender = context.Pipe(duplex=False)
+                process = context.Process(target=runShard, daemon=True,
+                                          args=(sender, self.options, shard, self.processes, parts[shard]))
+                process.start()
+                processes.append(process)
+                sender.close() # Parent keeps only the reading end, so EOF is seen when the worker dies
+                workers[receiver] = (shard, process)
+            while workers:
+                for receiver in multiprocessing.connection.wait(list(workers)):
+                    shard, process = workers[receiver]
+                    try:
+                        kind, payload = receiver.recv()
+                    except EOFError:
+                        process.join()
+                        kind, payload = "error", f"exit code {process.exitcode}"
+                    if kind == "r":
+                        for name, data in payload:
+                            result = RowResult.fromJSON(data)
+                            summary.add(result)
+                            onResult(name, result)
+                        continue
+                    del workers[receiver]
+                    receiver.close()
+                    if kind == "error":
+                        raise RuntimeError(f"Worker process {shard} failed: {payload}")
+        finally:
+            for receiver, (shard, process) in workers.items():
+                process.terminate()
+                receiver.close()
+            for process in processes:
+                process.join()
+        summary.elapsed = time.perf_counter() - start
+        return summary
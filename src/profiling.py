@@ -0,0 +1,133 @@
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from PyQt6.QtCore import QObject, QTimer
+
+
+class Span:
+    """
+    Single timed operation. Times are stored in nanoseconds from time.perf_counter_ns
+    """
+    __slots__ = ("name", "category", "start", "duration", "threadId")
+
+    def __init__(self, name: str, category: str, start: int, duration: int, threadId: int):
+        self.name = name
+        self.category = category
+        self.start = start
+        self.duration = duration
+        self.threadId = threadId
+
+
+class Profiler:
+    """
+    Collects timed spans and event loop lag samples into ring buffers.
+    Only the last `capacity` spans are kept, so the profiler can stay enabled all the time.
+    """
+    def __init__(self, capacity: int = 4096):
+        self.spans: deque[Span] = deque(maxlen=capacity)
+        # (time in ns, lag in ms)
+        self.lagSamples: deque[tuple[int, float]] = deque(maxlen=capacity)
+        self.enabled = True
+
+    @contextmanager
+    def span(self, name: str, category: str = "app"):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.spans.append(Span(name, category, start, time.perf_counter_ns() - start, threading.get_ident()))
+
+    def timed(self, name: str, category: str = "app"):
+        """
+        Decorator version of Profiler#span
+        """
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.span(name, category):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def recordLag(self, lag: float):
+        self.lagSamples.append((time.perf_counter_ns(), lag))
+
+    def recentSpans(self, count: int) -> list[Span]:
+        spans = list(self.spans)
+        return spans[-count:]
+
+    def clear(self):
+        self.spans.clear()
+        self.lagSamples.clear()
+
+    def toChromeTrace(self) -> dict:
+        """
+        :return: Trace in Chrome trace-event format. Can be opened in chrome://tracing or ui.perfetto.dev
+        """
+        pid = os.getpid()
+        events = []
+        for span in list(self.spans):
+            events.append({
+                "name": span.name,
+                "cat": span.category,
+                "ph": "X",
+                "ts": span.start / 1000,
+                "dur": span.duration / 1000,
+                "pid": pid,
+                "tid": span.threadId,
+            })
+        for timestamp, lag in list(self.lagSamples):
+            events.append({
+                "name": "event loop lag",
+                "ph": "C",
+                "ts": timestamp / 1000,
+                "pid": pid,
+                "args": {"ms": lag},
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def exportChromeTrace(self, file: str):
+        with open(file, "w", encoding="utf-8") as fw:
+            json.dump(self.toChromeTrace(), fw)
+
+
+class EventLoopLagMonitor(QObject):
+    """
+    Measures how late Qt's event loop fires a periodic timer.
+    Lag is the difference between actual and expected interval in milliseconds.
+    """
+    def __init__(self, target: Profiler, interval: int = 50):
+        super().__init__()
+        self.target = target
+        self.interval = interval
+        self.lastTick = time.perf_counter()
+        self.lastLag = 0.0
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.tick)
+
+    def start(self):
+        self.lastTick = time.perf_counter()
+        self.timer.start(self.interval)
+
+    def stop(self):
+        self.timer.stop()
+
+    def tick(self):
+        now = time.perf_counter()
+        self.lastLag = max(0.0, (now - self.lastTick) * 1000 - self.interval)
+        self.lastTick = now
+        self.target.recordLag(self.lastLag)
+
+
+# Global profiler used by backend and frontend
+profiler = Profiler()
+timed = profiler.timed
+span = profiler.span
@@ -0,0 +1,211 @@
+import email.utils
+import random
+import threading
+import time
+import urllib.parse
+from typing import Callable
+
+import requests
+
+import src.limits as limits
+
+# Statuses that are retried by default
+RETRY_STATUSES = [429, 502, 503, 504]
+# Statuses with a Retry-After header that is honored
+RETRY_AFTER_STATUSES = (429, 503)
+# Retry-After longer than this amount of seconds is not waited for
+MAX_RETRY_AFTER = 300.0
+# Sleeping is split into steps of this amount of seconds, so it can be cancelled
+SLEEP_STEP = 0.1
+
+
+class RetryPolicy:
+    """
+    How an AppRequest is retried and how fast requests may be sent to its host.
+    Default policy makes a single attempt without rate limiting.
+    """
+    def __init__(self, retries: int = 0, backoff: float = 0.5, maxBackoff: float = 30.0,
+                 statuses: list[int] | None = None, rate: float = 0.0, burst: int = 1):
+        self.retries = retries # Additional attempts after the first one
+        self.backoff = backoff # Delay before the first retry in seconds, doubled for every next retry
+        self.maxBackoff = maxBackoff
+        self.statuses: list[int] = list(RETRY_STATUSES if statuses is None else statuses)
+        self.rate = rate # Requests per second to the same host, 0 means unlimited
+        self.burst = burst # Requests that can be sent at once after the host was idle
+
+    @staticmethod
+    def fromJSON(data: dict | None):
+        if data is None:
+            return RetryPolicy()
+        return RetryPolicy(data.get("n", 0), data.get("b", 0.5), data.get("mb", 30.0), data.get("st"),
+                           data.get("rl", 0.0), data.get("bu", 1))
+
+    def toJSON(self) -> dict:
+        return {"n": self.retries, "b": self.backoff, "mb": self.maxBackoff, "st": list(self.statuses),
+                "rl": self.rate, "bu": self.burst}
+
+    def canWait(self) -> bool:
+        """
+        :return: True if sending with this policy can sleep
+        """
+        return self.retries > 0 or self.rate > 0
+
+    def backoffDelay(self, attempt: int) -> float:
+        """
+        Exponential backoff with full jitter, so clients retrying at the same time spread out.
+        :param attempt: Index of the failed attempt, 0 for the first one
+        """
+        return random.uniform(0, min(self.maxBackoff, self.backoff * 2 ** attempt))
+
+    def retryDelay(self, attempt: int, resp: requests.Response) -> tuple[float, bool]:
+        """
+        :return: Delay before the next attempt and whether it was requested by the server with Retry-After
+        """
+        if resp.status_code in RETRY_AFTER_STATUSES:
+            retryAfter = parseRetryAfter(resp.headers.get("Retry-After"))
+            if retryAfter is not None:
+                return min(retryAfter, MAX_RETRY_AFTER), True
+        return self.backoffDelay(attempt), False
+
+
+def parseRetryAfter(value: str | None) -> float | None:
+    """
+    :param value: Retry-After header, either delay in seconds or an HTTP date
+    :return: Seconds to wait or None if header is missing or invalid
+    """
+    if value is None:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, date.timestamp() - time.time())
+
+
+class TokenBucket:
+    """
+    Allows `rate` acquisitions per second with bursts of up to `burst`.
+    Tokens can go negative: every caller reserves a token and is told how long to wait for it,
+    so concurrent callers are queued without polling.
+    """
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+
+    def reserve(self, now: float) -> float:
+        """
+        :return: Seconds to wait before the reserved token becomes available
+        """
+        if now > self.updated:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class HostRateLimiter:
+    """
+    Token buckets per host shared by all requests of the process, including concurrent dataset runs.
+    A host can also be paused after it answered with Retry-After.
+    """
+    def __init__(self):
+        self.buckets: dict[str, TokenBucket] = {}
+        self.pausedUntil: dict[str, float] = {}
+        self.lock = threading.Lock()
+
+    def reserve(self, url: str, policy: RetryPolicy) -> float:
+        """
+        :return: Seconds to wait before a request to the url can be sent
+        """
+        host = urllib.parse.urlsplit(url).netloc
+        now = time.monotonic()
+        with self.lock:
+            wait = max(0.0, self.pausedUntil.get(host, 0.0) - now)
+            if policy.rate > 0:
+                bucket = self.buckets.get(host)
+                if bucket is None:
+                    bucket = self.buckets[host] = TokenBucket(policy.rate, policy.burst)
+                elif bucket.rate != policy.rate or bucket.burst != max(1, policy.burst):
+                    bucket.rate = policy.rate
+                    bucket.burst = max(1, policy.burst)
+                # Tokens are refilled while waiting for the pause to end
+                wait = max(wait, bucket.reserve(now + wait) + wait)
+            return wait
+
+    def pause(self, url: str, seconds: float):
+        host = urllib.parse.urlsplit(url).netloc
+        with self.lock:
+            self.pausedUntil[host] = max(self.pausedUntil.get(host, 0.0), time.monotonic() + seconds)
+
+    def clear(self):
+        with self.lock:
+            self.buckets.clear()
+            self.pausedUntil.clear()
+
+
+def cancellableSleep(check: Callable[[], None]) -> Callable[[float], None]:
+    """
+    :param check: Called every SLEEP_STEP seconds, should raise an exception to stop sleeping
+    :return: Replacement for time.sleep
+    """
+    def sleep(seconds: float):
+        end = time.monotonic() + seconds
+        while (left := end - time.monotonic()) > 0:
+            check()
+            time.sleep(min(SLEEP_STEP, left))
+        check()
+    return sleep
+
+
+def checkDeadline(deadline: float | None, delay: float, cause: Exception | None = None):
+    """
+    :raise limits.DeadlineExceeded: If waiting delay seconds would pass the deadline
+    """
+    if deadline is not None and time.perf_counter() + delay >= deadline:
+        raise limits.DeadlineExceeded("Deadline passed before the request could be retried") from cause
+
+
+def sendWithRetries(send: Callable[[], tuple], url: str, policy: RetryPolicy,
+                    sleep: Callable[[float], None] = time.sleep, deadline: float | None = None) -> tuple:
+    """
+    Calls send until it returns a response with a status that is not retried, or attempts run out.
+    Connection errors and timeouts are retried too, broken limits (limits.LimitExceeded) are not.
+    Every attempt waits for the rate limiter of url's host.
+    :param send: Sends the request once and returns (requests.Response, body)
+    :param deadline: time.perf_counter() after which no more attempts are made, see limits.RequestLimits#deadlineAt
+    :return: (requests.Response, body, number of attempts)
+    """
+    attempt = 0
+    while True:
+        wait = limiter.reserve(url, policy)
+        checkDeadline(deadline, wait)
+        if wait > 0:
+            sleep(wait)
+        try:
+            resp, body = send()
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            if attempt >= policy.retries:
+                raise
+            delay = policy.backoffDelay(attempt)
+            checkDeadline(deadline, delay, e)
+        else:
+            if attempt >= policy.retries or resp.status_code not in policy.statuses:
+                return resp, body, attempt + 1
+            delay, requested = policy.retryDelay(attempt, resp)
+            if requested:
+                # Other requests to the same host wait too instead of hitting the limit again
+                limiter.pause(url, delay)
+                delay = 0.0
+            if deadline is not None and time.perf_counter() + delay >= deadline:
+                return resp, body, attempt + 1 # No time for another attempt, the last response is the result
+        if delay > 0:
+            sleep(delay)
+        attempt += 1
+
+
+limiter = HostRateLimiter()
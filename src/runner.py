@@ -0,0 +1,108 @@
+"""
+Headless collection runner.
+
+Usage (from the project's root):
+    python -m src.runner collection.djwr [--request NAME] [--env NAME] [--dataset rows.csv|rows.jsonl]
+                                         [--concurrency 8] [--processes 8] [--output results.jsonl]
+
+{{secret.name}} placeholders are resolved if the DJWR_SECRETS_PASSWORD environment variable holds the password
+of secrets.db (or the file given with --secrets).
+Without --dataset every request of the collection (or only --request) is executed once.
+With --dataset the request selected with --request is executed once per row, row's columns are {{variables}}.
+With --processes requests (or rows) are sharded between worker processes, see process_runner.ProcessRunner.
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import src.backend as backend
+import src.transport as transport
+from src.dataset_runner import DatasetReader, DatasetRunner, RunSummary, RowResult, CONCURRENCY
+from src.process_runner import ProcessRunner, findRequest, loadCollection
+
+
+def runCollection(model: backend.AppDataModel, name: str | None, concurrency: int, onResult) -> RunSummary:
+    """
+    Runs every request of the collection (or only requests with the name) once, at most `concurrency` requests
+    at the same time. WebSocket and SSE requests are skipped.
+    :param onResult: Called with the request and its RowResult in the calling thread
+    """
+    summary = RunSummary()
+    variables = model.getVariables()
+    sessions = threading.local() # Worker threads reuse their sessions for all requests
+    pending: dict[Future, backend.AppRequest] = {}
+
+    def collect():
+        done, notDone = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            result = future.result()
+            summary.add(result)
+            onResult(pending.pop(future), result)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        for request in model.requests.values():
+            if (name is not None and request.name != name) or request.protocol in transport.STREAM_PROTOCOLS:
+                continue
+            runner = DatasetRunner(request, variables, concurrency)
+            runner.local = sessions
+            pending[executor.submit(runner.runRow, 0, {})] = request
+            # Keep only a bounded amount of requests in flight, like DatasetRunner#run
+            while len(pending) >= concurrency * 2:
+                collect()
+        while pending:
+            collect()
+    summary.elapsed = time.perf_counter() - start
+    return summary
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(description="DenisJava's WebRequests headless runner")
+    parser.add_argument("collection", help=".djwr file")
+    parser.add_argument("--request", default=None, help="Name of the request to run")
+    parser.add_argument("--env", default=None, help="Environment to take variables from")
+    parser.add_argument("--dataset", default=None, help="CSV or JSONL file with one set of variables per row")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY, help="Requests executed at the same time")
+    parser.add_argument("--processes", type=int, default=1,
+                        help="Worker processes, 0 - one per CPU core. Every process runs --concurrency requests")
+    parser.add_argument("--secrets", default=None, help="Secrets database, secrets.db by default")
+    parser.add_argument("--output", default=None, help="JSONL file to write result of every request to")
+    args = parser.parse_args(argv)
+
+    options = {"collection": args.collection, "env": args.env, "secrets": args.secrets, "request": args.request,
+               "dataset": args.dataset, "concurrency": args.concurrency}
+    output = None if args.output is None else open(args.output, "w", encoding="utf-8")
+
+    def onResult(name: str, result: RowResult):
+        if output is not None:
+            output.write(json.dumps({"request": name, **result.toJSON()}) + "\n")
+        if not result.passed():
+            print(f"FAILED {name} row {result.row}: {result.status} {result.error}", file=sys.stderr)
+
+    try:
+        if args.processes != 1:
+            try:
+                summary = ProcessRunner(options, args.processes).run(onResult)
+            except RuntimeError as e:
+                raise SystemExit(str(e))
+        elif args.dataset is not None:
+            model = loadCollection(options)
+            request = findRequest(model, args.request)
+            runner = DatasetRunner(request, model.getVariables(), args.concurrency)
+            summary = runner.run(DatasetReader(args.dataset), lambda result: onResult(request.name, result))
+        else:
+            model = loadCollection(options)
+            summary = runCollection(model, args.request, args.concurrency,
+                                    lambda request, result: onResult(request.name, result))
+    finally:
+        if output is not None:
+            output.close()
+    print(summary.toText())
+    return 0 if summary.passed == summary.total else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,244 @@
+"""
+Pre-request and post-response python scripts of AppRequests.
+
+Scripts run in worker processes that are started once and reused, so big data-driven runs
+do not pay for interpreter startup. Every worker caches compiled code objects by hash of the script's source.
+Workers have limited memory, a script that runs longer than the timeout gets its own worker killed.
+
+This module must not import PyQt or backend modules: it is imported by every worker process.
+
+WARNING: Restricted builtins are not a security boundary. Only run scripts you trust.
+"""
+import builtins
+import hashlib
+import json
+import multiprocessing
+import threading
+from types import CodeType
+
+try:
+    import resource
+except ImportError: # Not available on Windows
+    resource = None
+
+# Modules scripts are allowed to import
+ALLOWED_MODULES = {"json", "re", "math", "base64", "hashlib", "hmac", "random", "string", "datetime", "time",
+                   "uuid", "urllib.parse", "itertools", "functools", "collections"}
+ALLOWED_BUILTINS = ["abs", "all", "any", "bool", "bytes", "chr", "dict", "divmod", "enumerate", "filter", "float",
+                    "format", "frozenset", "hash", "hex", "int", "isinstance", "issubclass", "iter", "len", "list",
+                    "map", "max", "min", "next", "oct", "ord", "pow", "print", "range", "repr", "reversed", "round",
+                    "set", "slice", "sorted", "str", "sum", "tuple", "type", "zip", "Exception", "ValueError",
+                    "TypeError", "KeyError", "IndexError", "AssertionError", "True", "False", "None"]
+
+WORKERS = 2
+TIMEOUT = 5.0 # seconds per script
+STARTUP_TIMEOUT = 30.0 # seconds for a worker process to start
+MEMORY_LIMIT = 512 * 1024 * 1024 # bytes of address space per worker
+
+
+class ScriptError(Exception):
+    """
+    Raised when script failed with an exception, timed out or its worker died.
+    """
+    pass
+
+
+# -- Worker side --
+
+# sha256 of source -> compiled code. Lives in every worker process
+compiledCache: dict[str, CodeType] = {}
+
+
+def initWorker(memoryLimit: int):
+    # CPU time is limited by ScriptEngine's timeout, RLIMIT_CPU would kill long-living workers of big runs
+    if resource is not None:
+        resource.setrlimit(resource.RLIMIT_AS, (memoryLimit, memoryLimit))
+
+
+def restrictedImport(name, globals=None, locals=None, fromlist=(), level=0):
+    if name not in ALLOWED_MODULES:
+        raise ImportError(f"Module {name} can not be imported in scripts")
+    return builtins.__import__(name, globals, locals, fromlist, level)
+
+
+def compileScript(source: str, kind: str) -> CodeType:
+    key = hashlib.sha256(source.encode("utf-8")).hexdigest()
+    code = compiledCache.get(key)
+    if code is None:
+        code = compile(source, f"<{kind} script>", "exec")
+        compiledCache[key] = code
+    return code
+
+
+class ScriptResponse:
+    """
+    `response` object available in post-response scripts
+    """
+    def __init__(self, data: dict):
+        self.status: int = data["status"]
+        self.headers: dict[str, str] = data["headers"]
+        self.body: str | None = data["body"]
+        self.elapsed: float = data["elapsed"]
+
+    def json(self):
+        return json.loads(self.body)
+
+
+def scriptGlobals(variables: dict) -> dict:
+    safeBuiltins = {name: getattr(builtins, name) for name in ALLOWED_BUILTINS}
+    safeBuiltins["__import__"] = restrictedImport
+    return {"__builtins__": safeBuiltins, "__name__": "__script__", "variables": variables}
+
+
+def runPreRequest(source: str, request: dict, variables: dict) -> tuple[dict, dict]:
+    """
+    Runs in a worker. Script can change `request` dict (method, url, headers, body) and `variables`.
+    """
+    scope = scriptGlobals(variables)
+    scope["request"] = request
+    exec(compileScript(source, "pre-request"), scope)
+    return scope["request"], scope["variables"]
+
+
+def runPostResponse(source: str, response: dict, variables: dict) -> tuple[list, dict]:
+    """
+    Runs in a worker. Script checks `response` with assert statements or check(name, condition) calls.
+    :return: list of (name, passed, message) and variables
+    """
+    results = []
+
+    def check(name: str, condition, message: str = ""):
+        results.append((name, bool(condition), message))
+        return bool(condition)
+
+    scope = scriptGlobals(variables)
+    scope["response"] = ScriptResponse(response)
+    scope["check"] = check
+    try:
+        exec(compileScript(source, "post-response"), scope)
+    except AssertionError as e:
+        results.append(("assert", False, str(e)))
+    return results, scope["variables"]
+
+
+def workerLoop(connection, memoryLimit: int):
+    """
+    Entry point of a worker process. Sends ("ready", None) once started, then receives (function, args)
+    and answers ("ok", result) or ("error", message) until the pipe is closed.
+    """
+    initWorker(memoryLimit)
+    connection.send(("ready", None))
+    while True:
+        try:
+            function, args = connection.recv()
+        except EOFError:
+            return
+        try:
+            answer = ("ok", function(*args))
+        except BaseException as e:
+            answer = ("error", f"{type(e).__name__}: {e}")
+        connection.send(answer)
+
+
+# -- Application side --
+
+class ScriptWorker:
+    """
+    Worker process with a pipe. Runs one script at a time, so a stuck script can be killed with its worker alone.
+    """
+    def __init__(self, context, generation: int):
+        self.generation = generation # ScriptEngine#generation when the worker was started
+        self.connection, child = context.Pipe()
+        self.process = context.Process(target=workerLoop, args=(child, MEMORY_LIMIT), daemon=True)
+        self.process.start()
+        child.close()
+        # Startup of the interpreter must not count towards the timeout of the first script
+        if not self.connection.poll(STARTUP_TIMEOUT):
+            self.kill()
+            raise ScriptError("Script worker did not start")
+        try:
+            self.connection.recv()
+        except EOFError:
+            self.kill()
+            raise ScriptError("Script worker did not start")
+
+    def call(self, function, args: tuple, timeout: float) -> tuple[str, object]:
+        """
+        :raise multiprocessing.TimeoutError: If the script did not finish in time
+        :raise EOFError: If the worker died, e.g. because of the memory limit
+        """
+        self.connection.send((function, args))
+        if not self.connection.poll(timeout):
+            raise multiprocessing.TimeoutError()
+        return self.connection.recv()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.connection.close()
+
+
+class ScriptEngine:
+    """
+    Owns worker processes, they are started lazily. At most `workers` scripts run at the same time,
+    other callers wait for a free worker. A script that times out gets only its own worker killed,
+    scripts of other threads (e.g. other dataset rows) keep running.
+    """
+    def __init__(self, workers: int = WORKERS, timeout: float = TIMEOUT):
+        self.workers = workers
+        self.timeout = timeout
+        self.idle: list[ScriptWorker] = []
+        self.slots = threading.Semaphore(workers)
+        self.generation = 0 # Increased by shutdown, so workers that were busy at that moment are not reused
+        self.lock = threading.Lock()
+
+    def takeWorker(self) -> ScriptWorker:
+        with self.lock:
+            if self.idle:
+                return self.idle.pop()
+            generation = self.generation
+        # spawn: forking a process with running Qt threads is not safe
+        return ScriptWorker(multiprocessing.get_context("spawn"), generation)
+
+    def releaseWorker(self, worker: ScriptWorker):
+        with self.lock:
+            if worker.generation == self.generation:
+                self.idle.append(worker)
+                return
+        worker.kill()
+
+    def run(self, function, *args):
+        with self.slots:
+            worker = self.takeWorker()
+            try:
+                status, value = worker.call(function, args, self.timeout)
+            except multiprocessing.TimeoutError:
+                worker.kill() # Only way to stop a running script
+                raise ScriptError(f"Script did not finish in {self.timeout} seconds")
+            except EOFError:
+                worker.kill()
+                raise ScriptError("Script worker died, the script probably used too much memory")
+            except Exception as e:
+                worker.kill() # Pipe may hold a partially sent message
+                raise ScriptError(f"{type(e).__name__}: {e}") from e
+            self.releaseWorker(worker)
+        if status == "error":
+            raise ScriptError(value)
+        return value
+
+    def runPreRequest(self, source: str, request: dict, variables: dict) -> tuple[dict, dict]:
+        return self.run(runPreRequest, source, request, variables)
+
+    def runPostResponse(self, source: str, response: dict, variables: dict) -> tuple[list, dict]:
+        return self.run(runPostResponse, source, response, variables)
+
+    def shutdown(self):
+        with self.lock:
+            self.generation += 1
+            idle = self.idle
+            self.idle = []
+        for worker in idle:
+            worker.kill()
+
+
+engine = ScriptEngine()
@@ -0,0 +1,114 @@
+import bisect
+import re
+
+# Only the beginning of text bodies is indexed, so huge bodies do not fill memory with tokens
+MAX_BODY_LENGTH = 64 * 1024
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> set[str]:
+    return set(TOKEN_PATTERN.findall(text.lower()))
+
+
+class SearchIndex:
+    """
+    In-memory inverted index of AppRequests: token -> ids of requests that contain it.
+    Requests are indexed by name, URL, method, header names and values and optionally text bodies.
+    Changed requests are only marked as dirty and are tokenized again by the next search,
+    so typing in a request costs nothing until the user searches.
+    Every word of a query is a prefix, requests that match all words are found.
+    """
+    def __init__(self, includeBodies: bool = False):
+        self.includeBodies = includeBodies
+        self.postings: dict[str, set[str]] = {}
+        self.documents: dict[str, set[str]] = {} # request id -> its tokens
+        self.vocabulary: list[str] = [] # Sorted tokens of postings for prefix lookups
+        self.dirty = {} # request id -> AppRequest changed since it was indexed
+
+    def requestText(self, request) -> str:
+        parts = [request.name, request.url, request.method]
+        for headers in (request.requestHeaders.dict, request.responseHeaders.dict):
+            for name, value in headers.items():
+                parts.append(name)
+                parts.append(str(value))
+        if self.includeBodies:
+            for body in (request.requestBody.value, request.responseBody.value):
+                if body["t"] == 1:
+                    parts.append(body["d"][:MAX_BODY_LENGTH])
+        return "\n".join(parts)
+
+    def markDirty(self, request):
+        self.dirty[request.id] = request
+
+    def remove(self, requestId: str):
+        self.dirty.pop(requestId, None)
+        for token in self.documents.pop(requestId, ()):
+            ids = self.postings[token]
+            ids.discard(requestId)
+            if not ids:
+                del self.postings[token]
+                self.vocabulary.pop(bisect.bisect_left(self.vocabulary, token))
+
+    def update(self, request):
+        tokens = tokenize(self.requestText(request))
+        old = self.documents.get(request.id, set())
+        for token in old - tokens:
+            ids = self.postings[token]
+            ids.discard(request.id)
+            if not ids:
+                del self.postings[token]
+                self.vocabulary.pop(bisect.bisect_left(self.vocabulary, token))
+        for token in tokens - old:
+            ids = self.postings.get(token)
+            if ids is None:
+                self.postings[token] = ids = set()
+                bisect.insort(self.vocabulary, token)
+            ids.add(request.id)
+        self.documents[request.id] = tokens
+
+    def setIncludeBodies(self, includeBodies: bool, requests: list):
+        if includeBodies != self.includeBodies:
+            self.includeBodies = includeBodies
+            for request in requests:
+                self.markDirty(request)
+
+    def sync(self, requests: list):
+        """
+        Indexes dirty requests and requests that were added without being marked as changed (e.g. read from a file).
+        """
+        known = len(self.documents) + sum(1 for requestId in self.dirty if requestId not in self.documents)
+        if known != len(requests):
+            ids = set()
+            for request in requests:
+                ids.add(request.id)
+                if request.id not in self.documents:
+                    self.dirty[request.id] = request
+            for requestId in [requestId for requestId in self.documents if requestId not in ids]:
+                self.remove(requestId)
+        for request in self.dirty.values():
+            self.update(request)
+        self.dirty.clear()
+
+    def prefixMatches(self, prefix: str) -> set[str]:
+        ids = set()
+        for i in range(bisect.bisect_left(self.vocabulary, prefix), len(self.vocabulary)):
+            token = self.vocabulary[i]
+            if not token.startswith(prefix):
+                break
+            ids |= self.postings[token]
+        return ids
+
+    def search(self, query: str, requests: list) -> set[str] | None:
+        """
+        :return: Ids of matching requests or None if query has no words (everything matches)
+        """
+        words = sorted(tokenize(query), key=len, reverse=True) # Longer prefixes match less, intersect them first
+        if not words:
+            return None
+        self.sync(requests)
+        result = self.prefixMatches(words[0])
+        for word in words[1:]:
+            if not result:
+                break
+            result &= self.prefixMatches(word)
+        return result
@@ -1,13 +1,164 @@
+import base64
+import os
 import pathlib
 import sqlite3
+import threading
+import time
+
+from cryptography.fernet import Fernet, InvalidToken
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+
+# Prefix of template variables that are looked up in the SecretsStorage, e.g. {{secret.token}}
+SECRET_PREFIX = "secret."
+# Seconds for which a decrypted secret is kept in memory
+SECRET_TTL = 300.0
+# PBKDF2 iterations used to derive encryption key from the password
+KDF_ITERATIONS = 600_000
+# Value encrypted with the key to check the password when unlocking
+PASSWORD_CHECK = b"DenisJava's WebRequests"
+
+
+class SecretsError(Exception):
+    pass
+
 
 class SecretsStorage:
-    def __init__(self):
-        self.databaseConnection = sqlite3.connect("secrets.db")
+    """
+    Secrets kept in a separate SQLite database. Values are encrypted with a key derived from the password,
+    names are stored as plain text.
+    Decrypted values are cached for SECRET_TTL seconds, so batch runs don't read and decrypt a secret for every request.
+    Can be used from multiple threads.
+    """
+    def __init__(self, file: str = "secrets.db"):
+        self.file = file
+        self.databaseConnection: sqlite3.Connection | None = None
+        self.statements: dict[str, str] = {} # name of .sql file -> its text
+        self.fernet: Fernet | None = None # None while locked
+        self.cache: dict[str, tuple[str, float]] = {} # name -> (value, expiration time)
+        self.lock = threading.Lock()
+
+    def connection(self) -> sqlite3.Connection:
+        if self.databaseConnection is None:
+            self.databaseConnection = sqlite3.connect(self.file, check_same_thread=False)
+            self.buildTables()
+        return self.databaseConnection
 
     def executeFile(self, name, args=()) -> sqlite3.Cursor:
-        expression = pathlib.Path(f"src/sql/{name}.sql").read_text()
-        return self.databaseConnection.execute(expression, args)
+        expression = self.statements.get(name)
+        if expression is None:
+            expression = pathlib.Path(__file__).parent.joinpath("sql", f"{name}.sql").read_text()
+            self.statements[name] = expression
+        # Passing the same string every time lets sqlite3 reuse its prepared statement
+        return self.connection().execute(expression, args)
 
     def buildTables(self):
-        self.executeFile("secrets_table")
\ No newline at end of file
+        self.executeFile("secrets_table")
+        self.executeFile("meta_table")
+        self.databaseConnection.commit()
+
+    def close(self):
+        with self.lock:
+            self.fernet = None
+            self.cache.clear()
+            if self.databaseConnection is not None:
+                self.databaseConnection.close()
+                self.databaseConnection = None
+
+    def isCreated(self) -> bool:
+        """
+        :return: True if password was already set for this storage
+        """
+        with self.lock:
+            return self.executeFile("meta_select", ("salt",)).fetchone() is not None
+
+    def isUnlocked(self) -> bool:
+        return self.fernet is not None
+
+    def unlock(self, password: str):
+        """
+        Derives encryption key from the password. Sets the password if storage is used for the first time.
+        :raises SecretsError: Password is wrong
+        """
+        with self.lock:
+            row = self.executeFile("meta_select", ("salt",)).fetchone()
+            salt = os.urandom(16) if row is None else row[0]
+            kdf = PBKDF2HMAC(algorithm=hashes.SHA256(), length=32, salt=salt, iterations=KDF_ITERATIONS)
+            fernet = Fernet(base64.urlsafe_b64encode(kdf.derive(password.encode("utf-8"))))
+            if row is None:
+                self.executeFile("meta_insert", ("salt", salt))
+                self.executeFile("meta_insert", ("check", fernet.encrypt(PASSWORD_CHECK)))
+                self.databaseConnection.commit()
+            else:
+                try:
+                    fernet.decrypt(self.executeFile("meta_select", ("check",)).fetchone()[0])
+                except InvalidToken:
+                    raise SecretsError("Неверный пароль")
+            self.fernet = fernet
+            self.cache.clear()
+
+    def lockStorage(self):
+        """
+        Forgets encryption key and all decrypted secrets.
+        """
+        with self.lock:
+            self.fernet = None
+            self.cache.clear()
+
+    def requireUnlocked(self) -> Fernet:
+        if self.fernet is None:
+            raise SecretsError("Хранилище секретов заблокировано")
+        return self.fernet
+
+    def get(self, name: str) -> str | None:
+        """
+        :return: Decrypted value of the secret or None if it doesn't exist or storage is locked
+        """
+        now = time.monotonic()
+        cached = self.cache.get(name)
+        if cached is not None and cached[1] > now:
+            return cached[0]
+        with self.lock:
+            if self.fernet is None:
+                return None
+            row = self.executeFile("secrets_select", (name,)).fetchone()
+            if row is None:
+                return None
+            value = self.fernet.decrypt(row[0]).decode("utf-8")
+            self.cache[name] = (value, now + SECRET_TTL)
+            return value
+
+    def set(self, name: str, value: str):
+        with self.lock:
+            fernet = self.requireUnlocked()
+            self.executeFile("secrets_insert", (name, fernet.encrypt(value.encode("utf-8"))))
+            self.databaseConnection.commit()
+            self.cache[name] = (value, time.monotonic() + SECRET_TTL)
+
+    def delete(self, name: str):
+        with self.lock:
+            self.executeFile("secrets_delete", (name,))
+            self.databaseConnection.commit()
+            self.cache.pop(name, None)
+
+    def names(self) -> list[str]:
+        with self.lock:
+            return [row[0] for row in self.executeFile("secrets_names")]
+
+    def lookup(self, variable: str) -> str | None:
+        """
+        Resolves template variable like "secret.token".
+        :return: Value of the secret or None if variable is not a secret
+        :raises SecretsError: Storage is locked or the secret doesn't exist, so its placeholder is never sent as it is
+        """
+        if not variable.startswith(SECRET_PREFIX):
+            return None
+        name = variable[len(SECRET_PREFIX):]
+        value = self.get(name)
+        if value is None:
+            self.requireUnlocked()
+            raise SecretsError(f"Секрет {name} не найден")
+        return value
+
+
+storage = SecretsStorage()
@@ -6,8 +6,18 @@ DenisJava's WebRequests - приложение с графическим инт
 """
 HTTP_METHODS = ["GET", "POST", "PUT", "DELETE", "HEAD", "TRACE", "PATCH", "OPTIONS"]
 NEW_HTTP_REQUEST = " + Новый HTTP/HTTPS запрос"
+NEW_WEBSOCKET = "WebSocket соединение"
+NEW_SSE = "SSE поток (Server-Sent Events)"
 DELETE_REQUEST = "Удалить выбранный запрос"
 NO_REQUEST_SELECTED = "< Выберете запрос чтобы начать"
 COOKIES_WARNING = ("Файлы cookie часто используют для аутентификации и прочих мер безопасности!\nБудьте осторожны с "
                    "этим разделом. Только файлы cookie со значением secure=false сохранены в файл запроса!")
+SCRIPTS_WARNING = ("Скрипты выполняются как python код на вашем компьютере! Не запускайте скрипты, полученные из "
+                   "ненадёжных источников.\nДоступны переменные request (перед запросом), response и check(name, "
+                   "condition) (после ответа), variables.")
+SCRIPTS_LOADED_WARNING = ("Открытый файл содержит python скрипты, которые будут выполнены при отправке запросов. "
+                          "Убедитесь, что доверяете источнику файла.")
+SECRETS_WARNING = ("Секреты подставляются в запросы вместо {{secret.имя}}. Запросы и python скрипты из ненадёжных "
+                   "коллекций могут отправить ваши секреты на сторонний сервер!\nЗначения зашифрованы паролем и "
+                   "хранятся в файле secrets.db отдельно от файлов запросов.")
 STYLESHEET: str | None = None
\ No newline at end of file
@@ -0,0 +1 @@
+SELECT value FROM meta WHERE key = ?
@@ -0,0 +1 @@
+DELETE FROM secrets WHERE name = ?
@@ -0,0 +1 @@
+INSERT OR REPLACE INTO secrets (name, value) VALUES (?, ?)
@@ -0,0 +1 @@
+SELECT name FROM secrets ORDER BY name
@@ -0,0 +1 @@
+SELECT value FROM secrets WHERE name = ?
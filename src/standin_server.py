@@ -0,0 +1,251 @@
+import base64
+import hashlib
+import json
+import struct
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+
+def gradientPng(width: int, height: int) -> bytes:
+    """
+    :return: RGB PNG with a gradient, encoded without image libraries
+    """
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+    rows = bytearray()
+    row = bytearray(width * 3)
+    row[0::3] = bytes(x % 256 for x in range(width))
+    row[2::3] = b"\x80" * width
+    for y in range(height):
+        row[1::3] = bytes((y % 256,)) * width
+        rows += b"\x00" + row # Filter type 0 before every row
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(rows, 1)) + chunk(b"IEND", b"")
+
+
+class StandInRequestHandler(BaseHTTPRequestHandler):
+    """
+    Handler of StandInServer. Every path returns a synthetic response:
+    /json   - small JSON document
+    /binary - random-looking bytes. Size is set with ?size=<bytes>. Supports Range requests,
+              with ?dropAfter=<bytes> the connection is closed after sending that many bytes of a response
+    /image  - ?width=<px> x ?height=<px> gradient PNG sent as application/octet-stream
+    /text   - UTF-8 text of ?size=<bytes> sent at once
+    /drip   - text body sent in ?chunks=<count> parts with ?delay=<seconds> between them
+    /redirect - ?count=<number> chained 302 redirects that end at /json
+    /status - empty body with ?code=<status code>, Retry-After header is added with ?retryAfter=<seconds>
+    /sse    - ?events=<count> Server-Sent Events with ?delay=<seconds> between them
+    /ws     - WebSocket that sends ?burst=<count> text messages after connecting and then echoes received messages
+    /flaky  - answers ?code=<status code> (503 by default) to the first ?failures=<count> requests with
+              the same ?key=<name>, then 200
+    Any other path echoes request's method, headers and body back as JSON.
+    """
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass # Benchmarks should not spam stderr
+
+    def handleAny(self):
+        url = urlsplit(self.path)
+        query = {key: value[-1] for key, value in parse_qs(url.query).items()}
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length) if length > 0 else b""
+
+        if url.path == "/json":
+            self.sendBody(200, "application/json", json.dumps({"id": 1, "name": "stand-in", "ok": True}).encode())
+        elif url.path == "/binary":
+            size = int(query.get("size", 1024 * 1024))
+            pattern = bytes(range(256))
+            self.sendRange((pattern * (size // 256 + 1))[:size], query.get("dropAfter"))
+        elif url.path == "/image":
+            self.sendBody(200, "application/octet-stream",
+                          gradientPng(int(query.get("width", 256)), int(query.get("height", 256))))
+        elif url.path == "/text":
+            size = int(query.get("size", 1024 * 1024))
+            line = b"lorem ipsum dolor sit amet, consectetur adipiscing elit \xd1\x82\xd0\xb5\xd0\xba\xd1\x81\xd1\x82\n"
+            self.sendBody(200, "text/plain; charset=utf-8", (line * (size // len(line) + 1))[:size - size % len(line)])
+        elif url.path == "/drip":
+            chunks = int(query.get("chunks", 10))
+            delay = float(query.get("delay", 0.01))
+            chunk = b"drip " * 20 + b"\n"
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; charset=utf-8")
+            self.send_header("Content-Length", str(len(chunk) * chunks))
+            self.end_headers()
+            try:
+                for i in range(chunks):
+                    self.wfile.write(chunk)
+                    self.wfile.flush()
+                    time.sleep(delay)
+            except (BrokenPipeError, ConnectionResetError):
+                self.close_connection = True # Client gave up waiting for the body
+        elif url.path == "/sse":
+            delay = float(query.get("delay", 0))
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+            self.wfile.write(b": stand-in stream\n\n")
+            for i in range(int(query.get("events", 10))):
+                self.wfile.write(f"id: {i}\nevent: {'tick' if i % 10 == 9 else 'message'}\ndata: event {i}\n\n".encode())
+                if delay > 0:
+                    self.wfile.flush()
+                    time.sleep(delay)
+            self.wfile.flush()
+            self.close_connection = True
+        elif url.path == "/ws" and self.headers.get("Upgrade", "").lower() == "websocket":
+            try:
+                self.handleWebSocket(int(query.get("burst", 0)))
+            except (BrokenPipeError, ConnectionResetError):
+                self.close_connection = True # Client closed the connection in the middle of a burst
+        elif url.path == "/redirect":
+            count = int(query.get("count", 1))
+            self.send_response(302)
+            self.send_header("Location", f"/redirect?count={count - 1}" if count > 1 else "/json")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+        elif url.path == "/status":
+            self.sendBody(int(query.get("code", 200)), "text/plain", b"", query.get("retryAfter"))
+        elif url.path == "/flaky":
+            with self.server.lock:
+                key = query.get("key", "")
+                attempt = self.server.attempts.get(key, 0)
+                self.server.attempts[key] = attempt + 1
+            if attempt < int(query.get("failures", 1)):
+                self.sendBody(int(query.get("code", 503)), "text/plain", b"", query.get("retryAfter"))
+            else:
+                self.sendBody(200, "text/plain", str(attempt + 1).encode())
+        else:
+            echo = {
+                "method": self.command,
+                "path": self.path,
+                "headers": dict(self.headers.items()),
+                "body": body.decode("utf-8", errors="replace")
+            }
+            self.sendBody(200, "application/json", json.dumps(echo).encode())
+
+    def handleWebSocket(self, burst: int):
+        accept = hashlib.sha1((self.headers["Sec-WebSocket-Key"] + "258EAFA5-E914-47DA-95CA-C5AB0DC85B11").encode())
+        self.send_response(101)
+        self.send_header("Upgrade", "websocket")
+        self.send_header("Connection", "Upgrade")
+        self.send_header("Sec-WebSocket-Accept", base64.b64encode(accept.digest()).decode())
+        self.end_headers()
+        for i in range(burst):
+            self.sendFrame(0x1, f"message {i}".encode())
+        self.wfile.flush()
+        while True:
+            header = self.rfile.read(2)
+            if len(header) < 2:
+                break
+            opcode = header[0] & 0x0F
+            length = header[1] & 0x7F
+            if length == 126:
+                length = struct.unpack(">H", self.rfile.read(2))[0]
+            elif length == 127:
+                length = struct.unpack(">Q", self.rfile.read(8))[0]
+            mask = self.rfile.read(4) if header[1] & 0x80 else b"\0\0\0\0"
+            payload = bytes(b ^ mask[i % 4] for i, b in enumerate(self.rfile.read(length)))
+            if opcode == 0x8:
+                self.sendFrame(0x8, payload)
+                break
+            self.sendFrame(opcode, payload)
+            self.wfile.flush()
+        self.close_connection = True
+
+    def sendFrame(self, opcode: int, payload: bytes):
+        if len(payload) < 126:
+            header = struct.pack(">BB", 0x80 | opcode, len(payload))
+        elif len(payload) < 65536:
+            header = struct.pack(">BBH", 0x80 | opcode, 126, len(payload))
+        else:
+            header = struct.pack(">BBQ", 0x80 | opcode, 127, len(payload))
+        self.wfile.write(header + payload)
+
+    def sendRange(self, body: bytes, dropAfter: str | None):
+        """
+        Sends body or the part of it requested with "Range: bytes=<start>-".
+        """
+        etag = f'"{len(body)}"'
+        start = 0
+        rangeHeader = self.headers.get("Range", "")
+        if rangeHeader.startswith("bytes=") and self.headers.get("If-Range", etag) == etag:
+            start = int(rangeHeader[6:].split("-")[0])
+        if start >= len(body) > 0:
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{len(body)}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(206 if start > 0 else 200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", etag)
+        if start > 0:
+            self.send_header("Content-Range", f"bytes {start}-{len(body) - 1}/{len(body)}")
+        self.send_header("Content-Length", str(len(body) - start))
+        self.end_headers()
+        if self.command == "HEAD":
+            return
+        if dropAfter is not None:
+            self.wfile.write(body[start:start + int(dropAfter)])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        try:
+            self.wfile.write(body[start:])
+        except (BrokenPipeError, ConnectionResetError):
+            pass # Client stopped the download, it will resume with a Range request
+
+    def sendBody(self, code: int, contentType: str, body: bytes, retryAfter: str | None = None):
+        self.send_response(code)
+        self.send_header("Content-Type", contentType)
+        if retryAfter is not None:
+            self.send_header("Retry-After", retryAfter)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    do_GET = handleAny
+    do_POST = handleAny
+    do_PUT = handleAny
+    do_DELETE = handleAny
+    do_HEAD = handleAny
+    do_PATCH = handleAny
+    do_OPTIONS = handleAny
+
+
+class StandInServer:
+    """
+    Local in-process HTTP server used instead of real services by benchmarks and test harnesses.
+    Runs in a daemon thread and binds to a random free port.
+    Usage: with StandInServer() as server: requests.get(server.url("/json"))
+    """
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.httpServer = ThreadingHTTPServer((host, port), StandInRequestHandler)
+        self.httpServer.daemon_threads = True
+        self.httpServer.lock = threading.Lock()
+        self.httpServer.attempts = {} # /flaky key -> requests received
+        self.thread: threading.Thread | None = None
+
+    def url(self, path: str = "/") -> str:
+        host, port = self.httpServer.server_address[:2]
+        return f"http://{host}:{port}{path}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpServer.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpServer.shutdown()
+        self.httpServer.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, excType, excValue, traceback):
+        self.stop()
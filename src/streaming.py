@@ -0,0 +1,209 @@
+import threading
+import time
+
+import requests
+import websocket
+
+import src.transport as transport
+
+# Messages kept per connection, older ones are dropped
+MAX_MESSAGES = 100_000
+# Longer messages are truncated, so a single message can not take a lot of memory
+MAX_MESSAGE_LENGTH = 16 * 1024
+# Message directions
+INCOMING = "←"
+OUTGOING = "→"
+SYSTEM = "•"
+
+
+class Message:
+    __slots__ = ("time", "direction", "text", "size")
+
+    def __init__(self, direction: str, data: str | bytes):
+        self.time = time.time()
+        self.direction = direction
+        self.size = len(data)
+        if isinstance(data, bytes):
+            data = data[:MAX_MESSAGE_LENGTH].hex(" ")
+        self.text = data if len(data) <= MAX_MESSAGE_LENGTH else data[:MAX_MESSAGE_LENGTH] + "…"
+
+    def toText(self) -> str:
+        clock = time.strftime("%H:%M:%S", time.localtime(self.time)) + f".{int(self.time * 1000) % 1000:03d}"
+        return f"{clock} {self.direction} {self.text}"
+
+
+class MessageBuffer:
+    """
+    Fixed size ring buffer of Messages filled by a reader thread and read by the GUI.
+    Messages are addressed by absolute sequence numbers: messages [dropped, received) are available,
+    so a view that lags behind the reader never shows a wrong message.
+    """
+    def __init__(self, capacity: int = MAX_MESSAGES):
+        self.capacity = capacity
+        self.items: list[Message | None] = [None] * capacity
+        self.received = 0
+        self.lock = threading.Lock()
+
+    def append(self, direction: str, data: str | bytes):
+        message = Message(direction, data)
+        with self.lock:
+            self.items[self.received % self.capacity] = message
+            self.received += 1
+
+    def dropped(self) -> int:
+        return max(0, self.received - self.capacity)
+
+    def snapshot(self) -> tuple[int, int]:
+        """
+        :return: Sequence numbers of the first available message and of the next message
+        """
+        with self.lock:
+            return self.dropped(), self.received
+
+    def get(self, sequence: int) -> Message | None:
+        """
+        :return: Message or None if it was already dropped
+        """
+        with self.lock:
+            if sequence < self.dropped() or sequence >= self.received:
+                return None
+            return self.items[sequence % self.capacity]
+
+    def clear(self):
+        with self.lock:
+            self.items = [None] * self.capacity
+            self.received = 0
+
+
+class StreamConnection:
+    """
+    Base class of connections that receive messages in their own thread into a MessageBuffer.
+    """
+    def __init__(self, request: dict, buffer: MessageBuffer):
+        self.request = request
+        self.buffer = buffer
+        self.closed = False
+        self.open = False
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.open = True
+        self.thread.start()
+        return self
+
+    def run(self):
+        try:
+            self.read()
+            if not self.closed:
+                self.buffer.append(SYSTEM, "Соединение закрыто сервером")
+        except Exception as e:
+            if not self.closed:
+                self.buffer.append(SYSTEM, f"Ошибка: {type(e).__name__}: {e}")
+        finally:
+            self.open = False
+
+    def read(self):
+        raise NotImplementedError()
+
+    def send(self, text: str):
+        raise NotImplementedError(f"{type(self).__name__} can not send messages")
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            if self.open:
+                self.buffer.append(SYSTEM, "Соединение закрыто")
+            self.abort()
+
+    def abort(self):
+        pass
+
+
+class WebSocketConnection(StreamConnection):
+    def __init__(self, request: dict, buffer: MessageBuffer):
+        super().__init__(request, buffer)
+        self.socket = websocket.WebSocket()
+        self.sendLock = threading.Lock()
+
+    def read(self):
+        headers = [f"{name}: {value}" for name, value in self.request["headers"].items()]
+        url = self.request["url"]
+        if url.startswith("http"):
+            url = "ws" + url[4:] # http://... -> ws://..., https://... -> wss://...
+        self.socket.connect(url, header=headers)
+        self.buffer.append(SYSTEM, f"Соединение установлено ({self.socket.getstatus()})")
+        while not self.closed:
+            opcode, data = self.socket.recv_data()
+            if opcode == websocket.ABNF.OPCODE_CLOSE:
+                return
+            if opcode == websocket.ABNF.OPCODE_TEXT:
+                data = data.decode("utf-8", errors="replace")
+            self.buffer.append(INCOMING, data)
+
+    def send(self, text: str):
+        with self.sendLock:
+            self.buffer.append(OUTGOING, text)
+            self.socket.send(text)
+
+    def abort(self):
+        self.socket.abort()
+        self.socket.shutdown()
+
+
+class SseConnection(StreamConnection):
+    """
+    Server-Sent Events (text/event-stream) received with a streamed GET request.
+    Every dispatched event becomes a message, events of type other than "message" are prefixed with [type].
+    Read timeout is the longest pause between received data, servers usually send comments to keep streams alive.
+    """
+    def __init__(self, request: dict, buffer: MessageBuffer, proxies: dict | None = None,
+                 timeout: tuple[float | None, float | None] = (None, None)):
+        super().__init__(request, buffer)
+        self.proxies = proxies
+        self.timeout = timeout
+        self.response: requests.Response | None = None
+
+    def read(self):
+        headers = {"Accept": "text/event-stream", "Cache-Control": "no-cache", **self.request["headers"]}
+        self.response = requests.get(self.request["url"], headers=headers, stream=True, proxies=self.proxies,
+                                     timeout=self.timeout)
+        self.buffer.append(SYSTEM, f"Соединение установлено ({self.response.status_code})")
+        event = "message"
+        data = []
+        for line in self.response.iter_lines(chunk_size=None):
+            if self.closed:
+                return
+            line = line.decode("utf-8", errors="replace")
+            if line == "":
+                # Empty line dispatches the event
+                if data:
+                    text = "\n".join(data)
+                    self.buffer.append(INCOMING, text if event == "message" else f"[{event}] {text}")
+                event = "message"
+                data = []
+            elif line.startswith(":"):
+                continue # Comment, often used as keep-alive
+            else:
+                field, _, value = line.partition(":")
+                value = value[1:] if value.startswith(" ") else value
+                if field == "data":
+                    data.append(value)
+                elif field == "event":
+                    event = value
+
+    def abort(self):
+        if self.response is not None:
+            self.response.close()
+
+
+def openConnection(protocol: str, request: dict, buffer: MessageBuffer, proxies: dict | None = None,
+                   timeout: tuple[float | None, float | None] = (None, None)) -> StreamConnection:
+    """
+    :param protocol: transport.WEBSOCKET or transport.SSE
+    :param request: Rendered request built by AppRequest#buildRequest
+    :param proxies: `proxies` argument of requests for SSE, see network.NetworkSettings#proxies
+    :param timeout: Connect and read timeout of SSE, see limits.RequestLimits#timeout
+    """
+    if protocol == transport.WEBSOCKET:
+        return WebSocketConnection(request, buffer).start()
+    return SseConnection(request, buffer, proxies, timeout).start()
@@ -0,0 +1,57 @@
+import functools
+import re
+from typing import Mapping, Callable
+
+# {{name}} or {{ name }}. Names can contain anything except braces and whitespace, e.g. {{user.id}}
+VARIABLE_PATTERN = re.compile(r"\{\{\s*([^{}\s]+)\s*}}")
+
+
+class Template:
+    """
+    String with {{variable}} placeholders, split into parts once so rendering is a single join.
+    Placeholders of unknown variables are left as they are.
+    Variables missing from the mapping are passed to `secrets` (e.g. SecretsStorage#lookup) if it is given,
+    its exceptions are not caught.
+    """
+    __slots__ = ("parts", "names")
+
+    def __init__(self, source: str):
+        # Even indexes are literal text, odd indexes are variable names
+        self.parts: list[str] = VARIABLE_PATTERN.split(source)
+        self.names: list[str] = self.parts[1::2]
+
+    def render(self, variables: Mapping[str, str], secrets: Callable[[str], str | None] | None = None) -> str:
+        parts = self.parts.copy()
+        for i in range(1, len(parts), 2):
+            name = parts[i]
+            value = variables.get(name)
+            if value is None and secrets is not None:
+                value = secrets(name)
+            parts[i] = "{{" + name + "}}" if value is None else str(value)
+        return "".join(parts)
+
+
+@functools.lru_cache(maxsize=8192)
+def compileTemplate(source: str) -> Template:
+    return Template(source)
+
+
+def render(source: str, variables: Mapping[str, str], secrets: Callable[[str], str | None] | None = None) -> str:
+    if "{{" not in source:
+        return source
+    return compileTemplate(source).render(variables, secrets)
+
+
+def renderRequest(request: dict, variables: Mapping[str, str],
+                  secrets: Callable[[str], str | None] | None = None) -> dict:
+    """
+    Substitutes variables in url, header names and values and text body of a request built by AppRequest#buildRequest.
+    Binary bodies are left as they are.
+    """
+    rendered = dict(request)
+    rendered["url"] = render(request["url"], variables, secrets)
+    rendered["headers"] = {render(name, variables, secrets): render(value, variables, secrets)
+                           for name, value in request["headers"].items()}
+    if isinstance(request["body"], str):
+        rendered["body"] = render(request["body"], variables, secrets)
+    return rendered
@@ -0,0 +1,310 @@
+import contextlib
+import datetime
+import threading
+import time
+from typing import Callable, Iterator
+
+import httpcore
+import httpx
+import requests
+
+import src.network as network
+
+# Values of the "p" key of AppRequest JSON
+HTTP1 = "HTTP(S)"
+HTTP2 = "HTTP/2"
+WEBSOCKET = "WebSocket"
+SSE = "SSE"
+PROTOCOLS = [HTTP1, HTTP2, WEBSOCKET, SSE]
+# Protocols that open a long-lived connection instead of sending a single request, see src.streaming
+STREAM_PROTOCOLS = (WEBSOCKET, SSE)
+# Names of timing phases shown to the user
+TIMING_NAMES = {
+    "connect": "Соединение",
+    "tls": "TLS",
+    "send": "Отправка",
+    "wait": "Ожидание ответа",
+    "receive": "Загрузка",
+}
+
+
+@contextlib.contextmanager
+def translateErrors():
+    """
+    Raises httpx errors as requests exceptions, so callers (and retry.sendWithRetries) handle both transports alike.
+    """
+    try:
+        yield
+    except httpx.TimeoutException as e:
+        raise requests.exceptions.Timeout(str(e)) from e
+    except httpx.ProxyError as e:
+        raise requests.exceptions.ProxyError(str(e)) from e
+    except httpx.TransportError as e:
+        raise requests.exceptions.ConnectionError(str(e)) from e
+
+
+class StreamTimings:
+    """
+    Collects httpcore trace events of a single request (stream) into phases in milliseconds.
+    Connect and TLS phases are missing if the request reused an open connection.
+    """
+    def __init__(self):
+        self.events: dict[str, float] = {}
+
+    def trace(self, name: str, info: dict):
+        # "http2.send_request_headers.started" -> "send_request_headers.started"
+        name = name.split(".", 1)[-1]
+        if name.endswith(".complete") or name not in self.events:
+            self.events[name] = time.perf_counter()
+
+    def phase(self, start: str, end: str) -> float | None:
+        if start not in self.events or end not in self.events:
+            return None
+        return round((self.events[end] - self.events[start]) * 1000, 3)
+
+    def toJSON(self) -> dict:
+        phases = {
+            "connect": self.phase("connect_tcp.started", "connect_tcp.complete"),
+            "tls": self.phase("start_tls.started", "start_tls.complete"),
+            "send": self.phase("send_request_headers.started", "send_request_body.complete"),
+            "wait": self.phase("send_request_body.complete", "receive_response_headers.complete"),
+            "receive": self.phase("receive_response_body.started", "receive_response_body.complete"),
+        }
+        return {name: value for name, value in phases.items() if value is not None}
+
+
+class Http2Response:
+    """
+    Wraps streamed httpx.Response into the part of requests.Response interface used by AppRequest.
+    """
+    def __init__(self, response: httpx.Response, elapsed: float, timings: StreamTimings):
+        self.response = response
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.cookies = response.cookies.jar
+        self.elapsed = datetime.timedelta(seconds=elapsed) # Time until headers were received, like in requests
+        self.protocol = response.http_version
+        self.started = time.time() - elapsed
+        self.streamTimings = timings
+        self.timings: dict = {}
+        self.history: list[httpx.Response] = [] # Followed redirects, like requests.Response#history
+
+    def iter_content(self, chunkSize: int | None) -> Iterator[bytes]:
+        """
+        :param chunkSize: None yields data as soon as it is received
+        """
+        try:
+            with translateErrors():
+                yield from self.response.iter_bytes(chunkSize)
+        finally:
+            self.response.close()
+            self.timings = {"protocol": self.protocol, "started": self.started, **self.streamTimings.toJSON()}
+
+
+# httpcore exceptions and httpx exceptions they are raised as, subclasses go first
+HTTPCORE_ERRORS = [
+    (httpcore.ConnectTimeout, httpx.ConnectTimeout),
+    (httpcore.ReadTimeout, httpx.ReadTimeout),
+    (httpcore.WriteTimeout, httpx.WriteTimeout),
+    (httpcore.PoolTimeout, httpx.PoolTimeout),
+    (httpcore.TimeoutException, httpx.TimeoutException),
+    (httpcore.ProxyError, httpx.ProxyError),
+    (httpcore.ConnectError, httpx.ConnectError),
+    (httpcore.ReadError, httpx.ReadError),
+    (httpcore.WriteError, httpx.WriteError),
+    (httpcore.NetworkError, httpx.NetworkError),
+    (httpcore.UnsupportedProtocol, httpx.UnsupportedProtocol),
+    (httpcore.LocalProtocolError, httpx.LocalProtocolError),
+    (httpcore.RemoteProtocolError, httpx.RemoteProtocolError),
+    (httpcore.ProtocolError, httpx.ProtocolError),
+]
+
+
+@contextlib.contextmanager
+def translateHttpcoreErrors():
+    """
+    Raises httpcore errors as httpx errors, like httpx.HTTPTransport does.
+    """
+    try:
+        yield
+    except tuple(source for source, mapped in HTTPCORE_ERRORS) as e:
+        raise next(mapped for source, mapped in HTTPCORE_ERRORS if isinstance(e, source))(str(e)) from e
+
+
+class PoolResponseStream(httpx.SyncByteStream):
+    def __init__(self, stream):
+        self.stream = stream
+
+    def __iter__(self) -> Iterator[bytes]:
+        with translateHttpcoreErrors():
+            yield from self.stream
+
+    def close(self):
+        if hasattr(self.stream, "close"):
+            self.stream.close()
+
+
+class PoolTransport(httpx.BaseTransport):
+    """
+    httpx transport over an httpcore.ConnectionPool with HTTP/2 enabled, whose connections are opened by
+    network.ResolvingBackend. Counts requests per origin for diagnostics, httpcore does not expose them.
+    """
+    def __init__(self, proxy: str | None = None):
+        sslContext = httpx.create_ssl_context()
+        self.pool = httpcore.ConnectionPool(
+            ssl_context=sslContext, proxy=None if proxy is None else httpcore.Proxy(proxy, ssl_context=sslContext),
+            http1=True, http2=True, network_backend=network.ResolvingBackend())
+        self.requests: dict[tuple[bytes, bytes, int], int] = {} # (scheme, host, port) -> sent requests
+        self.lock = threading.Lock()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        url = request.url
+        origin = (url.raw_scheme, url.raw_host, url.port or (443 if url.raw_scheme == b"https" else 80))
+        with self.lock:
+            self.requests[origin] = self.requests.get(origin, 0) + 1
+        poolRequest = httpcore.Request(
+            method=request.method,
+            url=httpcore.URL(scheme=origin[0], host=origin[1], port=url.port, target=url.raw_path),
+            headers=request.headers.raw, content=request.stream, extensions=request.extensions)
+        with translateHttpcoreErrors():
+            response = self.pool.handle_request(poolRequest)
+        return httpx.Response(status_code=response.status, headers=response.headers,
+                              stream=PoolResponseStream(response.stream), extensions=response.extensions)
+
+    def poolSnapshot(self) -> list[tuple[str, int, int, int]]:
+        """
+        :return: (origin, opened connections, idle connections, requests) for every requested origin
+        """
+        with self.lock:
+            origins = dict(self.requests)
+        connections = self.pool.connections
+        rows = []
+        for (scheme, host, port), count in sorted(origins.items()):
+            origin = httpcore.Origin(scheme, host, port)
+            handling = [connection for connection in connections if connection.can_handle_request(origin)]
+            rows.append((f"{scheme.decode()}://{host.decode()}:{port}", len(handling),
+                         sum(1 for connection in handling if connection.is_idle()), count))
+        return rows
+
+    def close(self):
+        self.pool.close()
+
+
+def hopTimeout(timeout: tuple[float | None, float | None]) -> httpx.Timeout:
+    return httpx.Timeout(None, connect=timeout[0], read=timeout[1])
+
+
+class Http2Transport:
+    """
+    Shared httpx.Client with HTTP/2 enabled. Requests to the same host from all threads are multiplexed
+    as streams over one connection instead of opening a connection per thread.
+    Servers that do not support HTTP/2 are talked to with HTTP/1.1.
+    """
+    def __init__(self):
+        self.clients: dict[tuple[str, str], httpx.Client] = {} # (proxy, noProxy) -> client
+        self.transports: dict[tuple[str, str], list[PoolTransport]] = {} # Transports of clients for diagnostics
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def createTransport(proxy: str | None) -> PoolTransport:
+        if proxy is not None and proxy.startswith("socks"):
+            try:
+                import socksio
+            except ImportError as e:
+                raise requests.exceptions.InvalidSchema(
+                    "SOCKS proxies need the socksio package, install httpx[socks]") from e
+        return PoolTransport(proxy)
+
+    def getClient(self, settings: network.NetworkSettings | None = None) -> httpx.Client:
+        """
+        :param settings: Proxy settings of the collection, clients with different proxies have separate pools
+        """
+        key = ("", "") if settings is None else (settings.proxy, settings.noProxy)
+        with self.lock:
+            if key not in self.clients:
+                transport = self.createTransport(key[0] or None)
+                mounts = {}
+                transports = [transport]
+                if key[0] != "":
+                    direct = self.createTransport(None)
+                    transports.append(direct)
+                    for host in settings.noProxyHosts():
+                        mounts[f"all://{host}"] = direct
+                self.clients[key] = httpx.Client(http2=True, timeout=None, transport=transport, mounts=mounts)
+                self.transports[key] = transports
+            return self.clients[key]
+
+    def request(self, method: str, url: str, headers: dict, data, cookies=None,
+                timeout: Callable[[], tuple[float | None, float | None]] = lambda: (None, None),
+                maxRedirects: int = 0, settings: network.NetworkSettings | None = None) -> Http2Response:
+        """
+        :param data: bytes, file-like object or None
+        :param timeout: Returns connect and read timeouts in seconds (None waits forever) before every
+        redirect, so they can be capped by the time left until a deadline. Should raise an exception
+        (see limits.RequestLimits#timeout) when the deadline has passed, then no further redirect is sent
+        :param maxRedirects: Redirects that are followed, 0 returns the redirect response itself
+        :param settings: Proxy settings of the collection
+        """
+        if hasattr(data, "read"):
+            reader = data
+            data = iter(lambda: reader.read(1024 * 1024), b"")
+            headers = {"Content-Length": str(len(reader)), **headers}
+        client = self.getClient(settings)
+        timings = StreamTimings()
+        start = time.perf_counter()
+        request = client.build_request(method, url, headers=headers, content=data, cookies=cookies,
+                                       timeout=hopTimeout(timeout()), extensions={"trace": timings.trace})
+        history = []
+        with translateErrors():
+            response = client.send(request, stream=True)
+            while response.next_request is not None and maxRedirects > 0:
+                # Body of a redirect is never read, so maxSize and reading time do not apply to it
+                response.close()
+                if len(history) >= maxRedirects:
+                    raise requests.exceptions.TooManyRedirects(f"Exceeded {maxRedirects} redirects.")
+                history.append(response)
+                hop = hopTimeout(timeout()) # Checks the deadline before the next hop is sent
+                timings = StreamTimings()
+                response.next_request.extensions["trace"] = timings.trace
+                response.next_request.extensions["timeout"] = hop.as_dict()
+                response = client.send(response.next_request, stream=True)
+        result = Http2Response(response, time.perf_counter() - start, timings)
+        result.history = history
+        return result
+
+    def poolSnapshot(self) -> list[tuple[str, str, int, int, int]]:
+        """
+        :return: (client, origin, opened connections, idle connections, requests) for every origin
+        requested through a client, see network.poolSnapshot
+        """
+        rows = []
+        with self.lock:
+            items = [(key, list(transports)) for key, transports in self.transports.items()]
+        for (proxy, noProxy), transports in items:
+            client = "httpx" + (f" via {proxy}" if proxy else "")
+            for created in transports:
+                rows += [(client, *row) for row in created.poolSnapshot()]
+        return rows
+
+    def close(self):
+        with self.lock:
+            for client in self.clients.values():
+                client.close()
+            self.clients.clear()
+            self.transports.clear()
+
+
+def formatTimings(timings: dict) -> str:
+    """
+    :return: Negotiated protocol and phases of AppRequest#timings as a single line of text
+    """
+    if not timings:
+        return ""
+    parts = [timings.get("protocol", "")]
+    for name, title in TIMING_NAMES.items():
+        if name in timings:
+            parts.append(f"{title.lower()} {timings[name]:.1f} мс")
+    return " · ".join(parts)
+
+
+transport = Http2Transport()
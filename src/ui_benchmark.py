@@ -0,0 +1,263 @@
+"""
+Responsiveness benchmarks of the GUI.
+
+Usage (from the project's root):
+    python -m src.ui_benchmark [--output ui_results.json] [--compare baseline.json] [--threshold 1.25]
+                               [--filter name] [--size 5000]
+
+MainWindow is shown on the offscreen Qt platform with a synthetic collection and every scenario scripts
+user interactions (clicks in the request tree, typing, switching tabs, receiving big responses).
+Steps are run from Qt's event loop, latency of a step is the time from the input until the event loop
+is idle again, so layout and painting caused by the step are included.
+For every scenario results contain step latency, time of AppBackend#emitDataUpdate calls (<name>.emitDataUpdate)
+and event loop lag sampled every frame. Results have the same format as src.benchmark and are compared the same way.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from typing import Callable
+
+os.environ["QT_QPA_PLATFORM"] = "offscreen"
+
+from PyQt6.QtCore import QEventLoop, QTimer, Qt
+from PyQt6.QtTest import QTest
+from PyQt6.QtWidgets import QApplication
+
+import src.backend as backend
+import src.shared_constrains as shared_constrains
+from src.benchmark import compareResults, syntheticCollection
+from src.profiling import EventLoopLagMonitor, profiler
+from src.standin_server import StandInServer
+
+# name -> (setup function, steps). Setup function returns a step callable that is called `steps` times.
+SCENARIOS: dict[str, tuple[Callable, int]] = {}
+# Interval of event loop lag samples in milliseconds, one frame at 60 FPS
+FRAME_INTERVAL = 16
+# Idle time between steps in milliseconds, so lag caused by a step is not attributed to the next one
+STEP_INTERVAL = 20
+
+
+def scenario(name: str, steps: int = 30):
+    def decorator(setup: Callable):
+        SCENARIOS[name] = (setup, steps)
+        return setup
+    return decorator
+
+
+class UiBenchmarkContext:
+    """
+    Shared state of a run: Qt application, shown MainWindow with a synthetic collection and stand-in HTTP server.
+    """
+    def __init__(self, size: int):
+        from src.frontend.app_layout import MainWindow
+        self.application = QApplication.instance() or QApplication(sys.argv)
+        self.back = backend.AppBackend()
+        self.window = MainWindow(self.back)
+        self.back.application = self.application
+        self.server = StandInServer().start()
+        self.size = size
+        self.loadCollection(size)
+        self.window.resize(1280, 800)
+        self.window.show()
+        self.settle()
+
+    @property
+    def widget(self):
+        return self.window.widget
+
+    def loadCollection(self, size: int):
+        model = backend.AppDataModel(self.back)
+        for data in syntheticCollection(size)["r"]:
+            request = backend.AppRequest.fromJSON(data, model)
+            model.requests[request.id] = request
+            model.tree.root.children.append(request)
+        model.tree.root.sortChildren()
+        model.selectedRequest = next(iter(model.requests))
+        self.back.model = model
+        self.back.emitDataUpdate()
+
+    def settle(self):
+        """
+        Processes pending events, including layout and painting, outside of measurements.
+        """
+        for i in range(3):
+            self.application.processEvents()
+
+    def close(self):
+        self.window.hide()
+        self.server.stop()
+
+
+@scenario("selectRequest[tree-click]")
+def scenarioSelect(context: UiBenchmarkContext):
+    tree = context.widget.requestTree
+    model = context.back.model.tree
+    state = {"row": 0}
+
+    def step():
+        state["row"] = (state["row"] + 7) % 40
+        index = model.index(state["row"], 0)
+        tree.scrollTo(index)
+        QTest.mouseClick(tree.viewport(), Qt.MouseButton.LeftButton, pos=tree.visualRect(index).center())
+    return step
+
+
+@scenario("typeRequestName[keystroke]", steps=60)
+def scenarioType(context: UiBenchmarkContext):
+    context.widget.requestName.setFocus()
+    return lambda: QTest.keyClick(context.widget.requestName, "x")
+
+
+@scenario("switchTabs")
+def scenarioTabs(context: UiBenchmarkContext):
+    tabs = context.widget.tabWidget
+    bodyTabs = context.widget.bodyView
+    state = {"step": 0}
+
+    def step():
+        state["step"] += 1
+        if state["step"] % 2:
+            tabs.setCurrentIndex(state["step"] // 2 % tabs.count())
+        else:
+            tabs.setCurrentWidget(bodyTabs)
+            bodyTabs.setCurrentIndex(state["step"] // 2 % bodyTabs.count())
+    return step
+
+
+def responseScenario(context: UiBenchmarkContext, path: str):
+    request = backend.AppRequest(context.back.model, "ui benchmark")
+    request.url = context.server.url(path)
+    context.back.model.addRequest(request)
+    context.back.selectNode(request)
+    context.widget.tabWidget.setCurrentWidget(context.widget.bodyView)
+    context.widget.bodyView.setCurrentWidget(context.widget.bodyView.responseView)
+    # Default retry policy sends in the GUI thread, so the whole request blocks the event loop like for a user
+    return context.back.sendRequest
+
+
+@scenario("receiveResponse[binary-10mb]", steps=5)
+def scenarioBinaryResponse(context: UiBenchmarkContext):
+    return responseScenario(context, f"/binary?size={10 * 1024 * 1024}")
+
+
+@scenario("receiveResponse[png-2048]", steps=10)
+def scenarioImageResponse(context: UiBenchmarkContext):
+    return responseScenario(context, "/image?width=2048&height=2048")
+
+
+@scenario("receiveResponse[text-10mb]", steps=5)
+def scenarioTextResponse(context: UiBenchmarkContext):
+    return responseScenario(context, f"/text?size={10 * 1024 * 1024}")
+
+
+def stats(values: list[float]) -> dict:
+    if not values:
+        return {"repeats": 0, "min": 0.0, "median": 0.0, "mean": 0.0, "p95": 0.0, "max": 0.0}
+    values = sorted(values)
+    return {
+        "repeats": len(values),
+        "min": values[0],
+        "median": statistics.median(values),
+        "mean": statistics.fmean(values),
+        "p95": values[min(len(values) - 1, int(len(values) * 0.95))],
+        "max": values[-1],
+    }
+
+
+def runScenario(context: UiBenchmarkContext, step: Callable, steps: int) -> tuple[dict, dict]:
+    """
+    Runs steps from the event loop.
+    :return: Latency of steps with event loop lag, and durations of emitDataUpdate calls
+    """
+    step() # Warm up
+    context.settle()
+    profiler.clear()
+    latencies = []
+    loop = QEventLoop()
+    monitor = EventLoopLagMonitor(profiler, FRAME_INTERVAL)
+
+    def runStep():
+        if len(latencies) == steps:
+            loop.quit()
+            return
+        start = time.perf_counter()
+        step()
+        # Zero timer fires after events posted by the step (layout, paint) were processed
+        QTimer.singleShot(0, lambda: finishStep(start))
+
+    def finishStep(start: float):
+        latencies.append(time.perf_counter() - start)
+        QTimer.singleShot(STEP_INTERVAL, runStep)
+
+    monitor.start()
+    QTimer.singleShot(0, runStep)
+    loop.exec()
+    monitor.stop()
+    latency = stats(latencies)
+    lags = [lag for timestamp, lag in profiler.lagSamples]
+    latency["lagMedianMs"] = statistics.median(lags) if lags else 0.0
+    latency["lagMaxMs"] = max(lags, default=0.0)
+    emits = [span.duration / 1e9 for span in profiler.spans if span.name == "backend.emitDataUpdate"]
+    return latency, stats(emits)
+
+
+def runScenarios(nameFilter: str | None = None, size: int = 5000) -> dict:
+    context = UiBenchmarkContext(size)
+    results = {}
+    try:
+        for name, (setup, steps) in SCENARIOS.items():
+            if nameFilter is not None and nameFilter not in name:
+                continue
+            latency, emits = runScenario(context, setup(context), steps)
+            results[name] = latency
+            print(f"{name:<45} median {latency['median'] * 1000:10.3f} ms, p95 {latency['p95'] * 1000:10.3f} ms, "
+                  f"max lag {latency['lagMaxMs']:8.1f} ms", flush=True)
+            if emits["repeats"] > 0:
+                results[f"{name}.emitDataUpdate"] = emits
+                print(f"{name + '.emitDataUpdate':<45} median {emits['median'] * 1000:10.3f} ms "
+                      f"({emits['repeats']} calls)", flush=True)
+    finally:
+        context.close()
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "time": time.time(),
+            "collectionSize": size,
+        },
+        "results": results
+    }
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(description="DenisJava's WebRequests GUI responsiveness benchmarks")
+    parser.add_argument("--output", default="ui_benchmark_results.json", help="File to write results to")
+    parser.add_argument("--compare", default=None, help="Results file of a previous run to compare with")
+    parser.add_argument("--threshold", type=float, default=1.25, help="Allowed slowdown ratio")
+    parser.add_argument("--filter", default=None, help="Only run scenarios containing this string")
+    parser.add_argument("--size", type=int, default=5000, help="Requests in the synthetic collection")
+    args = parser.parse_args(argv)
+
+    # Font of the stylesheet can not be loaded on the offscreen platform and its warning dialog would block the run
+    with open("assets/stylesheet.txt", "r", encoding="utf-8") as fr:
+        shared_constrains.STYLESHEET = fr.read().replace("!!nerdFontMono!!", "")
+    results = runScenarios(args.filter, args.size)
+    with open(args.output, "w", encoding="utf-8") as fw:
+        json.dump(results, fw, indent=2)
+
+    if args.compare is not None:
+        with open(args.compare, "r", encoding="utf-8") as fr:
+            baseline = json.load(fr)
+        regressions = compareResults(results, baseline, args.threshold)
+        for regression in regressions:
+            print("REGRESSION:", regression)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,3 +1,28 @@
+import os
+import tempfile
+from contextlib import contextmanager
+
+
 class Holder:
     def __init__(self, value):
-        self.value = value
\ No newline at end of file
+        self.value = value
+
+
+@contextmanager
+def atomicWriter(file: str, encoding: str = "utf-8"):
+    """
+    Opens a temporary file next to the target for writing. When the block exits, the temporary file
+    is renamed over the target. A crash or exception during writing leaves the old file untouched.
+    """
+    directory = os.path.dirname(os.path.abspath(file))
+    fd, tempName = tempfile.mkstemp(prefix=".tmp-", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding=encoding) as fw:
+            yield fw
+            fw.flush()
+            os.fsync(fw.fileno())
+        os.replace(tempName, file)
+    except BaseException:
+        if os.path.exists(tempName):
+            os.remove(tempName)
+        raise